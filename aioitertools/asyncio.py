@@ -8,18 +8,60 @@ Provisional library.  Must be imported as `aioitertools.asyncio`.
 """
 
 import asyncio
-import time
-from collections.abc import AsyncGenerator, AsyncIterable, Awaitable, Iterable
-from typing import Any, cast, Optional
+import collections
+import contextlib
+import functools
+import heapq
+import inspect
+import itertools
+import queue
+import sys
+import threading
+from collections.abc import (
+    AsyncGenerator,
+    AsyncIterable,
+    Awaitable,
+    Hashable,
+    Iterable,
+    Iterator,
+    Mapping,
+)
+from typing import Any, Callable, cast, Generic, Optional
 
-from .builtins import iter as aiter, maybe_await
-from .types import AnyIterable, AsyncIterator, MaybeAwaitable, T
+from .builtins import iter as aiter, maybe_await, next as anext
+from .helpers import cooperative_defaults
+from .metrics import current_hook, MetricsHook
+from .profiling import instrument
+from .tracing import current_span, current_tracer, traced
+from .types import (
+    AnyFunction,
+    AnyIterable,
+    AsyncIterator,
+    KeyFunction,
+    MaybeAwaitable,
+    R,
+    T,
+)
+
+if sys.version_info >= (3, 11):
+    from builtins import BaseExceptionGroup
+
+
+def _ensure_task(aw: Awaitable[T], eager: bool = False) -> asyncio.Future[T]:
+    """
+    Wrap an awaitable in a task, optionally starting coroutines eagerly (3.12+).
+    """
+    if eager and sys.version_info >= (3, 12) and inspect.iscoroutine(aw):
+        loop = asyncio.get_running_loop()
+        return asyncio.Task(aw, loop=loop, eager_start=True)
+    return asyncio.ensure_future(aw)
 
 
 async def as_completed(
     aws: Iterable[Awaitable[T]],
     *,
     timeout: Optional[float] = None,
+    eager: bool = False,
 ) -> AsyncIterator[T]:
     """
     Run awaitables in `aws` concurrently, and yield results as they complete.
@@ -30,24 +72,30 @@ async def as_completed(
     Cancels all remaining awaitables if a timeout is given and the timeout threshold
     is reached.
 
+    If ``eager`` is ``True``, coroutines start running immediately on Python 3.12+,
+    like :func:`asyncio.eager_task_factory`, and awaitables that are already done
+    are yielded without waiting on the event loop.  This avoids a loop iteration for
+    each awaitable that finishes without suspending, like cache hits.
+
     Example::
 
         async for value in as_completed(futures):
             ...  # use value immediately
 
     """
+    loop = asyncio.get_running_loop()
     done: set[Awaitable[T]] = set()
-    pending: set[Awaitable[T]] = {asyncio.ensure_future(a) for a in aws}
+    pending: set[Awaitable[T]] = {_ensure_task(a, eager) for a in aws}
     remaining: Optional[float] = None
 
     if timeout and timeout > 0:
-        threshold = time.time() + timeout
+        threshold = loop.time() + timeout
     else:
         timeout = None
 
     while pending:
         if timeout:
-            remaining = threshold - time.time()
+            remaining = threshold - loop.time()
             if remaining <= 0:
                 for fut in pending:
                     if isinstance(fut, asyncio.Future):
@@ -63,14 +111,22 @@ async def as_completed(
         # we need to first cast the results to something that we can actually use
         # asyncio.Future: https://github.com/python/typeshed/blob/72ff7b94e534c610ddf8939bacbc55343e9465d2/stdlib/3/asyncio/futures.pyi#L30
         # asyncio.wait(): https://github.com/python/typeshed/blob/72ff7b94e534c610ddf8939bacbc55343e9465d2/stdlib/3/asyncio/tasks.pyi#L89
-        done, pending = cast(
-            tuple[set[Awaitable[T]], set[Awaitable[T]]],
-            await asyncio.wait(
-                pending,
-                timeout=remaining,
-                return_when=asyncio.FIRST_COMPLETED,
-            ),
-        )
+        ready: set[Awaitable[T]] = {
+            fut
+            for fut in pending
+            if eager and isinstance(fut, asyncio.Future) and fut.done()
+        }
+        if ready:
+            done, pending = ready, pending - ready
+        else:
+            done, pending = cast(
+                tuple[set[Awaitable[T]], set[Awaitable[T]]],
+                await asyncio.wait(
+                    pending,
+                    timeout=remaining,
+                    return_when=asyncio.FIRST_COMPLETED,
+                ),
+            )
 
         for item in done:
             yield await item
@@ -107,11 +163,14 @@ async def as_generated(
 
     exc_queue: asyncio.Queue[Exception] = asyncio.Queue()
     queue: asyncio.Queue[T] = asyncio.Queue()
+    hook = current_hook()
 
     async def tailer(iter: AsyncIterable[T]) -> None:
         try:
             async for item in iter:
                 await queue.put(item)
+                if hook is not None:
+                    hook.gauge("as_generated", "queue_depth", queue.qsize())
         except asyncio.CancelledError:
             if isinstance(iter, AsyncGenerator):  # pragma:nocover
                 await iter.aclose()
@@ -119,7 +178,15 @@ async def as_generated(
         except Exception as e:
             await exc_queue.put(e)
 
-    tasks = [asyncio.ensure_future(tailer(iter)) for iter in iterables]
+    tracer = current_tracer()
+    if tracer is not None:
+        span = tracer.start("as_generated")
+        tasks = [
+            span.create_task("as_generated.task", asyncio.ensure_future, tailer(iter))
+            for iter in iterables
+        ]
+    else:
+        tasks = [asyncio.ensure_future(tailer(iter)) for iter in iterables]
     pending = set(tasks)
 
     try:
@@ -135,11 +202,16 @@ async def as_generated(
 
             try:
                 value = queue.get_nowait()
+                if hook is not None:
+                    hook.count("as_generated", "items_out")
+                    hook.gauge("as_generated", "queue_depth", queue.qsize())
                 yield value
             except asyncio.QueueEmpty:
                 for task in list(pending):
                     if task.done():
                         pending.remove(task)
+                if hook is not None:
+                    hook.gauge("as_generated", "in_flight", len(pending))
                 await asyncio.sleep(0.001)
 
     except (asyncio.CancelledError, GeneratorExit):
@@ -156,11 +228,49 @@ async def as_generated(
             except asyncio.CancelledError:
                 pass
 
+        if tracer is not None:
+            span.finish()
+
+
+async def _abort(
+    pending: set[asyncio.Future[T]], unstarted: Iterable[Awaitable[T]]
+) -> list[BaseException]:
+    """
+    Cancel pending tasks and close unstarted coroutines, returning any new errors.
+    """
+    for aw in unstarted:
+        if inspect.iscoroutine(aw):
+            aw.close()
+    for task in pending:
+        task.cancel()
+    results = await asyncio.gather(*pending, return_exceptions=True)
+    return [
+        result
+        for result in results
+        if isinstance(result, BaseException)
+        and not isinstance(result, asyncio.CancelledError)
+    ]
+
 
+def _report_done(
+    hook: MetricsHook, done: set[asyncio.Future[T]], pending: set[asyncio.Future[T]]
+) -> None:
+    errors = sum(1 for x in done if not x.cancelled() and x.exception() is not None)
+    hook.count("gather", "items_out", len(done))
+    hook.count("gather", "errors", errors)
+    hook.gauge("gather", "in_flight", len(pending))
+
+
+@traced("gather")
 async def gather(
     *args: Awaitable[T],
     return_exceptions: bool = False,
     limit: int = -1,
+    fail_fast: bool = False,
+    exception_group: bool = False,
+    timeout: Optional[float] = None,
+    item_timeout: Optional[float] = None,
+    eager: bool = False,
 ) -> list[Any]:
     """
     Like asyncio.gather but with a limit on concurrency.
@@ -170,12 +280,40 @@ async def gather(
     If gather is cancelled all tasks that were internally created and still pending
     will be cancelled as well.
 
+    If ``fail_fast`` is ``True`` and ``return_exceptions`` is ``False``, the first
+    exception raised by an awaitable cancels all running tasks, and closes any
+    coroutines that have not been started yet due to ``limit``.  Once cancelled
+    tasks have finished, the exception is raised.  If ``exception_group`` is
+    ``True``, which implies ``fail_fast``, all exceptions raised before and during
+    cancellation are raised together as an :class:`ExceptionGroup` (Python 3.11+).
+
+    If ``timeout`` is given, all awaitables must finish within that many seconds,
+    measured with the event loop's monotonic clock.  Once the deadline passes, all
+    running tasks are cancelled, and coroutines not yet started are closed.  If
+    ``return_exceptions`` is ``True``, the partial results are then returned, with
+    an :class:`asyncio.TimeoutError` in place of each unfinished result; otherwise
+    :class:`asyncio.TimeoutError` is raised.  If ``item_timeout`` is given, each
+    awaitable is cancelled if it runs longer than that many seconds after it starts,
+    and its :class:`asyncio.TimeoutError` is treated like any other exception.
+
+    If ``eager`` is ``True``, coroutines start running as soon as they are scheduled
+    on Python 3.12+, rather than on the next iteration of the event loop, and any
+    that finish without suspending are collected without waiting on the loop.
+    Awaitables that are already done, like resolved futures, never wait either.
+
     Example::
 
         futures = [some_coro(i) for i in range(10)]
 
         results = await gather(*futures, limit=2)
     """
+    if exception_group:
+        if sys.version_info < (3, 11):  # pragma: no cover
+            raise RuntimeError("exception_group requires Python 3.11 or newer")
+        fail_fast = True
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout if timeout is not None else None
 
     # For detecting input duplicates and reconciling them at the end
     input_map: dict[Awaitable[T], list[int]] = {}
@@ -187,8 +325,11 @@ async def gather(
     done: set[asyncio.Future[T]] = set()
 
     next_arg = 0
+    hook = current_hook()
+    span = current_span() if current_tracer() is not None else None
 
     while True:
+        started = len(pos)
         while next_arg < len(args) and (limit == -1 or len(pending) < limit):
             # We have to defer the creation of the Task as long as possible
             # because once we do, it starts executing, regardless of what we
@@ -200,19 +341,65 @@ async def gather(
                 # because the return value of asyncio.wait will be an implicit
                 # task otherwise, and we won't be able to know which input it
                 # corresponds to.
-                task: asyncio.Future[T] = asyncio.ensure_future(args[next_arg])
+                aw = args[next_arg]
+                if item_timeout is not None:
+                    aw = asyncio.wait_for(aw, item_timeout)
+                if span is not None:
+                    task = span.create_task("gather.task", _ensure_task, aw, eager)
+                else:
+                    task = _ensure_task(aw, eager)
                 pending.add(task)
                 pos[task] = next_arg
                 input_map[args[next_arg]] = [next_arg]
             next_arg += 1
 
+        if hook is not None:
+            hook.count("gather", "items_in", len(pos) - started)
+            hook.gauge("gather", "in_flight", len(pending))
+
         # pending might be empty if the last items of args were dupes;
         # asyncio.wait([]) will raise an exception.
         if pending:
             try:
-                done, pending = await asyncio.wait(
-                    pending, return_when=asyncio.FIRST_COMPLETED
-                )
+                remaining = None
+                if deadline is not None:
+                    remaining = max(deadline - loop.time(), 0)
+                ready = {x for x in pending if x.done()} if eager else set()
+                if ready:
+                    done, pending = ready, pending - ready
+                else:
+                    done, pending = await asyncio.wait(
+                        pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+                    )
+                if hook is not None:
+                    _report_done(hook, done, pending)
+                if not done:
+                    # deadline passed before anything else finished
+                    unstarted = [a for a in args[next_arg:] if a not in input_map]
+                    await _abort(pending, unstarted)
+                    if not return_exceptions:
+                        raise asyncio.TimeoutError()
+                    for x in pending:
+                        ret[pos[x]] = asyncio.TimeoutError()
+                    for idx in range(next_arg, len(args)):
+                        ret[idx] = asyncio.TimeoutError()
+                    pending = set()
+                    next_arg = len(args)
+
+                if fail_fast and not return_exceptions:
+                    errors: list[BaseException] = [
+                        exc
+                        for x in done
+                        if not x.cancelled() and (exc := x.exception()) is not None
+                    ]
+                    if errors:
+                        unstarted = [a for a in args[next_arg:] if a not in input_map]
+                        errors += await _abort(pending, unstarted)
+                        if exception_group and sys.version_info >= (3, 11):
+                            # an ExceptionGroup, unless any error is a BaseException
+                            raise BaseExceptionGroup("gather failed", errors)
+                        raise errors[0]
+
                 for x in done:
                     if return_exceptions and x.exception():
                         ret[pos[x]] = x.exception()
@@ -240,14 +427,681 @@ async def gather_iter(
     itr: AnyIterable[MaybeAwaitable[T]],
     return_exceptions: bool = False,
     limit: int = -1,
+    fail_fast: bool = False,
+    exception_group: bool = False,
+    timeout: Optional[float] = None,
+    item_timeout: Optional[float] = None,
+    eager: bool = False,
 ) -> list[T]:
     """
     Wrapper around gather to handle gathering an iterable instead of ``*args``.
 
-    Note that the iterable values don't have to be awaitable.
+    Note that the iterable values don't have to be awaitable.  Time spent consuming
+    the iterable counts toward ``timeout``.
     """
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    aws = [
+        cast(Awaitable[T], i) if inspect.isawaitable(i) else maybe_await(i)
+        async for i in aiter(itr)
+    ]
+    if timeout is not None:
+        timeout -= loop.time() - start
     return await gather(
-        *[maybe_await(i) async for i in aiter(itr)],
+        *aws,
         return_exceptions=return_exceptions,
         limit=limit,
+        fail_fast=fail_fast,
+        exception_group=exception_group,
+        timeout=timeout,
+        item_timeout=item_timeout,
+        eager=eager,
     )
+
+
+async def keyed_map(
+    fn: Callable[[T], MaybeAwaitable[R]],
+    itr: AnyIterable[T],
+    key: KeyFunction[T, Hashable],
+    *,
+    limit: int = -1,
+    buffer: int = 1000,
+) -> AsyncIterator[R]:
+    """
+    Concurrently map items with ``fn``, one at a time per key, in arrival order.
+
+    Items with the same key, as computed by the ``key`` function or coroutine, run
+    sequentially in the order they were received, while items with different keys
+    run concurrently, with at most ``limit`` calls in flight overall.  Results are
+    yielded as they complete, so results for each key are in order, but results for
+    different keys may be interleaved.
+
+    At most ``buffer`` items are read ahead of their results.  Keys with no pending
+    items are forgotten, so memory use is bounded by the number of active keys.
+    If ``fn`` raises an exception, all pending calls are cancelled, and the exception
+    is raised.
+
+    Example::
+
+        def user_id(event):
+            return event.user_id
+
+        async for receipt in keyed_map(apply_event, events, key=user_id, limit=100):
+            ...
+
+    """
+    if limit == 0 or limit < -1:
+        raise ValueError("limit must be -1 or at least one")
+    if buffer < 1:
+        raise ValueError("buffer must be at least one")
+
+    fn = instrument("keyed_map", fn)
+    source = aiter(itr)
+    lanes: dict[Hashable, collections.deque[T]] = {}
+    ready: collections.deque[Hashable] = collections.deque()
+    running: dict[asyncio.Future[R], Hashable] = {}
+    fetch: Optional[asyncio.Future[T]] = None
+    exhausted = False
+    buffered = 0
+
+    async def call(item: T) -> R:
+        return await maybe_await(fn(item))
+
+    try:
+        while True:
+            if fetch is None and not exhausted and buffered < buffer:
+                fetch = asyncio.ensure_future(anext(source))
+
+            while ready and (limit == -1 or len(running) < limit):
+                k = ready.popleft()
+                running[asyncio.ensure_future(call(lanes[k].popleft()))] = k
+
+            waiting: set[asyncio.Future[Any]] = set(running)
+            if fetch is not None:
+                waiting.add(fetch)
+            if not waiting:
+                break
+
+            done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+
+            if fetch in done:
+                try:
+                    item = fetch.result()
+                except StopAsyncIteration:
+                    exhausted = True
+                else:
+                    k = await maybe_await(key(item))
+                    buffered += 1
+                    if k in lanes:
+                        lanes[k].append(item)
+                    else:
+                        lanes[k] = collections.deque([item])
+                        ready.append(k)
+                fetch = None
+
+            for task in done:
+                if task not in running:
+                    continue
+                k = running.pop(task)
+                buffered -= 1
+                if lanes[k]:
+                    ready.append(k)
+                else:
+                    del lanes[k]
+                yield task.result()
+
+    finally:
+        pending: list[asyncio.Future[Any]] = list(running)
+        if fetch is not None:
+            pending.append(fetch)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+class KeyedLimiter:
+    """
+    Limit concurrency per key, such as per host, and optionally in total.
+
+    At most ``per_key`` calls run at once for each key, unless overridden for specific
+    keys in ``limits``, and at most ``total`` calls run at once overall (or unlimited
+    if ``total`` is -1).  A call waits for its key's limit before waiting for the
+    total limit, so calls for a saturated key never hold up calls for other keys.
+    Per-key state is dropped when a key has no running or waiting calls.
+
+    Use :meth:`wrap` to limit calls to a function or coroutine, with the key
+    computed by ``key`` from the call arguments, or :meth:`run` to limit any
+    awaitable with an explicit key.  The results can be passed to :func:`gather`,
+    :func:`gather_iter`, :func:`as_completed`, or :func:`keyed_map`; prefer the
+    limiter's ``total`` over the ``limit`` parameter of :func:`gather`, which
+    starts awaitables strictly in order.
+
+    Example::
+
+        def host(url):
+            return urlparse(url).netloc
+
+        limiter = KeyedLimiter(host, per_key=4, total=200)
+        fetch_limited = limiter.wrap(fetch)
+
+        pages = await gather(*[fetch_limited(url) for url in urls])
+
+    """
+
+    def __init__(
+        self,
+        key: Optional[Callable[..., Hashable]] = None,
+        *,
+        per_key: int = 1,
+        limits: Optional[Mapping[Hashable, int]] = None,
+        total: int = -1,
+    ) -> None:
+        if per_key < 1:
+            raise ValueError("per_key must be at least one")
+        if total == 0 or total < -1:
+            raise ValueError("total must be -1 or at least one")
+
+        self.key = key
+        self.per_key = per_key
+        self.limits = dict(limits or {})
+        self.total = total
+        self._keys: dict[Hashable, tuple[asyncio.Semaphore, int]] = {}
+        self._total: Optional[asyncio.Semaphore] = None
+
+    def active(self) -> dict[Hashable, int]:
+        """
+        Number of running and waiting calls for each key.
+        """
+        return {key: count for key, (_, count) in self._keys.items()}
+
+    @contextlib.asynccontextmanager
+    async def slot(self, key: Hashable) -> AsyncIterator[None]:
+        """
+        Wait for a free slot for the given key, and hold it until the context exits.
+        """
+        if key in self._keys:
+            sem, count = self._keys[key]
+        else:
+            sem, count = asyncio.Semaphore(self.limits.get(key, self.per_key)), 0
+        self._keys[key] = (sem, count + 1)
+
+        try:
+            async with sem:
+                if self.total == -1:
+                    yield
+                else:
+                    if self._total is None:
+                        self._total = asyncio.Semaphore(self.total)
+                    async with self._total:
+                        yield
+        finally:
+            sem, count = self._keys[key]
+            if count == 1:
+                del self._keys[key]
+            else:
+                self._keys[key] = (sem, count - 1)
+
+    async def run(self, key: Hashable, aw: Awaitable[T]) -> T:
+        """
+        Await ``aw`` once a slot is available for the given key.
+        """
+        async with self.slot(key):
+            return await aw
+
+    def wrap(self, fn: AnyFunction[R]) -> Callable[..., Awaitable[R]]:
+        """
+        Limit calls to ``fn``, using the limiter's ``key`` function to get the key.
+        """
+        if self.key is None:
+            raise ValueError("key function required to wrap functions")
+        key = self.key
+
+        @functools.wraps(fn)
+        async def wrapper(*args: Any, **kwargs: Any) -> R:
+            async with self.slot(key(*args, **kwargs)):
+                return await maybe_await(fn(*args, **kwargs))
+
+        return wrapper
+
+
+class WeightedLimiter:
+    """
+    Limit the total weight, such as bytes or estimated cost, of concurrent calls.
+
+    Each call declares a weight, and calls run only while the total weight of
+    running calls fits within ``capacity``.  Waiting calls are admitted strictly in
+    arrival order, so a heavy call is never starved by a stream of lighter calls;
+    calls heavier than ``capacity`` are admitted alone once all others finish.
+
+    Use :meth:`wrap` to limit calls to a function or coroutine, with the weight
+    computed by ``weight`` from the call arguments, or :meth:`run` to limit any
+    awaitable with an explicit weight.  The results can be passed to :func:`gather`,
+    :func:`gather_iter`, :func:`as_completed`, or :func:`keyed_map`.
+
+    Example::
+
+        limiter = WeightedLimiter(64 * 2**20, weight=lambda path: path.stat().st_size)
+        upload_limited = limiter.wrap(upload)
+
+        await gather(*[upload_limited(path) for path in paths])
+
+    """
+
+    def __init__(
+        self, capacity: float, weight: Optional[Callable[..., float]] = None
+    ) -> None:
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+
+        self.capacity = capacity
+        self.weight = weight
+        self.used: float = 0
+        self._holders = 0
+        self._waiters: collections.deque[tuple[float, asyncio.Future[None]]]
+        self._waiters = collections.deque()
+
+    def _wake(self) -> None:
+        while self._waiters:
+            weight, fut = self._waiters[0]
+            if fut.done():  # pragma: no cover
+                self._waiters.popleft()
+                continue
+            if self._holders and self.used + weight > self.capacity:
+                break
+            self._waiters.popleft()
+            self._reserve(weight)
+            fut.set_result(None)
+
+    def _reserve(self, weight: float) -> None:
+        self.used += weight
+        self._holders += 1
+
+    async def acquire(self, weight: float) -> None:
+        """
+        Wait until ``weight`` fits within the remaining capacity, and reserve it.
+        """
+        if weight < 0:
+            raise ValueError("weight must not be negative")
+        weight = min(weight, self.capacity)
+
+        if not self._waiters and self.used + weight <= self.capacity:
+            self._reserve(weight)
+            return
+
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append((weight, fut))
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.cancelled():
+                self._waiters.remove((weight, fut))
+                self._wake()
+            else:
+                self.release(weight)
+            raise
+
+    def release(self, weight: float) -> None:
+        """
+        Release ``weight`` reserved by :meth:`acquire`.
+        """
+        self._holders -= 1
+        # avoid accumulating floating point error while idle
+        self.used = self.used - min(weight, self.capacity) if self._holders else 0
+        self._wake()
+
+    @contextlib.asynccontextmanager
+    async def slot(self, weight: float) -> AsyncIterator[None]:
+        """
+        Reserve ``weight`` until the context exits.
+        """
+        await self.acquire(weight)
+        try:
+            yield
+        finally:
+            self.release(weight)
+
+    async def run(self, weight: float, aw: Awaitable[T]) -> T:
+        """
+        Await ``aw`` once ``weight`` fits within the remaining capacity.
+        """
+        async with self.slot(weight):
+            return await aw
+
+    def wrap(self, fn: AnyFunction[R]) -> Callable[..., Awaitable[R]]:
+        """
+        Limit calls to ``fn``, using the limiter's ``weight`` function.
+        """
+        if self.weight is None:
+            raise ValueError("weight function required to wrap functions")
+        weight = self.weight
+
+        @functools.wraps(fn)
+        async def wrapper(*args: Any, **kwargs: Any) -> R:
+            async with self.slot(weight(*args, **kwargs)):
+                return await maybe_await(fn(*args, **kwargs))
+
+        return wrapper
+
+
+class PriorityExecutor(Generic[T]):
+    """
+    Run awaitables with limited concurrency, starting the highest priority first.
+
+    Submitted awaitables wait in a heap until one of the ``limit`` slots is free,
+    and are then started in priority order, lowest value first, with ties started
+    in the order they were submitted.  Each awaitable's priority can be given when
+    submitting, or computed by the ``priority`` function, and defaults to zero.
+
+    Iterate over the executor to get results as they complete.  Awaitables can be
+    submitted at any time, including while iterating; iteration ends once the
+    executor is closed and all submitted awaitables are done.  If an awaitable raises
+    an exception, and ``return_exceptions`` is ``False``, the executor is cancelled
+    and the exception is raised from iteration.
+
+    Using the executor as an async context manager closes it on exit, and waits for
+    any remaining awaitables, discarding results that weren't iterated over but
+    raising exceptions as iteration would.  If an exception was raised inside the
+    block, the executor is cancelled instead.
+
+    Example::
+
+        async with PriorityExecutor(limit=10) as executor:
+            for job in backlog:
+                executor.submit(process(job), priority=5)
+            executor.submit(process(urgent_job), priority=0)  # starts next
+            executor.close()
+
+            async for result in executor:
+                ...
+
+    """
+
+    def __init__(
+        self,
+        limit: int,
+        *,
+        priority: Optional[Callable[[Awaitable[T]], float]] = None,
+        return_exceptions: bool = False,
+    ) -> None:
+        if limit < 1:
+            raise ValueError("limit must be at least one")
+
+        self.limit = limit
+        self.priority = priority
+        self.return_exceptions = return_exceptions
+        self.closed = False
+        self._counter = itertools.count()
+        self._heap: list[tuple[float, int, Awaitable[T]]] = []
+        self._running: set[asyncio.Future[T]] = set()
+        self._completed: collections.deque[asyncio.Future[T]] = collections.deque()
+        self._wakeup = asyncio.Event()
+
+    async def __aenter__(self) -> "PriorityExecutor[T]":
+        return self
+
+    async def __aexit__(self, exc_type: Any, *args: Any) -> None:
+        if exc_type is None:
+            self.close()
+            # wait for work nobody iterated over, so it isn't left running
+            # unattended, and its errors are raised rather than lost
+            async for _ in self._results():
+                pass
+        else:
+            await self.cancel()
+
+    def __aiter__(self) -> AsyncIterator[T]:
+        return self._results()
+
+    def pending(self) -> int:
+        """
+        Number of submitted awaitables that have not started yet.
+        """
+        return len(self._heap)
+
+    def running(self) -> int:
+        """
+        Number of awaitables currently running.
+        """
+        return len(self._running)
+
+    def submit(self, aw: Awaitable[T], priority: Optional[float] = None) -> None:
+        """
+        Queue an awaitable to start once a slot is free, ordered by priority.
+        """
+        if self.closed:
+            if inspect.iscoroutine(aw):
+                aw.close()
+            raise RuntimeError("cannot submit to a closed executor")
+        if priority is None:
+            priority = self.priority(aw) if self.priority is not None else 0
+        heapq.heappush(self._heap, (priority, next(self._counter), aw))
+        self._start()
+
+    def close(self) -> None:
+        """
+        Stop accepting new awaitables; iteration ends once all are done.
+        """
+        self.closed = True
+        self._wakeup.set()
+
+    async def cancel(self) -> None:
+        """
+        Close the executor, cancel running tasks, and discard pending awaitables.
+        """
+        self.closed = True
+        for _, _, aw in self._heap:
+            if inspect.iscoroutine(aw):
+                aw.close()
+        self._heap.clear()
+        running = list(self._running)
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+        self._completed.clear()
+        self._wakeup.set()
+
+    def _start(self) -> None:
+        while self._heap and len(self._running) < self.limit:
+            _, _, aw = heapq.heappop(self._heap)
+            task = asyncio.ensure_future(aw)
+            self._running.add(task)
+            task.add_done_callback(self._done)
+
+    def _done(self, task: asyncio.Future[T]) -> None:
+        if task not in self._running:
+            return
+        self._running.discard(task)
+        self._completed.append(task)
+        self._wakeup.set()
+        self._start()
+
+    async def _results(self) -> AsyncIterator[T]:
+        while True:
+            while self._completed:
+                task = self._completed.popleft()
+                if task.cancelled():
+                    continue
+                if task.exception() is None:
+                    yield task.result()
+                elif self.return_exceptions:
+                    yield task.exception()  # type: ignore
+                else:
+                    await self.cancel()
+                    task.result()
+
+            if self.closed and not (self._heap or self._running):
+                return
+
+            self._wakeup.clear()
+            await self._wakeup.wait()
+
+
+_background: Optional[asyncio.AbstractEventLoop] = None
+_background_lock = threading.Lock()
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    global _background
+    with _background_lock:
+        if _background is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=loop.run_forever, name="aioitertools-loop", daemon=True
+            ).start()
+            _background = loop
+        return _background
+
+
+def _check_thread(loop: asyncio.AbstractEventLoop) -> None:
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    if running is loop:
+        raise RuntimeError("cannot wait on the background loop from its own thread")
+
+
+def run_sync(aw: Awaitable[T]) -> T:
+    """
+    Run an awaitable from synchronous code, and return its result.
+
+    Unlike :func:`asyncio.run`, the awaitable runs on a persistent event loop in a
+    background thread, so repeated calls don't pay for creating a new event loop.
+
+    Example::
+
+        values = run_sync(list(map(fetch, urls)))
+
+    """
+    loop = _background_loop()
+    try:
+        _check_thread(loop)
+    except RuntimeError:
+        if inspect.iscoroutine(aw):
+            aw.close()
+        raise
+
+    async def wrapper() -> T:
+        return await aw
+
+    return asyncio.run_coroutine_threadsafe(wrapper(), loop).result()
+
+
+def _iter_sync(
+    itr: AnyIterable[T], prefetch: int, loop: asyncio.AbstractEventLoop
+) -> Iterator[T]:
+    results: queue.SimpleQueue[tuple[list[T], Optional[BaseException]]]
+    results = queue.SimpleQueue()
+    size = max(1, prefetch // 4)
+    batch: list[T] = []
+    buffered = 0
+    space: Optional[asyncio.Event] = None
+
+    def flush() -> None:
+        nonlocal batch
+        if batch:
+            results.put((batch, None))
+            batch = []
+
+    def release(count: int) -> None:
+        nonlocal buffered
+        buffered -= count
+        if space is not None:
+            space.set()
+
+    async def produce() -> None:
+        nonlocal buffered, space
+        space = asyncio.Event()
+        it = aiter(itr)
+        error: BaseException = StopIteration()
+        try:
+            async for item in it:
+                while buffered >= prefetch:
+                    space.clear()
+                    await space.wait()
+                batch.append(item)
+                buffered += 1
+                if len(batch) >= size:
+                    flush()
+        except asyncio.CancelledError:
+            if isinstance(it, AsyncGenerator):
+                await it.aclose()
+            raise
+        except BaseException as e:
+            error = e
+        flush()
+        results.put(([], error))
+
+    task = asyncio.run_coroutine_threadsafe(produce(), loop)
+    try:
+        while True:
+            if results.empty():
+                loop.call_soon_threadsafe(flush)
+            items, error = results.get()
+            if items:
+                loop.call_soon_threadsafe(release, len(items))
+                yield from items
+            if isinstance(error, StopIteration):
+                return
+            if error is not None:
+                raise error
+    finally:
+        task.cancel()
+
+
+def iter_sync(itr: AnyIterable[T], *, prefetch: int = 256) -> Iterator[T]:
+    """
+    Consume any mixed iterable from synchronous code, as a standard iterator.
+
+    The iterable is consumed on a persistent event loop in a background thread.
+    Up to ``prefetch`` items are buffered ahead of the consumer, and handed over in
+    batches to keep thread wakeups infrequent; a partial batch is handed over
+    whenever the consumer is waiting.  If the iterator is closed early, consumption
+    stops, and async generators are closed.
+
+    Example::
+
+        def report(urls):
+            for page in iter_sync(map(fetch, urls)):
+                ...
+
+    """
+    if prefetch < 1:
+        raise ValueError("prefetch must be at least one")
+
+    loop = _background_loop()
+    _check_thread(loop)
+    return _iter_sync(itr, prefetch, loop)
+
+
+@contextlib.contextmanager
+def cooperative(
+    every: Optional[int] = None, interval: Optional[float] = 0.001
+) -> Iterator[None]:
+    """
+    Make iteration over standard iterables periodically yield to the event loop.
+
+    Async generators wrapping standard iterables, like those from
+    :func:`aioitertools.iter` and every function that uses it, never suspend, so a
+    pipeline over a large list blocks all other tasks until it finishes.  Within this
+    context, including tasks started from it, these generators instead yield to the
+    event loop after every ``every`` items, or after ``interval`` seconds have passed
+    since they last yielded, whichever comes first.  Pass ``yield_every`` or
+    ``yield_interval`` to :func:`aioitertools.iter` to override this per call.
+
+    Example::
+
+        with cooperative(interval=0.005):
+            async for row in map(transform, rows):
+                ...
+
+    """
+    if every is not None and every < 1:
+        raise ValueError("every must be at least one")
+    if interval is not None and interval <= 0:
+        raise ValueError("interval must be positive")
+    token = cooperative_defaults.set((every, interval))
+    try:
+        yield
+    finally:
+        cooperative_defaults.reset(token)
@@ -0,0 +1,9 @@
+# Copyright Amethyst Reese
+# Licensed under the MIT license
+
+"""
+Performance benchmarks for aioitertools.
+
+Run ``python -m aioitertools.benchmarks`` for the full suite, covering the public
+API, or run each module directly, eg ``python -m aioitertools.benchmarks.process_map``.
+"""
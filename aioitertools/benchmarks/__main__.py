@@ -0,0 +1,7 @@
+# Copyright Amethyst Reese
+# Licensed under the MIT license
+
+from .suite import main
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+# Copyright Amethyst Reese
+# Licensed under the MIT license
+
+"""
+Compare two sets of benchmark suite results, and flag regressions.
+
+Results are saved with ``python -m aioitertools.benchmarks --output FILE``.  Each
+benchmark's median time is compared, with a distribution-free confidence interval
+over its repeated samples.  A benchmark regressed only if the fast end of its
+interval is more than the threshold slower than the slow end of the baseline's
+interval, so ordinary drift between runs isn't flagged.  Exits with status 1 if any
+benchmark regressed, or 2 if the runs are not comparable, or have too few samples
+for the requested confidence.
+"""
+
+import argparse
+import json
+import math
+import statistics
+import sys
+from collections.abc import Sequence
+from typing import Any, NamedTuple, Optional
+
+FORMAT = 1
+
+# environment details that must match for timings to be comparable
+COMPATIBLE = ("implementation", "python_minor", "free_threaded", "loop", "machine")
+
+Key = tuple[str, str, int]
+
+
+class Comparison(NamedTuple):
+    name: str
+    input: str
+    size: int
+    baseline: float
+    baseline_interval: tuple[float, float]
+    current: float
+    current_interval: tuple[float, float]
+    threshold: float
+
+    @property
+    def delta(self) -> float:
+        """
+        Relative change in median time, positive when slower.
+        """
+        return self.current / self.baseline - 1 if self.baseline else 0.0
+
+    @property
+    def status(self) -> str:
+        """
+        Whether the intervals differ by more than the threshold in either direction.
+        """
+        if self.current_interval[0] > self.baseline_interval[1] * (1 + self.threshold):
+            return "regressed"
+        if self.current_interval[1] < self.baseline_interval[0] * (1 - self.threshold):
+            return "improved"
+        return ""
+
+
+def load(path: str) -> dict[str, Any]:
+    """
+    Load saved benchmark results, checking they are in a supported format.
+    """
+    with open(path) as f:
+        data = json.load(f)
+    if not isinstance(data, dict) or data.get("format") != FORMAT:
+        raise ValueError(f"{path}: unsupported benchmark results format")
+    return data
+
+
+def incompatible(baseline: dict[str, Any], current: dict[str, Any]) -> list[str]:
+    """
+    Describe each environment difference that makes two runs incomparable.
+    """
+    problems = []
+    for key in COMPATIBLE:
+        before = baseline.get(key)
+        after = current.get(key)
+        if before != after:
+            problems.append(f"{key}: {before} != {after}")
+    return problems
+
+
+def min_samples(confidence: float) -> int:
+    """
+    Fewest samples whose full range contains the median with ``confidence``.
+    """
+    if not 0 < confidence < 1:
+        raise ValueError("confidence must be between 0 and 1")
+    n = 1
+    while 1 - 2 / 2**n < confidence:
+        n += 1
+    return n
+
+
+def median_interval(
+    samples: Sequence[float], confidence: float = 0.95
+) -> tuple[float, float]:
+    """
+    Confidence interval for the median, from order statistics of the samples.
+
+    Picks the narrowest interval between two samples that contains the true median
+    with at least ``confidence`` probability.  Raises :class:`ValueError` if there
+    are fewer than :func:`min_samples` samples.
+    """
+    ordered = sorted(samples)
+    n = len(ordered)
+    needed = min_samples(confidence)
+    if n < needed:
+        raise ValueError(
+            f"{n} samples are too few for {confidence:.0%} confidence, "
+            f"at least {needed} are needed"
+        )
+
+    def coverage(k: int) -> float:
+        # probability the median lies between ordered[k] and ordered[n - 1 - k]
+        return sum(math.comb(n, i) for i in range(k + 1, n - k)) / 2**n
+
+    k = 0
+    while k + 1 < n - 2 - k and coverage(k + 1) >= confidence:
+        k += 1
+    return ordered[k], ordered[n - 1 - k]
+
+
+def compare(
+    baseline: dict[str, Any],
+    current: dict[str, Any],
+    *,
+    threshold: float = 0.1,
+    confidence: float = 0.95,
+) -> tuple[list[Comparison], list[Key], list[Key]]:
+    """
+    Compare results present in both runs, and list those missing from either.
+    """
+    before = {(r["name"], r["input"], r["size"]): r for r in baseline["results"]}
+    after = {(r["name"], r["input"], r["size"]): r for r in current["results"]}
+
+    comparisons = []
+    for key, result in after.items():
+        old = before.get(key)
+        if old is None:
+            continue
+        comparisons.append(
+            Comparison(
+                *key,
+                statistics.median(old["samples"]),
+                median_interval(old["samples"], confidence),
+                statistics.median(result["samples"]),
+                median_interval(result["samples"], confidence),
+                threshold,
+            )
+        )
+    added = [key for key in after if key not in before]
+    removed = [key for key in before if key not in after]
+    return comparisons, added, removed
+
+
+def _us(seconds: float) -> str:
+    return f"{seconds * 1e6:,.1f}"
+
+
+def report(
+    baseline: dict[str, Any],
+    current: dict[str, Any],
+    *,
+    threshold: float = 0.1,
+    confidence: float = 0.95,
+    force: bool = False,
+    verbose: bool = False,
+) -> int:
+    """
+    Print a comparison of two runs, and return the exit status.
+    """
+    problems = incompatible(baseline["meta"], current["meta"])
+    if problems:
+        print("results are not comparable:")
+        for problem in problems:
+            print(f"  {problem}")
+        if not force:
+            return 2
+
+    needed = min_samples(confidence)
+    fewest = min(
+        (
+            len(result["samples"])
+            for data in (baseline, current)
+            for result in data["results"]
+        ),
+        default=needed,
+    )
+    if fewest < needed:
+        print(
+            f"results have as few as {fewest} samples, but {confidence:.0%} "
+            f"confidence needs at least {needed}; rerun with --repeat {needed} "
+            "or lower --confidence"
+        )
+        return 2
+
+    print(
+        f"aioitertools {baseline['meta'].get('aioitertools')} -> "
+        f"{current['meta'].get('aioitertools')}, "
+        f"threshold {threshold:.0%}, {confidence:.0%} confidence"
+    )
+    comparisons, added, removed = compare(
+        baseline, current, threshold=threshold, confidence=confidence
+    )
+    print(
+        f"{'benchmark':<40} {'input':>10} {'size':>8} {'before us':>12} "
+        f"{'after us':>12} {'delta':>8}"
+    )
+    for c in comparisons:
+        if not (verbose or c.status):
+            continue
+        print(
+            f"{c.name:<40} {c.input:>10} {c.size:>8} {_us(c.baseline):>12} "
+            f"{_us(c.current):>12} {c.delta:>+8.1%} {c.status}".rstrip()
+        )
+    for name, kind, size in added:
+        print(f"{name:<40} {kind:>10} {size:>8} added")
+    for name, kind, size in removed:
+        print(f"{name:<40} {kind:>10} {size:>8} removed")
+
+    regressed = sum(c.status == "regressed" for c in comparisons)
+    improved = sum(c.status == "improved" for c in comparisons)
+    print(f"{len(comparisons)} compared, {regressed} regressed, {improved} improved")
+    return 1 if regressed else 0
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Add the options for comparing results to a parser.
+    """
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="relative slowdown to flag as a regression (default: 0.1)",
+    )
+    parser.add_argument(
+        "--confidence",
+        type=float,
+        default=0.95,
+        help="confidence level for the interval of each median (default: 0.95)",
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="compare runs from different setups"
+    )
+    parser.add_argument(
+        "-v", "--verbose", action="store_true", help="show unchanged benchmarks"
+    )
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m aioitertools.benchmarks.compare", description=__doc__
+    )
+    parser.add_argument("baseline", help="results to compare against")
+    parser.add_argument("current", help="results to check for regressions")
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    sys.exit(
+        report(
+            load(args.baseline),
+            load(args.current),
+            threshold=args.threshold,
+            confidence=args.confidence,
+            force=args.force,
+            verbose=args.verbose,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# Copyright Amethyst Reese
+# Licensed under the MIT license
+
+"""
+Gathering mostly-cached lookups, with and without eager task execution.
+
+Each lookup is a coroutine that returns immediately for a cache hit, and otherwise
+yields to the event loop once.  Eager execution only starts coroutines inline on
+Python 3.12 or newer; older versions still skip waiting on already-done futures.
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+
+from aioitertools.asyncio import as_completed, gather
+
+
+async def lookup(key: int, hit: bool) -> int:
+    if not hit:
+        await asyncio.sleep(0)
+    return key
+
+
+async def run(fn: str, items: int, hit_rate: float, eager: bool, seed: int) -> float:
+    rng = random.Random(seed)
+    hits = [rng.random() < hit_rate for _ in range(items)]
+    aws = [lookup(key, hit) for key, hit in enumerate(hits)]
+
+    before = time.perf_counter()
+    if fn == "gather":
+        await gather(*aws, limit=100, eager=eager)
+    else:
+        async for _ in as_completed(aws, eager=eager):
+            pass
+    return time.perf_counter() - before
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=20_000)
+    parser.add_argument("--hit-rates", type=float, nargs="+", default=[0.5, 0.9, 1.0])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"python {sys.version.split()[0]}")
+    for fn in ("gather", "as_completed"):
+        for hit_rate in args.hit_rates:
+            lazy = asyncio.run(run(fn, args.items, hit_rate, False, args.seed))
+            eager = asyncio.run(run(fn, args.items, hit_rate, True, args.seed))
+            print(
+                f"{fn:>12} hits={hit_rate:4.0%} "
+                f"lazy {args.items / lazy:10.1f} items/s "
+                f"eager {args.items / eager:10.1f} items/s "
+                f"speedup={lazy / eager:5.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
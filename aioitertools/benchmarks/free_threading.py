@@ -0,0 +1,70 @@
+# Copyright Amethyst Reese
+# Licensed under the MIT license
+
+"""
+CPU-bound mappers with the shared thread pool, with or without the GIL.
+
+Run this module with both a standard and a free-threaded (3.13t or newer) build of
+Python to compare: with the GIL, throughput stays flat as threads are added, while
+free-threaded builds should scale with the number of cores.
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import aioitertools as ait
+from aioitertools.helpers import free_threaded
+
+
+def work(n: int) -> int:
+    total = 0
+    for i in range(n):
+        total += i * i % 7
+    return total
+
+
+async def run_inline(items: int, cost: int) -> float:
+    before = time.perf_counter()
+    async for _ in ait.map(work, [cost] * items):
+        pass
+    return time.perf_counter() - before
+
+
+async def run_threads(threads: int, items: int, cost: int, chunksize: int) -> float:
+    with ThreadPoolExecutor(threads) as pool:
+        before = time.perf_counter()
+        async for _ in ait.map(
+            work, [cost] * items, executor=pool, chunksize=chunksize, limit=threads * 2
+        ):
+            pass
+        return time.perf_counter() - before
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--cost", type=int, default=20_000)
+    parser.add_argument("--chunksize", type=int, default=25)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    mode = "free-threaded" if free_threaded() else "gil"
+    print(f"python {sys.version.split()[0]} ({mode})")
+
+    baseline = asyncio.run(run_inline(args.items, args.cost))
+    print(f"inline     {args.items / baseline:10.1f} items/s")
+    for threads in args.threads:
+        duration = asyncio.run(
+            run_threads(threads, args.items, args.cost, args.chunksize)
+        )
+        print(
+            f"threads={threads:<2} {args.items / duration:10.1f} items/s "
+            f"speedup={baseline / duration:5.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# Copyright Amethyst Reese
+# Licensed under the MIT license
+
+"""
+Scaling of :func:`aioitertools.map` with a process pool executor.
+
+Runs a CPU-bound function over a range of inputs with 1, 2, 4, and 8 worker
+processes, for both the fork and spawn start methods where available, and
+reports throughput and speedup relative to a single worker.
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import aioitertools as ait
+
+
+def work(n: int) -> int:
+    total = 0
+    for i in range(n):
+        total += i * i % 7
+    return total
+
+
+async def run(
+    workers: int, method: str, items: int, cost: int, chunksize: int
+) -> float:
+    context = multiprocessing.get_context(method)
+    with ProcessPoolExecutor(workers, mp_context=context) as pool:
+        # start the workers before timing
+        await ait.list(ait.map(work, [0] * workers, executor=pool))
+
+        before = time.perf_counter()
+        async for _ in ait.map(
+            work, [cost] * items, executor=pool, chunksize=chunksize, limit=workers * 2
+        ):
+            pass
+        return time.perf_counter() - before
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--cost", type=int, default=20_000)
+    parser.add_argument("--chunksize", type=int, default=25)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    for method in multiprocessing.get_all_start_methods():
+        if method == "forkserver":
+            continue
+        baseline = 0.0
+        for workers in args.workers:
+            duration = asyncio.run(
+                run(workers, method, args.items, args.cost, args.chunksize)
+            )
+            baseline = baseline or duration
+            print(
+                f"{method:>5} workers={workers:<2} "
+                f"{args.items / duration:10.1f} items/s "
+                f"speedup={baseline / duration:5.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,504 @@
+# Copyright Amethyst Reese
+# Licensed under the MIT license
+
+"""
+Concurrency helpers under simulated latency, on a virtual clock.
+
+Synthetic sources and services sleep for delays drawn from a latency distribution,
+with optional jitter and error rates.  Everything runs on an event loop whose clock
+jumps to the next scheduled timer whenever the loop is idle, so simulating hours of
+traffic takes a fraction of a second, and runs with the same seeds give the same
+results.  For each helper, reports throughput, p50 and p99 latency from the time
+each item was available until its result was delivered, and the calls in flight.
+"""
+
+import argparse
+import asyncio
+import bisect
+import math
+import random
+import selectors
+from collections.abc import AsyncIterator, Awaitable, Coroutine, Sequence
+from typing import Any, Callable, NamedTuple, Optional, Union
+
+import aioitertools as ait
+import aioitertools.asyncio as aio
+from aioitertools.types import T
+
+Latency = Callable[[random.Random], float]
+
+
+def fixed(seconds: float) -> Latency:
+    """
+    Always take ``seconds``.
+    """
+    return lambda rng: seconds
+
+
+def exponential(mean: float) -> Latency:
+    """
+    Exponentially distributed delays, like independent arrivals, with the given mean.
+    """
+    return lambda rng: rng.expovariate(1 / mean)
+
+
+def pareto(minimum: float, alpha: float = 1.5) -> Latency:
+    """
+    Heavy-tailed delays of at least ``minimum``; lower ``alpha`` gives a longer tail.
+    """
+    return lambda rng: minimum * rng.paretovariate(alpha)
+
+
+class _VirtualSelector(selectors.BaseSelector):
+    # advances the loop's clock instead of blocking when waiting only on timers
+
+    def __init__(self, loop: "VirtualClockLoop") -> None:
+        self._loop = loop
+        self._selector = selectors.DefaultSelector()
+
+    def register(self, fileobj: Any, events: int, data: Any = None) -> Any:
+        return self._selector.register(fileobj, events, data)
+
+    def unregister(self, fileobj: Any) -> Any:
+        return self._selector.unregister(fileobj)
+
+    def modify(self, fileobj: Any, events: int, data: Any = None) -> Any:
+        return self._selector.modify(fileobj, events, data)
+
+    def select(self, timeout: Optional[float] = None) -> Any:
+        ready = self._selector.select(0)
+        if ready or timeout == 0:
+            return ready
+        if timeout is None:
+            # nothing scheduled, so wait for real events, like thread wakeups
+            return self._selector.select(None)
+        self._loop.advance(timeout)
+        return []
+
+    def close(self) -> None:
+        self._selector.close()
+
+    def get_map(self) -> Any:
+        return self._selector.get_map()
+
+
+class VirtualClockLoop(asyncio.SelectorEventLoop):
+    """
+    Event loop with a virtual clock, advanced to the next timer instead of sleeping.
+
+    Callbacks, including those run by ``asyncio.sleep`` and timeouts, run in the
+    same order as on a real event loop, but the clock only moves when every task is
+    waiting.  Work in threads or other processes takes no virtual time.
+    """
+
+    def __init__(self) -> None:
+        self._now = 0.0
+        super().__init__(_VirtualSelector(self))
+
+    def time(self) -> float:
+        return self._now
+
+    def advance(self, seconds: float) -> None:
+        """
+        Move the clock forward by ``seconds``.
+        """
+        self._now += seconds
+
+
+def simulate(main: Coroutine[Any, Any, T]) -> T:
+    """
+    Run a coroutine to completion on a new virtual clock event loop.
+
+    Example::
+
+        elapsed = simulate(asyncio.sleep(3600))  # returns immediately
+
+    """
+    loop = VirtualClockLoop()
+    try:
+        return loop.run_until_complete(main)
+    finally:
+        try:
+            loop.run_until_complete(loop.shutdown_asyncgens())
+        finally:
+            loop.close()
+
+
+def _delay(rng: random.Random, latency: Latency, jitter: float) -> float:
+    delay = latency(rng)
+    if jitter:
+        delay *= rng.uniform(1 - jitter, 1 + jitter)
+    return max(delay, 0.0)
+
+
+class SimulatedError(Exception):
+    """
+    Raised by a :class:`Service` call chosen to fail.
+    """
+
+
+class Service:
+    """
+    Synthetic sink, like a remote API: each call sleeps, then returns its argument.
+
+    Each delay is drawn from ``latency``, then scaled by a random factor within
+    ``jitter`` of one.  Calls fail with :class:`SimulatedError` after their delay
+    with probability ``error_rate``.  Tracks the number of calls in flight over time.
+
+    Example::
+
+        service = Service(pareto(0.01), error_rate=0.01, seed=1)
+        results = simulate(gather(*[service(i) for i in range(1000)], limit=20))
+
+    """
+
+    def __init__(
+        self,
+        latency: Latency,
+        *,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 0,
+    ) -> None:
+        if not 0 <= jitter <= 1:
+            raise ValueError("jitter must be between 0 and 1")
+        if not 0 <= error_rate <= 1:
+            raise ValueError("error_rate must be between 0 and 1")
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.profile: list[tuple[float, int]] = []
+
+    def _track(self, change: int) -> None:
+        self.in_flight += change
+        self.profile.append((asyncio.get_running_loop().time(), self.in_flight))
+
+    async def __call__(self, item: T) -> T:
+        delay = _delay(self.rng, self.latency, self.jitter)
+        fail = self.rng.random() < self.error_rate
+        self.calls += 1
+        self._track(1)
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            self._track(-1)
+        if fail:
+            self.errors += 1
+            raise SimulatedError(item)
+        return item
+
+    async def settle(self, item: T) -> Union[T, SimulatedError]:
+        """
+        Call the service, returning the error instead of raising it.
+        """
+        try:
+            return await self(item)
+        except SimulatedError as e:
+            return e
+
+    def in_flight_between(self, start: float, end: float) -> tuple[int, float]:
+        """
+        Highest and time-weighted mean number of calls in flight during the interval.
+        """
+        if end <= start:
+            return 0, 0.0
+        times = [t for t, _ in self.profile]
+        index = bisect.bisect_right(times, start)
+        level = self.profile[index - 1][1] if index else 0
+        highest, area, previous = level, 0.0, start
+        for when, count in self.profile[index:]:
+            if when >= end:
+                break
+            area += level * (when - previous)
+            level, previous = count, when
+            highest = max(highest, level)
+        area += level * (end - previous)
+        return highest, area / (end - start)
+
+
+class Source:
+    """
+    Synthetic async iterable of ``count`` integers, each arriving after a delay.
+
+    Items count up from ``start``.  Records the time each item was yielded in
+    ``arrivals``, which can be shared between sources with distinct items.
+    """
+
+    def __init__(
+        self,
+        count: int,
+        latency: Latency,
+        *,
+        jitter: float = 0.0,
+        seed: int = 0,
+        start: int = 0,
+        arrivals: Optional[dict[int, float]] = None,
+    ) -> None:
+        self.count = count
+        self.latency = latency
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+        self.start = start
+        self.arrivals = {} if arrivals is None else arrivals
+
+    async def __aiter__(self) -> AsyncIterator[int]:
+        loop = asyncio.get_running_loop()
+        for item in range(self.start, self.start + self.count):
+            await asyncio.sleep(_delay(self.rng, self.latency, self.jitter))
+            self.arrivals[item] = loop.time()
+            yield item
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """
+    Nearest-rank percentile, with ``q`` between 0 and 100.
+    """
+    if not values:
+        return math.nan
+    ordered = sorted(values)
+    rank = math.ceil(q / 100 * len(ordered))
+    return ordered[max(rank, 1) - 1]
+
+
+class Stats(NamedTuple):
+    name: str
+    items: int
+    errors: int
+    elapsed: float
+    p50: float
+    p99: float
+    max_in_flight: int
+    mean_in_flight: float
+    profile: list[float]
+
+    @property
+    def throughput(self) -> float:
+        return self.items / self.elapsed if self.elapsed else math.inf
+
+
+class Recorder:
+    """
+    Record when each result is delivered, relative to when its item was available.
+    """
+
+    def __init__(self, service: Service) -> None:
+        self.service = service
+        self.loop = asyncio.get_running_loop()
+        self.start = self.loop.time()
+        self.latencies: list[float] = []
+        self.errors = 0
+
+    def deliver(self, result: Any, available: Optional[float] = None) -> None:
+        if isinstance(result, SimulatedError):
+            self.errors += 1
+        if available is None:
+            available = self.start
+        self.latencies.append(self.loop.time() - available)
+
+    def stats(self, name: str, buckets: int = 10) -> Stats:
+        end = self.loop.time()
+        highest, mean = self.service.in_flight_between(self.start, end)
+        step = (end - self.start) / buckets
+        profile = [
+            self.service.in_flight_between(
+                self.start + i * step, self.start + (i + 1) * step
+            )[1]
+            for i in range(buckets)
+        ]
+        return Stats(
+            name,
+            len(self.latencies),
+            self.errors,
+            end - self.start,
+            percentile(self.latencies, 50),
+            percentile(self.latencies, 99),
+            highest,
+            mean,
+            profile,
+        )
+
+
+Scenario = Callable[[Service, "Workload"], Awaitable[Stats]]
+
+
+class Workload(NamedTuple):
+    items: int
+    limit: int
+    arrival: Latency
+    sources: int
+    jitter: float
+    seed: int
+
+    def source(
+        self,
+        index: int = 0,
+        items: Optional[int] = None,
+        arrivals: Optional[dict[int, float]] = None,
+    ) -> Source:
+        items = self.items if items is None else items
+        return Source(
+            items,
+            self.arrival,
+            jitter=self.jitter,
+            seed=self.seed + index + 1,
+            start=index * items,
+            arrivals=arrivals,
+        )
+
+
+def _item(result: Any) -> int:
+    return result.args[0] if isinstance(result, SimulatedError) else result
+
+
+async def gather_limit(service: Service, workload: Workload) -> Stats:
+    recorder = Recorder(service)
+    calls = [service.settle(i) for i in range(workload.items)]
+    for result in await aio.gather(*calls, limit=workload.limit):
+        recorder.deliver(result)
+    return recorder.stats(f"gather(limit={workload.limit})")
+
+
+async def as_completed(service: Service, workload: Workload) -> Stats:
+    recorder = Recorder(service)
+    calls = [service.settle(i) for i in range(workload.items)]
+    async for result in aio.as_completed(calls):
+        recorder.deliver(result)
+    return recorder.stats("as_completed")
+
+
+async def as_generated(service: Service, workload: Workload) -> Stats:
+    recorder = Recorder(service)
+    items = workload.items // workload.sources
+    arrivals: dict[int, float] = {}
+    sources = [workload.source(i, items, arrivals) for i in range(workload.sources)]
+    pipelines = [ait.map(service.settle, source) for source in sources]
+    async for result in aio.as_generated(pipelines):
+        recorder.deliver(result, arrivals[_item(result)])
+    return recorder.stats(f"as_generated({workload.sources})")
+
+
+async def keyed_map(service: Service, workload: Workload) -> Stats:
+    recorder = Recorder(service)
+    source = workload.source()
+
+    def key(item: int) -> int:
+        return item % workload.sources
+
+    results: AsyncIterator[Union[int, SimulatedError]] = aio.keyed_map(
+        service.settle, source, key=key, limit=workload.limit
+    )
+    async for result in results:
+        recorder.deliver(result, source.arrivals[_item(result)])
+    return recorder.stats(f"keyed_map(limit={workload.limit})")
+
+
+async def map_sequential(service: Service, workload: Workload) -> Stats:
+    recorder = Recorder(service)
+    source = workload.source()
+    async for result in ait.map(service.settle, source):
+        recorder.deliver(result, source.arrivals[_item(result)])
+    return recorder.stats("map")
+
+
+SCENARIOS: dict[str, Scenario] = {
+    "gather": gather_limit,
+    "as_completed": as_completed,
+    "as_generated": as_generated,
+    "keyed_map": keyed_map,
+    "map": map_sequential,
+}
+
+DISTRIBUTIONS: dict[str, Callable[[float], Latency]] = {
+    "fixed": fixed,
+    "exponential": exponential,
+    "pareto": pareto,
+}
+
+
+def run(
+    scenario: Scenario,
+    workload: Workload,
+    latency: Latency,
+    *,
+    error_rate: float = 0.0,
+) -> Stats:
+    """
+    Simulate a scenario with a fresh service, on a new virtual clock.
+    """
+    service = Service(
+        latency, jitter=workload.jitter, error_rate=error_rate, seed=workload.seed
+    )
+    return simulate(scenario(service, workload))  # type: ignore[arg-type]
+
+
+def format_stats(stats: Stats) -> str:
+    profile = " ".join(f"{level:.0f}" for level in stats.profile)
+    return (
+        f"{stats.name:<24} {stats.items:>7} {stats.errors:>6} "
+        f"{stats.throughput:>10,.1f} {stats.p50 * 1000:>9,.1f} "
+        f"{stats.p99 * 1000:>9,.1f} {stats.max_in_flight:>6} "
+        f"{stats.mean_in_flight:>7.1f}  {profile}"
+    )
+
+
+HEADER = (
+    f"{'helper':<24} {'items':>7} {'errors':>6} {'items/s':>10} {'p50 ms':>9} "
+    f"{'p99 ms':>9} {'max':>6} {'mean':>7}  in flight over time"
+)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m aioitertools.benchmarks.simulation", description=__doc__
+    )
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument(
+        "--distribution", choices=sorted(DISTRIBUTIONS), default="exponential"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.05, help="service latency in seconds"
+    )
+    parser.add_argument(
+        "--arrival",
+        type=float,
+        default=0.001,
+        help="mean seconds between items from each source",
+    )
+    parser.add_argument("--sources", type=int, default=10)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--error-rate", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "scenarios", nargs="*", help=f"any of {', '.join(SCENARIOS)} (default: all)"
+    )
+    args = parser.parse_args(argv)
+    for name in args.scenarios:
+        if name not in SCENARIOS:
+            parser.error(f"unknown scenario {name!r}")
+
+    latency = DISTRIBUTIONS[args.distribution](args.latency)
+    workload = Workload(
+        args.items,
+        args.limit,
+        exponential(args.arrival),
+        args.sources,
+        args.jitter,
+        args.seed,
+    )
+    print(
+        f"{args.items} items, {args.distribution} latency {args.latency}s, "
+        f"{args.error_rate:.1%} errors, {args.jitter:.0%} jitter"
+    )
+    print(HEADER)
+    for name in args.scenarios or SCENARIOS:
+        stats = run(SCENARIOS[name], workload, latency, error_rate=args.error_rate)
+        print(format_stats(stats), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,791 @@
+# Copyright Amethyst Reese
+# Licensed under the MIT license
+
+"""
+Throughput, per-item overhead, and peak memory of the public aioitertools API.
+
+Each benchmark runs with sync iterables, async iterables, and/or mixed awaitables,
+at each requested size, and is compared with the equivalent standard library
+function or loop where one exists.  Results can be saved as JSON, and compared with
+earlier results using ``--compare`` or :mod:`aioitertools.benchmarks.compare`.
+"""
+
+import argparse
+import asyncio
+import builtins
+import inspect
+import itertools
+import json
+import operator
+import platform
+import statistics
+import sys
+import sysconfig
+import time
+import tracemalloc
+from collections.abc import AsyncIterator, Sequence
+from typing import Any, Callable, NamedTuple, Optional
+
+import aioitertools as ait
+import aioitertools.asyncio as aio
+import aioitertools.more_itertools as mit
+from aioitertools.__version__ import __version__
+from . import compare
+
+FORMAT = compare.FORMAT
+
+Factory = Callable[[], Any]
+BenchFunction = Callable[[Factory], Any]
+
+
+class Benchmark(NamedTuple):
+    name: str
+    fn: BenchFunction
+    inputs: tuple[str, ...]
+    baseline: Optional[BenchFunction]
+    baseline_input: str
+
+
+BENCHMARKS: list[Benchmark] = []
+
+
+def benchmark(
+    name: str,
+    *,
+    inputs: tuple[str, ...] = ("sync", "async"),
+    baseline: Optional[BenchFunction] = None,
+    baseline_input: str = "sync",
+) -> Callable[[BenchFunction], BenchFunction]:
+    """
+    Register a benchmark function, called with a factory for each kind of input.
+
+    Coroutine functions run on an event loop; the baseline is only run with
+    ``baseline_input``, and may be either.
+    """
+
+    def decorator(fn: BenchFunction) -> BenchFunction:
+        BENCHMARKS.append(Benchmark(name, fn, inputs, baseline, baseline_input))
+        return fn
+
+    return decorator
+
+
+def _double(x: int) -> int:
+    return x * 2
+
+
+async def _adouble(x: int) -> int:
+    return x * 2
+
+
+def _negative(x: int) -> bool:
+    return x < 0
+
+
+def _odd(x: int) -> bool:
+    return x % 2 == 1
+
+
+def _tens(x: int) -> int:
+    return x // 10
+
+
+async def _value(x: int) -> int:
+    return x
+
+
+async def _agen(data: list[int]) -> AsyncIterator[int]:
+    for x in data:
+        yield x
+
+
+def factory(kind: str, size: int) -> Factory:
+    """
+    Return a function creating a fresh input of ``size`` items of the given kind.
+    """
+    data = builtins.list(range(1, size + 1))
+    if kind == "sync":
+        return lambda: data
+    if kind == "async":
+        return lambda: _agen(data)
+    if kind == "mixed":
+        return lambda: [_value(x) if x % 2 else x for x in data]
+    if kind == "awaitables":
+        return lambda: [_value(x) for x in data]
+    raise ValueError(f"unknown input kind {kind!r}")
+
+
+async def _drain(itr: Any) -> None:
+    async for _ in itr:
+        pass
+
+
+def _consume(itr: Any) -> None:
+    for _ in itr:
+        pass
+
+
+# builtins
+
+
+@benchmark(
+    "builtins.all",
+    inputs=("sync", "async", "mixed"),
+    baseline=lambda make: builtins.all(make()),
+)
+async def _all(make: Factory) -> None:
+    await ait.all(make())
+
+
+@benchmark("builtins.any", baseline=lambda make: builtins.any(map(_negative, make())))
+async def _any(make: Factory) -> None:
+    await ait.any(ait.map(_negative, make()))
+
+
+@benchmark("builtins.enumerate", baseline=lambda make: builtins.list(enumerate(make())))
+async def _enumerate(make: Factory) -> None:
+    await ait.list(ait.enumerate(make()))
+
+
+@benchmark("builtins.iter", baseline=lambda make: _consume(iter(make())))
+async def _iter(make: Factory) -> None:
+    await _drain(ait.iter(make()))
+
+
+@benchmark("builtins.list", baseline=lambda make: builtins.list(make()))
+async def _list(make: Factory) -> None:
+    await ait.list(make())
+
+
+@benchmark("builtins.map", baseline=lambda make: builtins.list(map(_double, make())))
+async def _map(make: Factory) -> None:
+    await ait.list(ait.map(_double, make()))
+
+
+@benchmark("builtins.map_coroutine")
+async def _map_coroutine(make: Factory) -> None:
+    await ait.list(ait.map(_adouble, make()))
+
+
+@benchmark("builtins.max", baseline=lambda make: builtins.max(make()))
+async def _max(make: Factory) -> None:
+    await ait.max(make())
+
+
+@benchmark("builtins.min", baseline=lambda make: builtins.min(make()))
+async def _min(make: Factory) -> None:
+    await ait.min(make())
+
+
+def _next_baseline(make: Factory) -> None:
+    it = iter(make())
+    while next(it, None) is not None:
+        pass
+
+
+@benchmark("builtins.next", baseline=_next_baseline)
+async def _next(make: Factory) -> None:
+    it = ait.iter(make())
+    while await ait.next(it, None) is not None:
+        pass
+
+
+@benchmark("builtins.set", baseline=lambda make: builtins.set(make()))
+async def _set(make: Factory) -> None:
+    await ait.set(make())
+
+
+@benchmark("builtins.sum", baseline=lambda make: builtins.sum(make()))
+async def _sum(make: Factory) -> None:
+    await ait.sum(make())
+
+
+@benchmark("builtins.tuple", baseline=lambda make: builtins.tuple(make()))
+async def _tuple(make: Factory) -> None:
+    await ait.tuple(make())
+
+
+@benchmark("builtins.zip", baseline=lambda make: builtins.list(zip(make(), make())))
+async def _zip(make: Factory) -> None:
+    await ait.list(ait.zip(make(), make()))
+
+
+# itertools
+
+
+@benchmark(
+    "itertools.accumulate",
+    baseline=lambda make: builtins.list(itertools.accumulate(make())),
+)
+async def _accumulate(make: Factory) -> None:
+    await ait.list(ait.accumulate(make()))
+
+
+@benchmark(
+    "itertools.batched",
+    baseline=(
+        (lambda make: builtins.list(itertools.batched(make(), 10)))  # type: ignore
+        if sys.version_info >= (3, 12)
+        else None
+    ),
+)
+async def _batched(make: Factory) -> None:
+    await ait.list(ait.batched(make(), 10))
+
+
+@benchmark(
+    "itertools.chain",
+    baseline=lambda make: builtins.list(itertools.chain(make(), make())),
+)
+async def _chain(make: Factory) -> None:
+    await ait.list(ait.chain(make(), make()))
+
+
+def _combinatoric(name: str, fn: Callable[..., Any], *args: Any) -> None:
+    # these yield far more items than their input, so stop after as many items
+
+    def baseline(make: Factory) -> None:
+        _consume(zip(make(), fn(make(), *args)))
+
+    @benchmark(f"itertools.{name}", baseline=baseline)
+    async def bench(make: Factory) -> None:
+        await _drain(ait.zip(make(), getattr(ait, name)(make(), *args)))
+
+
+_combinatoric("combinations", itertools.combinations, 2)
+_combinatoric(
+    "combinations_with_replacement", itertools.combinations_with_replacement, 2
+)
+_combinatoric("permutations", itertools.permutations, 2)
+
+
+@benchmark(
+    "itertools.compress",
+    baseline=lambda make: builtins.list(itertools.compress(make(), make())),
+)
+async def _compress(make: Factory) -> None:
+    await ait.list(ait.compress(make(), make()))
+
+
+@benchmark(
+    "itertools.count",
+    inputs=("sync",),
+    baseline=lambda make: _consume(zip(make(), itertools.count())),
+)
+async def _count(make: Factory) -> None:
+    await _drain(ait.zip(make(), ait.count()))
+
+
+@benchmark(
+    "itertools.cycle",
+    baseline=lambda make: _consume(zip(make(), itertools.cycle([1, 2, 3]))),
+)
+async def _cycle(make: Factory) -> None:
+    await _drain(ait.zip(make(), ait.cycle([1, 2, 3])))
+
+
+@benchmark(
+    "itertools.dropwhile",
+    baseline=lambda make: _consume(itertools.dropwhile(_odd, make())),
+)
+async def _dropwhile(make: Factory) -> None:
+    await _drain(ait.dropwhile(_odd, make()))
+
+
+@benchmark(
+    "itertools.filterfalse",
+    baseline=lambda make: builtins.list(itertools.filterfalse(_odd, make())),
+)
+async def _filterfalse(make: Factory) -> None:
+    await ait.list(ait.filterfalse(_odd, make()))
+
+
+@benchmark(
+    "itertools.groupby",
+    baseline=lambda make: [
+        (k, builtins.list(g)) for k, g in itertools.groupby(make(), _tens)
+    ],
+)
+async def _groupby(make: Factory) -> None:
+    await ait.list(ait.groupby(make(), _tens))
+
+
+@benchmark(
+    "itertools.islice",
+    baseline=lambda make: builtins.list(itertools.islice(make(), 0, None, 2)),
+)
+async def _islice(make: Factory) -> None:
+    await ait.list(ait.islice(make(), 0, None, 2))
+
+
+@benchmark(
+    "itertools.product",
+    baseline=lambda make: _consume(zip(make(), itertools.product(make(), repeat=2))),
+)
+async def _product(make: Factory) -> None:
+    await _drain(ait.zip(make(), ait.product(make(), repeat=2)))
+
+
+@benchmark(
+    "itertools.repeat",
+    inputs=("sync",),
+    baseline=lambda make: _consume(zip(make(), itertools.repeat(1))),
+)
+async def _repeat(make: Factory) -> None:
+    await _drain(ait.zip(make(), ait.repeat(1)))
+
+
+@benchmark(
+    "itertools.starmap",
+    baseline=lambda make: builtins.list(map(operator.add, make(), make())),
+)
+async def _starmap(make: Factory) -> None:
+    await ait.list(ait.starmap(operator.add, ait.zip(make(), make())))
+
+
+@benchmark(
+    "itertools.takewhile",
+    baseline=lambda make: builtins.list(itertools.takewhile(bool, make())),
+)
+async def _takewhile(make: Factory) -> None:
+    await ait.list(ait.takewhile(bool, make()))
+
+
+def _tee_baseline(make: Factory) -> None:
+    a, b = itertools.tee(make())
+    _consume(a)
+    _consume(b)
+
+
+@benchmark("itertools.tee", baseline=_tee_baseline)
+async def _tee(make: Factory) -> None:
+    a, b = ait.tee(make())
+    await _drain(a)
+    await _drain(b)
+
+
+@benchmark(
+    "itertools.zip_longest",
+    baseline=lambda make: builtins.list(itertools.zip_longest(make(), make())),
+)
+async def _zip_longest(make: Factory) -> None:
+    await ait.list(ait.zip_longest(make(), make()))
+
+
+# more_itertools
+
+
+@benchmark(
+    "more_itertools.before_and_after",
+    baseline=lambda make: builtins.list(itertools.takewhile(_odd, make())),
+)
+async def _before_and_after(make: Factory) -> None:
+    before, after = await mit.before_and_after(_odd, make())
+    await _drain(before)
+    await _drain(after)
+
+
+def _chunked_baseline(make: Factory) -> None:
+    it = iter(make())
+    while builtins.list(itertools.islice(it, 10)):
+        pass
+
+
+@benchmark("more_itertools.chunked", baseline=_chunked_baseline)
+async def _chunked(make: Factory) -> None:
+    await ait.list(mit.chunked(make(), 10))
+
+
+@benchmark(
+    "more_itertools.take",
+    baseline=lambda make: builtins.list(itertools.islice(make(), 1_000_000)),
+)
+async def _take(make: Factory) -> None:
+    await mit.take(1_000_000, make())
+
+
+# asyncio
+
+
+async def _as_completed_baseline(make: Factory) -> None:
+    for fut in asyncio.as_completed(make()):
+        await fut
+
+
+@benchmark(
+    "asyncio.as_completed",
+    inputs=("awaitables",),
+    baseline=_as_completed_baseline,
+    baseline_input="awaitables",
+)
+async def _as_completed(make: Factory) -> None:
+    await _drain(aio.as_completed(make()))
+
+
+@benchmark("asyncio.as_generated", inputs=("async",))
+async def _as_generated(make: Factory) -> None:
+    await _drain(aio.as_generated([make(), make()]))
+
+
+async def _gather_baseline(make: Factory) -> None:
+    await asyncio.gather(*make())
+
+
+@benchmark(
+    "asyncio.gather",
+    inputs=("awaitables",),
+    baseline=_gather_baseline,
+    baseline_input="awaitables",
+)
+async def _gather(make: Factory) -> None:
+    await aio.gather(*make())
+
+
+@benchmark("asyncio.gather_limit", inputs=("awaitables",))
+async def _gather_limit(make: Factory) -> None:
+    await aio.gather(*make(), limit=10)
+
+
+@benchmark("asyncio.gather_iter", inputs=("sync", "async", "mixed"))
+async def _gather_iter(make: Factory) -> None:
+    await aio.gather_iter(make())
+
+
+@benchmark("asyncio.keyed_map")
+async def _keyed_map(make: Factory) -> None:
+    await _drain(aio.keyed_map(_double, make(), key=_tens))
+
+
+@benchmark("asyncio.cooperative")
+async def _cooperative(make: Factory) -> None:
+    with aio.cooperative(every=100, interval=None):
+        await ait.list(make())
+
+
+@benchmark("asyncio.iter_sync")
+def _iter_sync(make: Factory) -> None:
+    _consume(aio.iter_sync(make()))
+
+
+@benchmark("asyncio.run_sync", inputs=("awaitables",))
+def _run_sync(make: Factory) -> None:
+    for aw in make():
+        aio.run_sync(aw)
+
+
+@benchmark("asyncio.KeyedLimiter", inputs=("awaitables",))
+async def _keyed_limiter(make: Factory) -> None:
+    limiter = aio.KeyedLimiter(per_key=10)
+    await aio.gather(*[limiter.run(i % 10, aw) for i, aw in enumerate(make())])
+
+
+@benchmark("asyncio.WeightedLimiter", inputs=("awaitables",))
+async def _weighted_limiter(make: Factory) -> None:
+    limiter = aio.WeightedLimiter(10)
+    await aio.gather(*[limiter.run(1, aw) for aw in make()])
+
+
+@benchmark("asyncio.PriorityExecutor", inputs=("awaitables",))
+async def _priority_executor(make: Factory) -> None:
+    executor: aio.PriorityExecutor[int]
+    async with aio.PriorityExecutor(10) as executor:
+        for i, aw in enumerate(make()):
+            executor.submit(aw, priority=i % 3)
+        executor.close()
+        await _drain(executor)
+
+
+class Result(NamedTuple):
+    name: str
+    input: str
+    size: int
+    loops: int
+    samples: list[float]
+    baseline_samples: Optional[list[float]]
+    peak_bytes: Optional[int]
+
+    @property
+    def median(self) -> float:
+        return statistics.median(self.samples)
+
+    @property
+    def items_per_sec(self) -> float:
+        return self.size / self.median if self.median else float("inf")
+
+    @property
+    def overhead_ns(self) -> Optional[float]:
+        if not self.baseline_samples:
+            return None
+        baseline = statistics.median(self.baseline_samples)
+        return (self.median - baseline) / self.size * 1e9
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "input": self.input,
+            "size": self.size,
+            "loops": self.loops,
+            "samples": self.samples,
+            "median": self.median,
+            "items_per_sec": self.items_per_sec,
+            "baseline_samples": self.baseline_samples,
+            "overhead_ns": self.overhead_ns,
+            "peak_bytes": self.peak_bytes,
+        }
+
+
+def _close(loop: asyncio.AbstractEventLoop) -> None:
+    # finalize async generators left open by benchmarks that stop early
+    try:
+        loop.run_until_complete(loop.shutdown_asyncgens())
+    finally:
+        loop.close()
+
+
+def _timer(fn: BenchFunction, make: Factory) -> Callable[[int], float]:
+    if inspect.iscoroutinefunction(fn):
+        loop = asyncio.new_event_loop()
+
+        async def run(loops: int) -> float:
+            before = time.perf_counter()
+            for _ in range(loops):
+                await fn(make)
+            return time.perf_counter() - before
+
+        def timer(loops: int) -> float:
+            return loop.run_until_complete(run(loops))
+
+        timer.close = lambda: _close(loop)  # type: ignore[attr-defined]
+        return timer
+
+    def sync_timer(loops: int) -> float:
+        before = time.perf_counter()
+        for _ in range(loops):
+            fn(make)
+        return time.perf_counter() - before
+
+    return sync_timer
+
+
+def calibrate(fn: BenchFunction, make: Factory, min_time: float) -> int:
+    """
+    Loops per sample needed for each sample of ``fn`` to take at least ``min_time``.
+    """
+    timer = _timer(fn, make)
+    try:
+        loops = 1
+        while True:
+            # like timeit's autorange
+            elapsed = timer(loops)
+            if elapsed >= min_time:
+                return loops
+            loops = loops * 10 if elapsed * 10 < min_time else loops * 2
+    finally:
+        close = getattr(timer, "close", None)
+        if close is not None:
+            close()
+
+
+def sample(fn: BenchFunction, make: Factory, loops: int) -> float:
+    """
+    Time ``loops`` calls of ``fn``, returning the seconds per call.
+    """
+    timer = _timer(fn, make)
+    try:
+        return timer(loops) / loops
+    finally:
+        close = getattr(timer, "close", None)
+        if close is not None:
+            close()
+
+
+def peak_memory(fn: BenchFunction, make: Factory) -> int:
+    """
+    Peak bytes allocated while running ``fn`` once, as traced by tracemalloc.
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        tracemalloc.start()
+        try:
+            tracemalloc.reset_peak()
+            result = fn(make)
+            if inspect.isawaitable(result):
+                loop.run_until_complete(result)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    finally:
+        _close(loop)
+    return peak
+
+
+def run(
+    benchmarks: Sequence[Benchmark],
+    sizes: Sequence[int],
+    *,
+    repeat: int = 10,
+    min_time: float = 0.05,
+    memory: bool = True,
+    report: Optional[Callable[[Result], Any]] = None,
+) -> list[Result]:
+    """
+    Run each benchmark with each of its input kinds, at each size.
+
+    Samples are taken round-robin across every case rather than back to back, so
+    slow drift in machine speed during the run widens the spread of each case's
+    samples, instead of shifting whichever cases happened to be running.
+    """
+    cases: list[tuple[BenchFunction, Factory]] = []
+    plan = []
+    for bench in benchmarks:
+        for size in sizes:
+            baseline = None
+            if bench.baseline is not None:
+                baseline = len(cases)
+                cases.append((bench.baseline, factory(bench.baseline_input, size)))
+            for kind in bench.inputs:
+                plan.append((bench, size, kind, len(cases), baseline))
+                cases.append((bench.fn, factory(kind, size)))
+
+    loops = [calibrate(fn, make, min_time) for fn, make in cases]
+    samples: list[list[float]] = [[] for _ in cases]
+    for _ in range(repeat):
+        for (fn, make), count, times in zip(cases, loops, samples):
+            times.append(sample(fn, make, count))
+
+    results = []
+    for bench, size, kind, index, baseline in plan:
+        fn, make = cases[index]
+        result = Result(
+            bench.name,
+            kind,
+            size,
+            loops[index],
+            samples[index],
+            None if baseline is None else samples[baseline],
+            peak_memory(fn, make) if memory else None,
+        )
+        if report is not None:
+            report(result)
+        results.append(result)
+    return results
+
+
+def metadata(**kwargs: Any) -> dict[str, Any]:
+    """
+    Describe the environment, for checking whether two runs are comparable.
+    """
+    loop = asyncio.new_event_loop()
+    loop.close()
+    return {
+        "aioitertools": __version__,
+        "python": platform.python_version(),
+        "python_minor": "{}.{}".format(*sys.version_info),
+        "implementation": platform.python_implementation(),
+        "free_threaded": bool(sysconfig.get_config_var("Py_GIL_DISABLED")),
+        "loop": f"{type(loop).__module__}.{type(loop).__qualname__}",
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "timestamp": time.time(),
+        **kwargs,
+    }
+
+
+def format_result(result: Result) -> str:
+    overhead = result.overhead_ns
+    peak = result.peak_bytes
+    return (
+        f"{result.name:<40} {result.input:>10} {result.size:>8} "
+        f"{result.items_per_sec:>14,.0f} "
+        f"{'-' if overhead is None else f'{overhead:,.0f}':>12} "
+        f"{'-' if peak is None else f'{peak / 1024:,.1f}':>12}"
+    )
+
+
+HEADER = (
+    f"{'benchmark':<40} {'input':>10} {'size':>8} {'items/s':>14} "
+    f"{'+ns/item':>12} {'peak KiB':>12}"
+)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m aioitertools.benchmarks", description=__doc__
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10_000])
+    parser.add_argument(
+        "--repeat", type=int, default=10, help="samples per benchmark (default: 10)"
+    )
+    parser.add_argument(
+        "--min-time", type=float, default=0.05, help="minimum seconds per sample"
+    )
+    parser.add_argument(
+        "-k",
+        "--filter",
+        action="append",
+        default=[],
+        help="only run benchmarks with names containing this string",
+    )
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc")
+    parser.add_argument("--list", action="store_true", help="list benchmarks")
+    parser.add_argument("-o", "--output", help="save results to this JSON file")
+    parser.add_argument(
+        "--compare",
+        metavar="BASELINE",
+        help="compare results to those saved in this JSON file",
+    )
+    compare.add_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.compare and args.repeat < compare.min_samples(args.confidence):
+        parser.error(
+            f"--repeat must be at least {compare.min_samples(args.confidence)} "
+            f"for {args.confidence:.0%} confidence"
+        )
+
+    benchmarks = [
+        bench
+        for bench in BENCHMARKS
+        if not args.filter or builtins.any(f in bench.name for f in args.filter)
+    ]
+    if args.list:
+        for bench in benchmarks:
+            print(f"{bench.name:<40} {', '.join(bench.inputs)}")
+        return
+
+    print(f"aioitertools {__version__}, python {platform.python_version()}")
+    print(HEADER)
+    results = run(
+        benchmarks,
+        args.sizes,
+        repeat=args.repeat,
+        min_time=args.min_time,
+        memory=not args.no_memory,
+        report=lambda result: print(format_result(result), flush=True),
+    )
+
+    data = {
+        "format": FORMAT,
+        "meta": metadata(sizes=args.sizes, repeat=args.repeat, min_time=args.min_time),
+        "results": [result.to_dict() for result in results],
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(data, f, indent=2)
+        print(f"saved {len(results)} results to {args.output}")
+
+    if args.compare:
+        print()
+        sys.exit(
+            compare.report(
+                compare.load(args.compare),
+                data,
+                threshold=args.threshold,
+                confidence=args.confidence,
+                force=args.force,
+                verbose=args.verbose,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -13,12 +13,19 @@ use with `await`, `async for`, etc.
 
 import asyncio
 import builtins
+import collections
+import threading
+import time
 from collections.abc import AsyncIterable, AsyncIterator, Iterable
+from concurrent.futures import Executor
 from enum import Enum
 from typing import Any, Callable, cast, Optional, overload, Union
 
 from . import asyncio as ait_asyncio
-from .helpers import maybe_await, Orderable
+from .helpers import cooperative_defaults, cpu_count, maybe_await, Orderable
+from .metrics import current_hook, meter_input, meter_output
+from .profiling import instrument
+from .tracing import current_tracer
 from .types import (
     AnyIterable,
     AnyIterator,
@@ -72,7 +79,89 @@ async def any(itr: AnyIterable[MaybeAwaitable[Any]]) -> bool:
     return builtins.any(await ait_asyncio.gather_iter(itr))
 
 
-def iter(itr: AnyIterable[T]) -> AsyncIterator[T]:
+async def _thread_iter(itr: Iterable[T], prefetch: int) -> AsyncIterator[T]:
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue[builtins.tuple[builtins.list[T], Optional[BaseException]]]
+    queue = asyncio.Queue()
+    size = builtins.max(1, prefetch // 4)
+    slots = threading.Semaphore(-(-prefetch // size))
+    hungry = threading.Event()
+    stop = threading.Event()
+
+    def worker() -> None:
+        it = builtins.iter(itr)
+        try:
+            while not stop.is_set():
+                slots.acquire()
+                batch: builtins.list[T] = []
+                error: Optional[BaseException] = None
+                try:
+                    while not stop.is_set():
+                        batch.append(builtins.next(it))
+                        # hand over a partial batch if the consumer is waiting,
+                        # so that slow iterators don't delay each item
+                        if len(batch) >= size or hungry.is_set():
+                            break
+                except StopIteration:
+                    error = StopAsyncIteration()
+                except BaseException as e:
+                    error = e
+                loop.call_soon_threadsafe(queue.put_nowait, (batch, error))
+                if error is not None:
+                    break
+        except RuntimeError:  # pragma: no cover
+            pass  # event loop closed before the consumer finished
+        finally:
+            close = getattr(it, "close", None)
+            if stop.is_set() and close is not None:
+                close()
+
+    threading.Thread(target=worker, name="aioitertools-iter", daemon=True).start()
+
+    try:
+        while True:
+            if queue.empty():
+                hungry.set()
+            batch, error = await queue.get()
+            hungry.clear()
+            slots.release()
+            for item in batch:
+                yield item
+            if isinstance(error, StopAsyncIteration):
+                return
+            if error is not None:
+                raise error
+    finally:
+        stop.set()
+        slots.release()
+
+
+async def _cooperative_iter(
+    itr: Iterable[T], every: Optional[int], interval: Optional[float]
+) -> AsyncIterator[T]:
+    clock = time.monotonic
+    count = 0
+    deadline = clock() + interval if interval is not None else 0.0
+    for item in itr:
+        yield item
+        count += 1
+        if (every is not None and count >= every) or (
+            interval is not None and clock() >= deadline
+        ):
+            await asyncio.sleep(0)
+            count = 0
+            if interval is not None:
+                deadline = clock() + interval
+
+
+def iter(
+    itr: AnyIterable[T],
+    *,
+    thread: bool = False,
+    prefetch: int = 256,
+    yield_every: Optional[int] = None,
+    yield_interval: Optional[float] = None,
+) -> AsyncIterator[T]:
     """
     Get an async iterator from any mixed iterable.
 
@@ -81,11 +170,29 @@ def iter(itr: AnyIterable[T]) -> AsyncIterator[T]:
     Standard iterables will be wrapped in an async generator yielding
     each item in the iterable in the same order.
 
+    If ``thread`` is ``True``, standard iterables are instead consumed in a
+    background thread, so that iterators that block (like database cursors or
+    paginated network requests) don't block the event loop.  Up to ``prefetch`` items
+    are buffered ahead of the consumer, and handed over in batches.  If the async
+    iterator is closed early, the thread stops and closes the original iterator.
+
+    Otherwise, standard iterables never suspend, and will block other tasks on the
+    event loop until fully consumed.  If ``yield_every`` or ``yield_interval`` is
+    given, the async generator instead yields to the event loop after that many
+    items, or that many seconds since it last yielded, whichever comes first.  The
+    defaults for these can be set with :func:`aioitertools.asyncio.cooperative`.
+
     Examples::
 
         async for value in iter(range(10)):
             ...
 
+        async for row in iter(cursor, thread=True, prefetch=1000):
+            ...
+
+        async for value in iter(big_list, yield_interval=0.001):
+            ...
+
     """
     if isinstance(itr, AsyncIterator):
         return itr
@@ -93,6 +200,20 @@ def iter(itr: AnyIterable[T]) -> AsyncIterator[T]:
     if isinstance(itr, AsyncIterable):
         return itr.__aiter__()
 
+    if thread:
+        if prefetch < 1:
+            raise ValueError("prefetch must be at least one")
+        return _thread_iter(cast(Iterable[T], itr), prefetch)
+
+    if yield_every is None and yield_interval is None:
+        yield_every, yield_interval = cooperative_defaults.get()
+    elif (yield_every is not None and yield_every < 1) or (
+        yield_interval is not None and yield_interval <= 0
+    ):
+        raise ValueError("yield_every and yield_interval must be positive")
+    if yield_every is not None or yield_interval is not None:
+        return _cooperative_iter(cast(Iterable[T], itr), yield_every, yield_interval)
+
     async def gen() -> AsyncIterator[T]:
         for item in cast(Iterable[T], itr):
             yield item
@@ -196,19 +317,137 @@ async def enumerate(
         index += 1
 
 
-async def map(fn: Callable[[T], R], itr: AnyIterable[T]) -> AsyncIterator[R]:
+def _call_chunk(fn: Callable[[T], R], chunk: builtins.list[T]) -> builtins.list[R]:
+    return [fn(item) for item in chunk]
+
+
+async def _executor_map(
+    fn: Callable[[T], R],
+    itr: AnyIterable[T],
+    executor: Executor,
+    chunksize: int,
+    limit: int,
+    ordered: bool,
+) -> AsyncIterator[R]:
+    loop = asyncio.get_running_loop()
+    it = iter(itr)
+    pending: collections.deque[asyncio.Future[builtins.list[R]]] = collections.deque()
+    exhausted = False
+
+    try:
+        while True:
+            while not exhausted and len(pending) < limit:
+                chunk: builtins.list[T] = []
+                async for item in it:
+                    chunk.append(item)
+                    if len(chunk) >= chunksize:
+                        break
+                else:
+                    exhausted = True
+                if chunk:
+                    pending.append(
+                        loop.run_in_executor(executor, _call_chunk, fn, chunk)
+                    )
+
+            if not pending:
+                break
+
+            if ordered:
+                for value in await pending.popleft():
+                    yield value
+            else:
+                done, _ = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for fut in done:
+                    pending.remove(fut)
+                for fut in done:
+                    for value in fut.result():
+                        yield value
+
+    finally:
+        for fut in pending:
+            fut.cancel()
+
+
+async def _apply(fn: Callable[[T], R], itr: AnyIterable[T]) -> AsyncIterator[R]:
+    async for item in iter(itr):
+        yield await maybe_await(fn(item))
+
+
+async def map(
+    fn: Callable[[T], R],
+    itr: AnyIterable[T],
+    *,
+    executor: Optional[Executor] = None,
+    chunksize: int = 1,
+    limit: Optional[int] = None,
+    ordered: bool = True,
+) -> AsyncIterator[R]:
     """
     Modify item of a mixed iterable using the given function or coroutine.
 
+    If an ``executor`` is given, like a :class:`~concurrent.futures.ThreadPoolExecutor`,
+    ``fn`` must be a standard function, and will be called on the executor instead
+    of blocking the event loop.  Items are submitted in chunks of ``chunksize`` items,
+    with up to ``limit`` chunks in flight at once (default: the number of CPUs), and
+    results are yielded in the same order as the original items.  If ``ordered`` is
+    ``False``, results from each chunk are yielded as soon as that chunk completes.
+
+    With a :class:`~concurrent.futures.ProcessPoolExecutor`, ``fn``, items, and
+    results must be picklable; larger chunks amortize the cost of pickling.
+
     Example::
 
         async for response in map(func, data):
             ...
 
+        with ThreadPoolExecutor(8) as pool:
+            async for row in map(parse, lines, executor=pool, chunksize=100):
+                ...
+
+        with ProcessPoolExecutor() as pool:
+            async for digest in map(hash_file, paths, executor=pool, ordered=False):
+                ...
+
     """
-    # todo: queue items eagerly
-    async for item in iter(itr):
-        yield await maybe_await(fn(item))
+    hook = current_hook()
+    if hook is not None:
+        itr = meter_input(hook, "map", iter(itr))
+    tracer = current_tracer()
+    if tracer is not None:
+        span = tracer.start("map")
+        itr = span.input(iter(itr))
+
+    if executor is not None:
+        if chunksize < 1:
+            raise ValueError("chunksize must be at least one")
+        if limit is None:
+            limit = cpu_count()
+        if limit < 1:
+            raise ValueError("limit must be at least one")
+        values = _executor_map(fn, itr, executor, chunksize, limit, ordered)
+    else:
+        fn = instrument("map", fn)
+        if hook is None and tracer is None:
+            # todo: queue items eagerly
+            async for item in iter(itr):
+                yield await maybe_await(fn(item))
+            return
+        call: Callable[[T], Any] = fn
+        if tracer is not None:
+            call = span.wrap("map.call", fn)
+        values = _apply(call, itr)
+
+    if hook is not None:
+        values = meter_output(hook, "map", values)
+    if tracer is not None:
+        values = span.output(values)
+    try:
+        async for value in values:
+            yield value
+    finally:
+        await values.aclose()  # type: ignore[attr-defined]
 
 
 @overload
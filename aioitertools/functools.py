@@ -0,0 +1,671 @@
+# Copyright Amethyst Reese
+# Licensed under the MIT license
+
+"""
+Async-aware wrappers for functions and coroutines.
+
+Each wrapper accepts standard functions and coroutines alike, and produces
+coroutine functions that can be passed directly to :func:`aioitertools.map`,
+:func:`aioitertools.starmap`, or used to build awaitables for
+:func:`aioitertools.asyncio.gather`.
+
+Provisional library.  Must be imported as `aioitertools.functools`.
+"""
+
+import asyncio
+import functools
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Hashable, Mapping, Sequence
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Generic, NamedTuple, Optional, overload, Union
+
+from .helpers import cpu_count, free_threaded, maybe_await
+from .types import AnyFunction, BatchFunction, K, R
+
+_KWARGS = object()
+
+
+def _make_key(args: tuple[Any, ...], kwargs: dict[str, Any]) -> Hashable:
+    if kwargs:
+        return (*args, _KWARGS, *sorted(kwargs.items()))
+    return args
+
+
+class _InFlight(Generic[R]):
+    """
+    Track in-flight calls by key, sharing one task between concurrent callers.
+
+    :meta private:
+    """
+
+    def __init__(self) -> None:
+        self.tasks: dict[Hashable, asyncio.Future[R]] = {}
+
+    def _done(self, key: Hashable, task: asyncio.Future[R]) -> None:
+        if self.tasks.get(key) is task:
+            del self.tasks[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved if every caller went away
+
+    async def run(self, key: Hashable, thunk: Callable[[], Awaitable[R]]) -> R:
+        task = self.tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(thunk())
+            self.tasks[key] = task
+            task.add_done_callback(functools.partial(self._done, key))
+
+        # shield the shared task so that one cancelled caller doesn't cancel
+        # the result for every other caller waiting on the same key
+        return await asyncio.shield(task)
+
+
+class Batcher(Generic[K, R]):
+    """
+    Coalesce concurrent single-key calls into batched calls of ``fn``.
+
+    Each call with a single key is queued, and after ``delay`` seconds (or once
+    ``max_size`` distinct keys are queued) ``fn`` is called once with a list of
+    all queued keys.  ``fn`` may be a function or coroutine, and must return either
+    a sequence of results in the same order as the given keys, or a mapping of keys
+    to results.  Results are then fanned back out to each individual caller.
+
+    With the default ``delay`` of zero, all calls made within the same iteration of
+    the event loop are batched together, which covers tasks started by
+    :func:`aioitertools.asyncio.gather`.  Keys must be hashable; duplicate keys in
+    the same batch are only passed to ``fn`` once.  Exceptions raised by ``fn`` are
+    raised to every caller in that batch.
+
+    Only concurrent calls are batched.  :func:`aioitertools.map` awaits each call
+    before making the next, so it gets no batching: every item is a batch of one,
+    and waits ``delay`` seconds.  To map over many keys, use
+    :func:`~aioitertools.asyncio.gather_iter` with a ``limit`` instead, or to stream
+    results, :func:`~aioitertools.asyncio.keyed_map` with a ``limit`` and a small
+    ``delay``, since it starts calls as items arrive.
+
+    Example::
+
+        async def fetch_many(ids):
+            return await db.fetch_users(ids)  # one round trip
+
+        fetch_one = Batcher(fetch_many, max_size=500)
+
+        users = await gather(*[fetch_one(id) for id in user_ids])
+
+        # streaming results, with up to 500 lookups in flight
+        fetch_one = Batcher(fetch_many, max_size=500, delay=0.005)
+        async for user in keyed_map(fetch_one, user_ids, key=str, limit=500):
+            ...
+
+    """
+
+    def __init__(
+        self,
+        fn: BatchFunction[K, R],
+        *,
+        max_size: int = 100,
+        delay: float = 0,
+    ) -> None:
+        if max_size < 1:
+            raise ValueError("max_size must be at least one")
+        if delay < 0:
+            raise ValueError("delay must not be negative")
+
+        self.fn = fn
+        self.max_size = max_size
+        self.delay = delay
+        self._pending: dict[K, asyncio.Future[R]] = {}
+        self._handle: Optional[Union[asyncio.Handle, asyncio.TimerHandle]] = None
+        self._tasks: set[asyncio.Future[None]] = set()
+
+    async def __call__(self, key: K) -> R:
+        loop = asyncio.get_running_loop()
+        fut = self._pending.get(key)
+        if fut is None:
+            fut = loop.create_future()
+            self._pending[key] = fut
+            if len(self._pending) >= self.max_size:
+                self._dispatch()
+            elif self._handle is None:
+                if self.delay:
+                    self._handle = loop.call_later(self.delay, self._dispatch)
+                else:
+                    self._handle = loop.call_soon(self._dispatch)
+
+        # shield the shared future so that one cancelled caller doesn't cancel
+        # the result for every other caller waiting on the same key
+        return await asyncio.shield(fut)
+
+    def _dispatch(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+        batch, self._pending = self._pending, {}
+        if batch:
+            task = asyncio.ensure_future(self._load(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _load(self, batch: dict[K, asyncio.Future[R]]) -> None:
+        keys = list(batch)
+        values: Optional[Mapping[K, R]] = None
+        error: Optional[Exception] = None
+        try:
+            results: Union[Sequence[R], Mapping[K, R]]
+            results = await maybe_await(self.fn(keys))
+            if isinstance(results, Mapping):
+                values = results
+            else:
+                if len(results) != len(keys):
+                    raise ValueError(
+                        f"batch function returned {len(results)} results "
+                        f"for {len(keys)} keys"
+                    )
+                values = dict(zip(keys, results))
+        except Exception as e:
+            error = e
+        finally:
+            # resolve every caller, even if fn raised CancelledError, or the load
+            # was cancelled, so that no caller is left waiting forever
+            for key, fut in batch.items():
+                if fut.done():  # pragma: no cover
+                    continue
+                if error is not None:
+                    fut.set_exception(error)
+                elif values is None:
+                    fut.cancel()
+                elif key in values:
+                    fut.set_result(values[key])
+                else:
+                    fut.set_exception(KeyError(key))
+
+
+def singleflight(
+    fn: AnyFunction[R], *, key: Optional[Callable[..., Hashable]] = None
+) -> Callable[..., Awaitable[R]]:
+    """
+    Share one in-flight call between concurrent callers with the same key.
+
+    While a call to ``fn`` is running, any other call with the same key waits for,
+    and returns the result of, that first call instead of calling ``fn`` again.
+    Once the call completes, the next call with that key will call ``fn`` again;
+    nothing is cached.  Exceptions are raised to every waiting caller.
+
+    The key defaults to the positional and keyword arguments, which must be hashable.
+    Pass a ``key`` function, called with the same arguments as ``fn``, to choose a
+    different key.  The returned coroutine function can be used with
+    :func:`aioitertools.map` or :func:`aioitertools.starmap`, or to build awaitables
+    for :func:`aioitertools.asyncio.gather`.
+
+    Example::
+
+        @singleflight
+        async def fetch(url):
+            ...
+
+        # only one request is made for each distinct url
+        pages = await gather(*[fetch(url) for url in urls])
+
+        @functools.partial(singleflight, key=lambda user: user.id)
+        async def load_profile(user):
+            ...
+
+    """
+    flights: _InFlight[R] = _InFlight()
+
+    @functools.wraps(fn)
+    async def wrapper(*args: Any, **kwargs: Any) -> R:
+        k = key(*args, **kwargs) if key is not None else _make_key(args, kwargs)
+        return await flights.run(k, lambda: maybe_await(fn(*args, **kwargs)))
+
+    return wrapper
+
+
+def threaded(
+    fn: Callable[..., R], *, executor: Optional[Executor] = None
+) -> Callable[..., Awaitable[R]]:
+    """
+    Run a blocking standard function on an executor instead of the event loop.
+
+    Returns a coroutine function that calls ``fn`` on the given ``executor``, or
+    the event loop's default thread pool executor.  Use a bounded
+    :class:`~concurrent.futures.ThreadPoolExecutor` to limit how many calls can run
+    at once.  Useful for predicates and key functions passed to
+    :func:`aioitertools.filterfalse`, :func:`aioitertools.takewhile`,
+    :func:`aioitertools.groupby`, or :func:`aioitertools.accumulate`; for
+    :func:`aioitertools.map`, prefer its ``executor`` parameter, which submits
+    items in chunks.
+
+    Example::
+
+        pool = ThreadPoolExecutor(4)
+
+        async for key, group in groupby(paths, key=threaded(checksum, executor=pool)):
+            ...
+
+    """
+
+    @functools.wraps(fn)
+    async def wrapper(*args: Any, **kwargs: Any) -> R:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            executor, functools.partial(fn, *args, **kwargs)
+        )
+
+    return wrapper
+
+
+_thread_pool: Optional[ThreadPoolExecutor] = None
+_thread_pool_lock = threading.Lock()
+
+
+def thread_pool() -> ThreadPoolExecutor:
+    """
+    Shared thread pool executor, sized to the number of usable CPUs.
+
+    On free-threaded builds of Python (3.13t and newer), standard functions passed
+    to :func:`aioitertools.map` or :func:`aioitertools.starmap` with this executor,
+    or wrapped with :func:`threaded`, run in parallel across all cores.  With the
+    GIL enabled, threads still keep blocking calls off the event loop, but CPU-bound
+    functions will not run any faster.
+
+    Only the user functions run on the pool's threads; iterators, queues, and other
+    state used by aioitertools stay on the event loop thread, and results are handed
+    back through thread-safe futures.
+
+    Example::
+
+        if free_threaded():
+            async for value in map(crunch, data, executor=thread_pool(), chunksize=64):
+                ...
+
+    """
+    global _thread_pool
+    with _thread_pool_lock:
+        if _thread_pool is None:
+            mode = "free-threaded" if free_threaded() else "gil"
+            _thread_pool = ThreadPoolExecutor(
+                cpu_count(), thread_name_prefix=f"aioitertools-{mode}"
+            )
+        return _thread_pool
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: Optional[int]
+    currsize: int
+    nbytes: int
+
+
+class _Entry(NamedTuple):
+    expires: Optional[float]
+    nbytes: int
+    error: bool
+    value: Any
+
+
+class CachedFunction(Generic[R]):
+    """
+    Coroutine function wrapper returned by :func:`lru_cache`.
+
+    :meta private:
+    """
+
+    def __init__(
+        self,
+        fn: AnyFunction[R],
+        *,
+        maxsize: Optional[int],
+        maxbytes: Optional[int],
+        ttl: Optional[float],
+        negative_ttl: Optional[float],
+        sizeof: Callable[[Any], int],
+        key: Optional[Callable[..., Hashable]],
+    ) -> None:
+        functools.update_wrapper(self, fn)
+        self.fn = fn
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.sizeof = sizeof
+        self.key = key
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self.cache: OrderedDict[Hashable, _Entry] = OrderedDict()
+        self.flights: _InFlight[R] = _InFlight()
+
+    def cache_info(self) -> CacheInfo:
+        """
+        Report cache hits, misses, and current size in entries and bytes.
+        """
+        return CacheInfo(
+            self.hits, self.misses, self.maxsize, len(self.cache), self.nbytes
+        )
+
+    def cache_clear(self) -> None:
+        """
+        Clear the cache and statistics.
+        """
+        self.cache.clear()
+        self.hits = self.misses = self.nbytes = 0
+
+    def _evict(self, key: Hashable) -> None:
+        entry = self.cache.pop(key)
+        self.nbytes -= entry.nbytes
+
+    def _store(self, key: Hashable, value: Any, error: bool) -> None:
+        ttl = self.negative_ttl if error else self.ttl
+        if error and ttl is None:
+            return
+
+        nbytes = self.sizeof(value) if self.maxbytes is not None else 0
+        if self.maxbytes is not None and nbytes > self.maxbytes:
+            return
+
+        expires = time.monotonic() + ttl if ttl is not None else None
+        if key in self.cache:
+            self._evict(key)
+        self.cache[key] = _Entry(expires, nbytes, error, value)
+        self.nbytes += nbytes
+
+        while (self.maxsize is not None and len(self.cache) > self.maxsize) or (
+            self.maxbytes is not None and self.nbytes > self.maxbytes
+        ):
+            self._evict(next(iter(self.cache)))
+
+    async def _call(self, key: Hashable, args: Any, kwargs: Any) -> R:
+        try:
+            value = await maybe_await(self.fn(*args, **kwargs))
+        except Exception as e:
+            self._store(key, e, error=True)
+            raise
+        self._store(key, value, error=False)
+        return value
+
+    async def __call__(self, *args: Any, **kwargs: Any) -> R:
+        if self.key is not None:
+            key = self.key(*args, **kwargs)
+        else:
+            key = _make_key(args, kwargs)
+
+        entry = self.cache.get(key)
+        if entry is not None:
+            if entry.expires is None or entry.expires > time.monotonic():
+                self.hits += 1
+                self.cache.move_to_end(key)
+                if entry.error:
+                    # drop the traceback from earlier hits, or each raise would
+                    # grow it, and keep every frame it passed through alive
+                    raise entry.value.with_traceback(None)
+                return entry.value
+            self._evict(key)
+
+        self.misses += 1
+        return await self.flights.run(key, lambda: self._call(key, args, kwargs))
+
+
+@overload
+def lru_cache(fn: AnyFunction[R]) -> CachedFunction[R]:  # pragma: nocover
+    pass
+
+
+@overload
+def lru_cache(
+    *,
+    maxsize: Optional[int] = 128,
+    maxbytes: Optional[int] = None,
+    ttl: Optional[float] = None,
+    negative_ttl: Optional[float] = None,
+    sizeof: Callable[[Any], int] = sys.getsizeof,
+    key: Optional[Callable[..., Hashable]] = None,
+) -> Callable[[AnyFunction[R]], CachedFunction[R]]:  # pragma: nocover
+    pass
+
+
+def lru_cache(
+    fn: Optional[AnyFunction[R]] = None,
+    *,
+    maxsize: Optional[int] = 128,
+    maxbytes: Optional[int] = None,
+    ttl: Optional[float] = None,
+    negative_ttl: Optional[float] = None,
+    sizeof: Callable[[Any], int] = sys.getsizeof,
+    key: Optional[Callable[..., Hashable]] = None,
+) -> Any:
+    """
+    Memoize results of a function or coroutine, with LRU and TTL eviction.
+
+    Like :func:`functools.lru_cache`, but always returns a coroutine function, and
+    works with both standard functions and coroutines.  Concurrent calls for a key
+    that is not yet cached share one in-flight call, like :func:`singleflight`.
+
+    The least recently used entries are evicted once there are more than ``maxsize``
+    entries, or once the total size of cached results is more than ``maxbytes``, as
+    measured by ``sizeof``.  Either limit can be ``None`` to disable it.  Entries
+    expire ``ttl`` seconds after being cached, or never if ``ttl`` is ``None``.
+
+    Exceptions are not cached by default; set ``negative_ttl`` to cache and re-raise
+    exceptions for that many seconds.  The key defaults to the positional and keyword
+    arguments, which must be hashable; pass ``key`` to choose a different key.
+
+    Hit and miss statistics are available from ``cache_info()``, and the cache can be
+    emptied with ``cache_clear()``.
+
+    Example::
+
+        @lru_cache(maxsize=10_000, ttl=60)
+        async def lookup(user_id):
+            ...
+
+        async for user_id, group in groupby(events, key=lookup):
+            ...
+
+        lookup.cache_info()
+        -> CacheInfo(hits=9500, misses=500, maxsize=10000, currsize=500, nbytes=0)
+
+    """
+    if maxsize is not None and maxsize < 0:
+        raise ValueError("maxsize must not be negative")
+    if maxbytes is not None and maxbytes < 0:
+        raise ValueError("maxbytes must not be negative")
+
+    def decorator(fn: AnyFunction[R]) -> CachedFunction[R]:
+        return CachedFunction(
+            fn,
+            maxsize=maxsize,
+            maxbytes=maxbytes,
+            ttl=ttl,
+            negative_ttl=negative_ttl,
+            sizeof=sizeof,
+            key=key,
+        )
+
+    if fn is not None:
+        return decorator(fn)
+    return decorator
+
+
+class DiskCache:
+    """
+    Persistent on-disk cache of function results, stored in a SQLite database.
+
+    Use an instance as a decorator to memoize a function or coroutine, with a ``key``
+    function that returns a stable ``str`` or ``bytes`` hash of the call arguments.
+    On a cache hit, the stored result is returned without calling the function, so
+    rerunning a long :func:`aioitertools.map` pipeline after a failure only repeats
+    the work that had not yet finished.  Results must be picklable, and exceptions
+    are never cached.
+
+    New results and access times are buffered in memory and written to the database
+    in batches of ``batch_size``, or when :meth:`flush` or :meth:`close` is called.
+    If ``maxbytes`` is given, the least recently used results are evicted after each
+    batch is written, until the total size of stored results fits.
+
+    Each decorated function gets its own namespace in the database, defaulting to the
+    function's qualified name.  SQLite queries run synchronously on the event loop;
+    lookups by key are fast, and batching keeps writes infrequent.
+
+    Example::
+
+        cache = DiskCache("results.db", maxbytes=2**30)
+
+        @cache(key=lambda url: hashlib.sha256(url.encode()).hexdigest())
+        async def fetch(url):
+            ...
+
+        with cache:
+            async for page in map(fetch, urls):
+                ...
+
+    """
+
+    def __init__(
+        self,
+        path: Union[str, "os.PathLike[str]"],
+        *,
+        maxbytes: Optional[int] = None,
+        batch_size: int = 100,
+    ) -> None:
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least one")
+        if maxbytes is not None and maxbytes < 0:
+            raise ValueError("maxbytes must not be negative")
+
+        self.maxbytes = maxbytes
+        self.batch_size = batch_size
+        self.hits = 0
+        self.misses = 0
+        self._writes: dict[tuple[str, Union[str, bytes]], bytes] = {}
+        self._touches: dict[tuple[str, Union[str, bytes]], float] = {}
+        self._conn = sqlite3.connect(os.fspath(path))
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "namespace TEXT NOT NULL, "
+            "key BLOB NOT NULL, "
+            "value BLOB NOT NULL, "
+            "size INTEGER NOT NULL, "
+            "accessed REAL NOT NULL, "
+            "PRIMARY KEY (namespace, key))"
+        )
+        self._conn.commit()
+
+    def __enter__(self) -> "DiskCache":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def get(self, namespace: str, key: Union[str, bytes]) -> tuple[bool, Any]:
+        """
+        Look up a stored result, returning ``(found, value)``.
+        """
+        data = self._writes.get((namespace, key))
+        if data is None:
+            row = self._conn.execute(
+                "SELECT value FROM cache WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return False, None
+            data = row[0]
+            self._touches[(namespace, key)] = time.time()
+            self._maybe_flush()
+
+        self.hits += 1
+        return True, pickle.loads(data)
+
+    def set(self, namespace: str, key: Union[str, bytes], value: Any) -> None:
+        """
+        Store a result, to be written with the next batch.
+        """
+        self._writes[(namespace, key)] = pickle.dumps(value)
+        self._maybe_flush()
+
+    def _maybe_flush(self) -> None:
+        if len(self._writes) + len(self._touches) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Write all buffered results to disk, and evict old results if needed.
+        """
+        if not (self._writes or self._touches):
+            return
+
+        now = time.time()
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)",
+                [
+                    (namespace, key, data, len(data), now)
+                    for (namespace, key), data in self._writes.items()
+                ],
+            )
+            self._conn.executemany(
+                "UPDATE cache SET accessed = ? WHERE namespace = ? AND key = ?",
+                [
+                    (accessed, namespace, key)
+                    for (namespace, key), accessed in self._touches.items()
+                ],
+            )
+            self._writes.clear()
+            self._touches.clear()
+
+            if self.maxbytes is not None:
+                (total,) = self._conn.execute(
+                    "SELECT COALESCE(SUM(size), 0) FROM cache"
+                ).fetchone()
+                if total > self.maxbytes:
+                    rowids = []
+                    for rowid, size in self._conn.execute(
+                        "SELECT rowid, size FROM cache ORDER BY accessed"
+                    ):
+                        if total <= self.maxbytes:
+                            break
+                        rowids.append((rowid,))
+                        total -= size
+                    self._conn.executemany("DELETE FROM cache WHERE rowid = ?", rowids)
+
+    def close(self) -> None:
+        """
+        Flush buffered results and close the database.
+        """
+        self.flush()
+        self._conn.close()
+
+    def __call__(
+        self,
+        *,
+        key: Callable[..., Union[str, bytes]],
+        namespace: Optional[str] = None,
+    ) -> Callable[[AnyFunction[R]], Callable[..., Awaitable[R]]]:
+        def decorator(fn: AnyFunction[R]) -> Callable[..., Awaitable[R]]:
+            ns = namespace if namespace is not None else fn.__qualname__
+            flights: _InFlight[R] = _InFlight()
+
+            async def call(k: Union[str, bytes], args: Any, kwargs: Any) -> R:
+                value = await maybe_await(fn(*args, **kwargs))
+                self.set(ns, k, value)
+                return value
+
+            @functools.wraps(fn)
+            async def wrapper(*args: Any, **kwargs: Any) -> R:
+                k = key(*args, **kwargs)
+                found, value = self.get(ns, k)
+                if found:
+                    return value
+                return await flights.run(k, lambda: call(k, args, kwargs))
+
+            return wrapper
+
+        return decorator
@@ -1,13 +1,18 @@
 # Copyright 2022 Amethyst Reese
 # Licensed under the MIT license
 
+import contextvars
 import inspect
+import os
+import sys
 from collections.abc import Awaitable
-
-from typing import Protocol, Union
+from types import TracebackType
+from typing import Any, ClassVar, Optional, Protocol, TypeVar, Union
 
 from .types import T
 
+S = TypeVar("S", bound="ContextScope")
+
 
 class Orderable(Protocol):  # pragma: no cover
     def __lt__(self, other): ...
@@ -15,7 +20,60 @@ class Orderable(Protocol):  # pragma: no cover
     def __gt__(self, other): ...
 
 
+# default yield_every and yield_interval for iter(), set by asyncio.cooperative()
+cooperative_defaults: contextvars.ContextVar[tuple[Optional[int], Optional[float]]]
+cooperative_defaults = contextvars.ContextVar(
+    "aioitertools_cooperative", default=(None, None)
+)
+
+
 async def maybe_await(object: Union[Awaitable[T], T]) -> T:
     if inspect.isawaitable(object):
         return await object  # type: ignore
     return object  # type: ignore
+
+
+def free_threaded() -> bool:
+    """
+    Whether the GIL is disabled, allowing threads to run Python code in parallel.
+    """
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return is_gil_enabled is not None and not is_gil_enabled()
+
+
+def cpu_count() -> int:
+    """
+    Number of CPUs usable by the current process.
+    """
+    if sys.version_info >= (3, 13):  # pragma: no cover
+        return os.process_cpu_count() or 1
+    if hasattr(os, "sched_getaffinity"):  # pragma: no cover
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1  # pragma: no cover
+
+
+class ContextScope:
+    """
+    Base for objects that are current in a context variable while entered.
+
+    Subclasses set ``_var``, which pipeline stages read once, when they start, so an
+    inactive profiler, metrics hook, or tracer adds no per-item overhead.  Tasks
+    created while an object is entered inherit it, and entering is reentrant.
+    """
+
+    _var: ClassVar[contextvars.ContextVar[Any]]
+
+    def __init__(self) -> None:
+        self._tokens: list[contextvars.Token[Any]] = []
+
+    def __enter__(self: S) -> S:
+        self._tokens.append(self._var.set(self))
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc: Optional[BaseException],
+        tb: Optional[TracebackType],
+    ) -> None:
+        self._var.reset(self._tokens.pop())
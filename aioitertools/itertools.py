@@ -15,13 +15,18 @@ See https://docs.python.org/3/library/itertools.html for reference.
 
 import asyncio
 import builtins
+import functools
 import itertools
 import operator
 from collections.abc import AsyncIterator
-from typing import Any, Optional, overload
+from concurrent.futures import Executor
+from typing import Any, Callable, cast, Optional, overload
 
-from .builtins import enumerate, iter, list, next, tuple, zip
+from .builtins import enumerate, iter, list, map, next, tuple, zip
 from .helpers import maybe_await
+from .metrics import current_hook, meter_input, meter_output, MetricsHook
+from .profiling import instrument
+from .tracing import current_tracer
 from .types import (
     Accumulator,
     AnyFunction,
@@ -55,6 +60,7 @@ async def accumulate(
             ...  # 1, 2, 6, 24
 
     """
+    func = instrument("accumulate", func)
     itr = iter(itr)
     try:
         total: T = await next(itr)
@@ -67,6 +73,15 @@ async def accumulate(
         yield total
 
 
+async def _batches(
+    aiterator: AsyncIterator[T], n: int, strict: bool
+) -> AsyncIterator[builtins.tuple[T, ...]]:
+    while batch := await tuple(islice(aiterator, n)):
+        if strict and len(batch) != n:
+            raise ValueError("batched: incomplete batch")
+        yield batch
+
+
 async def batched(
     iterable: AnyIterable[T],
     n: int,
@@ -85,9 +100,13 @@ async def batched(
     if n < 1:
         raise ValueError("n must be at least one")
     aiterator = iter(iterable)
-    while batch := await tuple(islice(aiterator, n)):
-        if strict and len(batch) != n:
-            raise ValueError("batched: incomplete batch")
+    hook = current_hook()
+    if hook is not None:
+        aiterator = meter_input(hook, "batched", aiterator)
+    batches = _batches(aiterator, n, strict)
+    if hook is not None:
+        batches = meter_output(hook, "batched", batches)
+    async for batch in batches:
         yield batch
 
 
@@ -235,6 +254,7 @@ async def dropwhile(
             ...  # 4, 5, 6
 
     """
+    predicate = instrument("dropwhile", predicate)
     itr = iter(iterable)
     async for item in itr:
         if not await maybe_await(predicate(item)):
@@ -261,6 +281,7 @@ async def filterfalse(
             ...  # 4, 5
 
     """
+    predicate = instrument("filterfalse", predicate)
     async for item in iter(iterable):
         if not await maybe_await(predicate(item)):
             yield item
@@ -302,6 +323,8 @@ async def groupby(
     """
     if key is None:
         key = lambda x: x  # noqa: E731
+    else:
+        key = instrument("groupby", key)
 
     grouping: builtins.list[T] = []
 
@@ -449,8 +472,18 @@ async def repeat(elem: T, n: int = -1) -> AsyncIterator[T]:
         n -= 1
 
 
+def _star_call(fn: Callable[..., R], args: builtins.list[Any]) -> R:
+    return fn(*args)
+
+
 async def starmap(
-    fn: AnyFunction[R], iterable: AnyIterableIterable[Any]
+    fn: AnyFunction[R],
+    iterable: AnyIterableIterable[Any],
+    *,
+    executor: Optional[Executor] = None,
+    chunksize: int = 1,
+    limit: Optional[int] = None,
+    ordered: bool = True,
 ) -> AsyncIterator[R]:
     """
     Yield values from a function using an iterable of iterables for arguments.
@@ -458,6 +491,9 @@ async def starmap(
     Each iterable contained within will be unpacked and consumed before
     executing the function or coroutine.
 
+    If an ``executor`` is given, ``fn`` must be a standard function, and will be
+    called on the executor in chunks, like :func:`aioitertools.map`.
+
     Example::
 
         data = [(1, 1), (1, 1, 1), (2, 2)]
@@ -466,6 +502,20 @@ async def starmap(
             ...  # 2, 3, 4
 
     """
+    if executor is not None:
+        arg_lists = (await list(itr) async for itr in iter(iterable))
+        async for value in map(
+            functools.partial(_star_call, cast(Callable[..., R], fn)),
+            arg_lists,
+            executor=executor,
+            chunksize=chunksize,
+            limit=limit,
+            ordered=ordered,
+        ):
+            yield value
+        return
+
+    fn = instrument("starmap", fn)
     async for itr in iter(iterable):
         args = await list(itr)
         yield await maybe_await(fn(*args))
@@ -488,6 +538,7 @@ async def takewhile(
             ...  # 0, 1, 2, 3
 
     """
+    predicate = instrument("takewhile", predicate)
     async for item in iter(iterable):
         if await maybe_await(predicate(item)):
             yield item
@@ -523,6 +574,13 @@ def tee(itr: AnyIterable[T], n: int = 2) -> builtins.tuple[AsyncIterator[T], ...
     assert n > 0
     sentinel = object()
     queues: builtins.list[asyncio.Queue] = [asyncio.Queue() for k in range(n)]
+    hook = current_hook()
+
+    def measure(hook: MetricsHook, items_in: int) -> None:
+        hook.count("tee", "items_in", items_in)
+        hook.count("tee", "items_out")
+        depth = builtins.max(queue.qsize() for queue in queues)
+        hook.gauge("tee", "queue_depth", depth)
 
     async def gen(k: int, q: asyncio.Queue) -> AsyncIterator[T]:
         if k == 0:
@@ -531,6 +589,8 @@ def tee(itr: AnyIterable[T], n: int = 2) -> builtins.tuple[AsyncIterator[T], ...
                     await asyncio.gather(
                         *[queue.put((None, value)) for queue in queues[1:]]
                     )
+                    if hook is not None:
+                        measure(hook, 1)
                     yield value
             except Exception as e:
                 await asyncio.gather(*[queue.put((e, None)) for queue in queues[1:]])
@@ -545,8 +605,18 @@ def tee(itr: AnyIterable[T], n: int = 2) -> builtins.tuple[AsyncIterator[T], ...
                     raise error
                 if value is sentinel:
                     break
+                if hook is not None:
+                    measure(hook, 0)
                 yield value
 
+    tracer = current_tracer()
+    if tracer is not None:
+        spans = [tracer.start("tee", branch=k) for k in range(n)]
+        itr = spans[0].input(iter(itr))
+        return builtins.tuple(
+            spans[k].output(gen(k, q)) for k, q in builtins.enumerate(queues)
+        )
+
     return builtins.tuple(gen(k, q) for k, q in builtins.enumerate(queues))
 
 
@@ -0,0 +1,217 @@
+# Copyright Amethyst Reese
+# Licensed under the MIT license
+
+"""
+Throughput, wait time, and queue depth metrics for pipeline stages.
+
+Provisional library.  Must be imported as `aioitertools.metrics`.
+"""
+
+import asyncio
+import contextvars
+import time
+from collections.abc import AsyncIterator
+from typing import NamedTuple, Optional
+
+from .helpers import ContextScope
+from .types import T
+
+_hook: contextvars.ContextVar[Optional["MetricsHook"]]
+_hook = contextvars.ContextVar("aioitertools_metrics", default=None)
+
+
+def current_hook() -> Optional["MetricsHook"]:
+    """
+    Return the metrics hook active in the current context, if any.
+    """
+    return _hook.get()
+
+
+class MetricsHook(ContextScope):
+    """
+    Receiver for metrics reported by pipeline stages.
+
+    Subclass and override :meth:`count`, :meth:`timing`, and :meth:`gauge` to send
+    metrics elsewhere.  While the hook is used as a context manager, stages started
+    from the current context, including tasks created within it, report to it:
+
+    - :func:`aioitertools.map` and :func:`aioitertools.batched` count
+      ``items_in`` and ``items_out``, and time ``upstream_wait``, spent waiting on
+      the source iterable, and ``downstream_wait``, spent waiting for the consumer
+      to ask for the next value.
+    - :func:`aioitertools.tee` counts ``items_in`` and ``items_out``, and gauges
+      the deepest of its queues as ``queue_depth``.
+    - :func:`aioitertools.asyncio.as_generated` counts ``items_out``, and gauges
+      ``queue_depth`` and the number of iterables ``in_flight``.
+    - :func:`aioitertools.asyncio.gather` counts tasks started as ``items_in``, and
+      finished as ``items_out`` or ``errors``, and gauges the tasks ``in_flight``.
+
+    Example::
+
+        class StatsdHook(MetricsHook):
+            def count(self, stage, metric, value=1):
+                statsd.incr(f"pipeline.{stage}.{metric}", value)
+
+        with StatsdHook():
+            async for row in map(parse, lines):
+                ...
+
+    """
+
+    _var = _hook
+
+    def count(self, stage: str, metric: str, value: int = 1) -> None:
+        """
+        Add ``value`` to a counter.
+        """
+
+    def timing(self, stage: str, metric: str, seconds: float) -> None:
+        """
+        Record a single duration.
+        """
+
+    def gauge(self, stage: str, metric: str, value: float) -> None:
+        """
+        Record the current value of a level, like a queue depth.
+        """
+
+
+class Snapshot(NamedTuple):
+    """
+    Metrics collected between two points in time.
+
+    ``metrics`` maps each stage to its metrics.  Counters and timings are totals
+    since the previous reset, with timings in seconds; each timing also has a
+    ``<metric>_max`` entry.  Gauges hold their latest value, and a ``<metric>_max``
+    entry with the highest value seen since the previous reset.
+    """
+
+    start: float
+    end: float
+    metrics: dict[str, dict[str, float]]
+
+
+class MetricsCollector(MetricsHook):
+    """
+    In-memory metrics hook, summarizing metrics for each stage.
+
+    Example::
+
+        collector = MetricsCollector()
+        with collector:
+            async for row in map(parse, lines):
+                ...
+        print(collector.snapshot().metrics["map"]["items_out"])
+
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._metrics: dict[str, dict[str, float]] = {}
+        self._gauges: set[tuple[str, str]] = set()
+        self._start = time.time()
+
+    def _stage(self, stage: str) -> dict[str, float]:
+        metrics = self._metrics.get(stage)
+        if metrics is None:
+            metrics = self._metrics[stage] = {}
+        return metrics
+
+    def count(self, stage: str, metric: str, value: int = 1) -> None:
+        metrics = self._stage(stage)
+        metrics[metric] = metrics.get(metric, 0) + value
+
+    def timing(self, stage: str, metric: str, seconds: float) -> None:
+        metrics = self._stage(stage)
+        metrics[metric] = metrics.get(metric, 0.0) + seconds
+        key = f"{metric}_max"
+        metrics[key] = max(metrics.get(key, 0.0), seconds)
+
+    def gauge(self, stage: str, metric: str, value: float) -> None:
+        self._gauges.add((stage, metric))
+        metrics = self._stage(stage)
+        metrics[metric] = value
+        key = f"{metric}_max"
+        metrics[key] = max(metrics.get(key, value), value)
+
+    def snapshot(self, reset: bool = False) -> Snapshot:
+        """
+        Return a copy of all metrics, optionally resetting counters and timings.
+
+        Gauges keep their latest value after a reset, with their maximum reset to it.
+        """
+        now = time.time()
+        snapshot = Snapshot(
+            self._start, now, {k: dict(v) for k, v in self._metrics.items()}
+        )
+        if reset:
+            self._start = now
+            for stage, metrics in self._metrics.items():
+                gauges = {
+                    metric: value
+                    for metric, value in metrics.items()
+                    if (stage, metric) in self._gauges
+                }
+                metrics.clear()
+                for metric, value in gauges.items():
+                    metrics[metric] = metrics[f"{metric}_max"] = value
+        return snapshot
+
+    async def periodic(
+        self, interval: float, *, reset: bool = True
+    ) -> AsyncIterator[Snapshot]:
+        """
+        Yield a snapshot every ``interval`` seconds, resetting in between by default.
+
+        Example::
+
+            async for snapshot in collector.periodic(10):
+                export(snapshot)
+
+        """
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        while True:
+            deadline += interval
+            await asyncio.sleep(max(deadline - loop.time(), 0))
+            yield self.snapshot(reset=reset)
+
+
+async def meter_input(
+    hook: MetricsHook, stage: str, itr: AsyncIterator[T]
+) -> AsyncIterator[T]:
+    """
+    Count items from ``itr`` as ``items_in``, and time waiting on them.
+    """
+    clock = time.perf_counter
+    while True:
+        before = clock()
+        try:
+            item = await itr.__anext__()
+        except StopAsyncIteration:
+            return
+        finally:
+            hook.timing(stage, "upstream_wait", clock() - before)
+        hook.count(stage, "items_in")
+        yield item
+
+
+async def meter_output(
+    hook: MetricsHook, stage: str, itr: AsyncIterator[T]
+) -> AsyncIterator[T]:
+    """
+    Count items yielded from ``itr`` as ``items_out``, and time waiting to yield them.
+    """
+    clock = time.perf_counter
+    try:
+        async for item in itr:
+            hook.count(stage, "items_out")
+            before = clock()
+            yield item
+            hook.timing(stage, "downstream_wait", clock() - before)
+    finally:
+        aclose = getattr(itr, "aclose", None)
+        if aclose is not None:
+            await aclose()
@@ -9,6 +9,7 @@ from aioitertools.helpers import maybe_await
 
 from .builtins import iter
 from .itertools import islice
+from .profiling import instrument
 from .types import AnyIterable, Predicate
 
 
@@ -69,6 +70,7 @@ async def before_and_after(
     iterator can generate valid results.
     """
 
+    predicate = instrument("before_and_after", predicate)
     it = iter(iterable)
 
     transition = asyncio.get_event_loop().create_future()
@@ -0,0 +1,302 @@
+# Copyright Amethyst Reese
+# Licensed under the MIT license
+
+"""
+Find which pipeline callables block the event loop.
+
+Provisional library.  Must be imported as `aioitertools.profiling`.
+"""
+
+import collections
+import contextvars
+import functools
+import inspect
+import time
+import traceback
+from collections.abc import Awaitable, Generator
+from typing import Any, Callable, Generic, NamedTuple, Optional, TypeVar
+
+from .helpers import ContextScope
+from .types import T
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+_profiler: contextvars.ContextVar[Optional["Profiler"]]
+_profiler = contextvars.ContextVar("aioitertools_profiler", default=None)
+
+
+class CallableStats(NamedTuple):
+    """
+    Totals for one callable passed to one kind of stage.
+    """
+
+    stage: str
+    name: str
+    calls: int
+    sync: float
+    awaited: float
+    max_sync: float
+    slow: int
+
+
+class SlowCallback(NamedTuple):
+    """
+    A single call, or coroutine step, that blocked the loop longer than the threshold.
+    """
+
+    stage: str
+    name: str
+    duration: float
+    stack: traceback.StackSummary
+
+
+class _Stats:
+    __slots__ = ("awaited", "calls", "max_sync", "slow", "sync")
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self.calls = 0
+        self.sync = 0.0
+        self.awaited = 0.0
+        self.max_sync = 0.0
+        self.slow = 0
+
+
+def _name(fn: Callable[..., Any]) -> str:
+    name = getattr(fn, "__qualname__", None) or repr(fn)
+    module = getattr(fn, "__module__", None)
+    return f"{module}.{name}" if module and module != "builtins" else name
+
+
+def _location(fn: Callable[..., Any]) -> traceback.StackSummary:
+    code = getattr(inspect.unwrap(fn), "__code__", None)
+    if code is None:
+        return traceback.StackSummary()
+    return traceback.StackSummary.from_list(
+        [traceback.FrameSummary(code.co_filename, code.co_firstlineno, code.co_name)]
+    )
+
+
+def _suspended_at(aw: Any) -> list[Any]:
+    frames = []
+    while aw is not None:
+        frame = getattr(aw, "cr_frame", None) or getattr(aw, "gi_frame", None)
+        if frame is None:
+            break
+        frames.append((frame, frame.f_lineno))
+        aw = getattr(aw, "cr_await", None) or getattr(aw, "gi_yieldfrom", None)
+    return frames
+
+
+class _Timed(Generic[T]):
+    """
+    Awaitable that times each step of the wrapped awaitable separately.
+    """
+
+    __slots__ = ("aw", "fn", "profiler", "stage", "stats")
+
+    def __init__(
+        self,
+        profiler: "Profiler",
+        stage: str,
+        fn: Callable[..., Any],
+        stats: _Stats,
+        aw: Awaitable[T],
+    ) -> None:
+        self.profiler = profiler
+        self.stage = stage
+        self.fn = fn
+        self.stats = stats
+        self.aw = aw
+
+    def _step(self, duration: float) -> None:
+        self.stats.max_sync = max(self.stats.max_sync, duration)
+        if duration > self.profiler.threshold:
+            frames = _suspended_at(self.aw)
+            stack = traceback.StackSummary.extract(frames) if frames else None
+            self.profiler._flag(self.stage, self.fn, self.stats, duration, stack)
+
+    def __await__(self) -> Generator[Any, Any, T]:
+        clock = time.perf_counter
+        it = self.aw.__await__()
+        value: Any = None
+        error: Optional[BaseException] = None
+        busy = 0.0
+        started = clock()
+        try:
+            while True:
+                before = clock()
+                try:
+                    if error is not None:
+                        yielded = it.throw(error)
+                    else:
+                        yielded = it.send(value)
+                except StopIteration as e:
+                    return e.value  # type: ignore[no-any-return]
+                finally:
+                    step = clock() - before
+                    busy += step
+                    self._step(step)
+
+                value, error = None, None
+                try:
+                    value = yield yielded
+                except GeneratorExit:
+                    it.close()
+                    raise
+                except BaseException as e:
+                    error = e
+        finally:
+            self.stats.sync += busy
+            self.stats.awaited += clock() - started - busy
+
+
+class Profiler(ContextScope):
+    """
+    Record time spent in, and awaiting, the callables passed to pipeline stages.
+
+    While a profiler is active, stages like :func:`aioitertools.map`,
+    :func:`aioitertools.filterfalse`, or :func:`aioitertools.groupby` that are
+    started from the current context wrap their function, predicate, or key, and
+    record the number of calls, the time spent running synchronously, and the time
+    spent awaiting, per stage and callable.  Coroutines are timed step by step, so
+    their synchronous time is the time they actually held the event loop.  Any call
+    or step longer than ``threshold`` seconds is flagged as a :class:`SlowCallback`,
+    along with its stack, and passed to ``on_slow`` if given.  The most recent
+    ``max_slow`` flagged callbacks are kept in :attr:`slow`.
+
+    Functions run on an executor are not profiled.
+
+    Example::
+
+        with Profiler(threshold=0.01) as profiler:
+            async for row in map(parse, filterfalse(is_empty, lines)):
+                ...
+        print(profiler.report())
+
+    """
+
+    _var = _profiler
+
+    def __init__(
+        self,
+        *,
+        threshold: float = 0.1,
+        max_slow: int = 100,
+        on_slow: Optional[Callable[[SlowCallback], Any]] = None,
+    ) -> None:
+        super().__init__()
+        self.threshold = threshold
+        self.on_slow = on_slow
+        self.slow: collections.deque[SlowCallback] = collections.deque(maxlen=max_slow)
+        self._stats: dict[tuple[str, str], _Stats] = {}
+
+    def _flag(
+        self,
+        stage: str,
+        fn: Callable[..., Any],
+        stats: _Stats,
+        duration: float,
+        stack: Optional[traceback.StackSummary],
+    ) -> None:
+        stats.slow += 1
+        if stack is None:
+            stack = _location(fn)
+        callback = SlowCallback(stage, _name(fn), duration, stack)
+        self.slow.append(callback)
+        if self.on_slow is not None:
+            self.on_slow(callback)
+
+    def wrap(self, stage: str, fn: F) -> F:
+        """
+        Wrap a function or coroutine function to record its timings for ``stage``.
+        """
+        key = (stage, _name(fn))
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = _Stats()
+        clock = time.perf_counter
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            before = clock()
+            try:
+                result = fn(*args, **kwargs)
+            finally:
+                elapsed = clock() - before
+                stats.calls += 1
+                stats.sync += elapsed
+                stats.max_sync = max(stats.max_sync, elapsed)
+                if elapsed > self.threshold:
+                    stack = traceback.extract_stack()
+                    stack.pop()  # this wrapper
+                    self._flag(stage, fn, stats, elapsed, stack)
+            if inspect.isawaitable(result):
+                return _Timed(self, stage, fn, stats, result)
+            return result
+
+        return wrapper  # type: ignore[return-value]
+
+    def stats(self) -> list[CallableStats]:
+        """
+        Snapshot of totals for each stage and callable, by descending sync time.
+        """
+        result = [
+            CallableStats(stage, name, s.calls, s.sync, s.awaited, s.max_sync, s.slow)
+            for (stage, name), s in self._stats.items()
+        ]
+        result.sort(key=lambda s: s.sync, reverse=True)
+        return result
+
+    def reset(self) -> None:
+        """
+        Discard all recorded timings and slow callbacks.
+        """
+        for stats in self._stats.values():
+            stats.reset()
+        self.slow.clear()
+
+    def report(self, stacks: bool = True) -> str:
+        """
+        Format totals as a table, followed by flagged slow callbacks and their stacks.
+        """
+        lines = [
+            f"{'stage':<16} {'callable':<40} {'calls':>8} {'sync s':>10} "
+            f"{'awaited s':>10} {'max ms':>9} {'slow':>5}"
+        ]
+        for s in self.stats():
+            lines.append(
+                f"{s.stage:<16} {s.name:<40} {s.calls:>8} {s.sync:>10.4f} "
+                f"{s.awaited:>10.4f} {s.max_sync * 1000:>9.2f} {s.slow:>5}"
+            )
+        for callback in self.slow:
+            lines.append("")
+            lines.append(
+                f"slow callback: {callback.stage} {callback.name} "
+                f"took {callback.duration * 1000:.2f}ms"
+            )
+            if stacks:
+                lines.extend(line.rstrip("\n") for line in callback.stack.format())
+        return "\n".join(lines)
+
+
+def instrument(stage: str, fn: F) -> F:
+    """
+    Wrap ``fn`` for the active :class:`Profiler`, or return it unchanged if none.
+
+    Called by aioitertools stages as they start; custom stages can do the same.
+
+    Example::
+
+        async def my_stage(fn, itr):
+            fn = instrument("my_stage", fn)
+            async for item in iter(itr):
+                yield await maybe_await(fn(item))
+
+    """
+    profiler = _profiler.get()
+    if profiler is None:
+        return fn
+    return profiler.wrap(stage, fn)
@@ -0,0 +1,241 @@
+# Copyright Amethyst Reese
+# Licensed under the MIT license
+
+"""
+Partition a pipeline by key across worker processes, each with its own event loop.
+
+Provisional library.  Must be imported as `aioitertools.sharding`.
+"""
+
+import asyncio
+import multiprocessing
+import pickle
+import queue
+import threading
+from collections.abc import AsyncGenerator, AsyncIterable, Iterator
+from multiprocessing.context import BaseContext
+from typing import Any, Callable, Optional
+
+from .builtins import iter
+from .helpers import cpu_count, maybe_await
+from .types import AnyIterable, AsyncIterator, KeyFunction, R, T
+
+Pipeline = Callable[[AsyncIterator[T]], AsyncIterable[R]]
+
+
+def _picklable(error: BaseException) -> BaseException:
+    try:
+        pickle.dumps(error)
+        return error
+    except Exception:
+        return RuntimeError(f"{type(error).__name__}: {error}")
+
+
+async def _shard_main(
+    pipeline: Pipeline[T, R],
+    index: int,
+    inputs: "multiprocessing.Queue[Optional[list[T]]]",
+    results: "multiprocessing.Queue[tuple[str, Any]]",
+    chunksize: int,
+) -> None:
+    loop = asyncio.get_running_loop()
+    batch: list[R] = []
+    handle: Optional[asyncio.TimerHandle] = None
+
+    def items() -> Iterator[T]:
+        while True:
+            chunk = inputs.get()
+            if chunk is None:
+                return
+            yield from chunk
+
+    def flush() -> None:
+        nonlocal batch, handle
+        if handle is not None:
+            handle.cancel()
+            handle = None
+        if batch:
+            results.put(("items", batch))
+            batch = []
+
+    try:
+        async for value in pipeline(iter(items(), thread=True)):
+            batch.append(value)
+            if len(batch) >= chunksize:
+                flush()
+            elif handle is None:
+                # don't hold results back while waiting on more input
+                handle = loop.call_later(0.005, flush)
+        flush()
+        results.put(("done", index))
+    except BaseException as e:
+        # report anything that would stop the worker, including KeyboardInterrupt
+        # or SystemExit, before it exits
+        flush()
+        results.put(("error", _picklable(e)))
+        if not isinstance(e, Exception):
+            raise
+
+
+def _shard_worker(
+    pipeline: Pipeline[T, R],
+    index: int,
+    inputs: "multiprocessing.Queue[Optional[list[T]]]",
+    results: "multiprocessing.Queue[tuple[str, Any]]",
+    chunksize: int,
+) -> None:  # pragma: no cover - only runs in worker processes
+    asyncio.run(_shard_main(pipeline, index, inputs, results, chunksize))
+
+
+async def sharded(
+    pipeline: Pipeline[T, R],
+    itr: AnyIterable[T],
+    key: KeyFunction[T, Any],
+    *,
+    workers: Optional[int] = None,
+    chunksize: int = 64,
+    prefetch: int = 4,
+    mp_context: Optional[BaseContext] = None,
+) -> AsyncIterator[R]:
+    """
+    Run a pipeline in ``workers`` processes, partitioning items by ``key``.
+
+    Items from ``itr`` are hash-partitioned by the result of the ``key`` function or
+    coroutine, so all items with the same key go to the same worker process, in
+    their original order.  Each worker runs its own event loop, and passes an async
+    iterator of its items to ``pipeline``, which returns an async iterable of
+    results, usually built from aioitertools functions like :func:`aioitertools.map`.
+    Results from all workers are yielded as they arrive, preserving the order of
+    results from each worker, and therefore the order of results for each key.
+
+    Items and results are sent between processes in chunks of up to ``chunksize``,
+    with up to ``prefetch`` chunks queued for each worker.  ``pipeline``, items, and
+    results must be picklable, so ``pipeline`` must be a module-level function.
+    Keys must hash consistently within the parent process.  If any worker raises an
+    exception, all workers are stopped, and the exception is raised; if a worker
+    exits without finishing, like when killed, :class:`RuntimeError` is raised.
+
+    Example::
+
+        def ingest(events):
+            return map(store_event, events)
+
+        async for receipt in sharded(ingest, events, key=lambda e: e.user_id):
+            ...
+
+    """
+    if workers is None:
+        workers = cpu_count()
+    if workers < 1:
+        raise ValueError("workers must be at least one")
+    if chunksize < 1:
+        raise ValueError("chunksize must be at least one")
+
+    ctx = mp_context if mp_context is not None else multiprocessing.get_context()
+    loop = asyncio.get_running_loop()
+    results: multiprocessing.Queue[tuple[str, Any]] = ctx.Queue()
+    inputs: list[multiprocessing.Queue[Optional[list[T]]]] = [
+        ctx.Queue(prefetch) for _ in range(workers)
+    ]
+    procs = [
+        ctx.Process(  # type: ignore[attr-defined]
+            target=_shard_worker,
+            args=(pipeline, idx, inputs[idx], results, chunksize),
+            daemon=True,
+        )
+        for idx in range(workers)
+    ]
+    for proc in procs:
+        proc.start()
+
+    stopping = threading.Event()
+
+    def put(idx: int, batch: Optional[list[T]]) -> None:
+        while not stopping.is_set():
+            try:
+                inputs[idx].put(batch, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    async def feed() -> None:
+        batches: list[list[T]] = [[] for _ in range(workers)]
+        source = iter(itr)
+        try:
+            async for item in source:
+                idx = hash(await maybe_await(key(item))) % workers
+                batches[idx].append(item)
+                if len(batches[idx]) >= chunksize:
+                    await loop.run_in_executor(None, put, idx, batches[idx])
+                    batches[idx] = []
+            for idx, batch in enumerate(batches):
+                if batch:
+                    await loop.run_in_executor(None, put, idx, batch)
+                await loop.run_in_executor(None, put, idx, None)
+        except asyncio.CancelledError:
+            if isinstance(source, AsyncGenerator):
+                await source.aclose()
+            raise
+        except Exception as e:
+            results.put(("error", _picklable(e)))
+
+    def messages() -> Iterator[tuple[str, Any]]:
+        finished: set[int] = set()
+        exited: set[int] = set()
+        while True:
+            try:
+                message = results.get(timeout=0.1)
+            except queue.Empty:
+                # a worker killed by a signal, os._exit(), or similar never reports
+                # back, so look for workers that exited without finishing; check
+                # twice, in case a final message arrived just before the exit
+                previous, exited = exited, {
+                    idx
+                    for idx, proc in enumerate(procs)
+                    if idx not in finished and proc.exitcode is not None
+                }
+                lost = sorted(previous & exited)
+                if lost:
+                    code = procs[lost[0]].exitcode
+                    reason = f"shard worker {lost[0]} exited with code {code}"
+                    yield ("error", RuntimeError(reason))
+                    return
+                continue
+            if message[0] == "stop":
+                return
+            if message[0] == "done":
+                finished.add(message[1])
+            yield message
+
+    feeder = asyncio.ensure_future(feed())
+    it = iter(messages(), thread=True, prefetch=workers * 4)
+    try:
+        remaining = workers
+        async for kind, payload in it:
+            if kind == "items":
+                for value in payload:
+                    yield value
+            elif kind == "done":
+                remaining -= 1
+                if not remaining:
+                    break
+            else:
+                raise payload
+        await feeder
+
+    finally:
+        stopping.set()
+        feeder.cancel()
+        await asyncio.gather(feeder, return_exceptions=True)
+        results.put(("stop", None))
+        await it.aclose()  # type: ignore[attr-defined]
+        for proc in procs:
+            if proc.is_alive():
+                proc.terminate()
+        # chunks still buffered for stopped workers will never be read, so don't
+        # block interpreter exit waiting to flush them
+        for q in inputs:
+            q.cancel_join_thread()
+        results.cancel_join_thread()
+        for proc in procs:
+            await loop.run_in_executor(None, proc.join)
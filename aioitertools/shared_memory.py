@@ -0,0 +1,262 @@
+# Copyright Amethyst Reese
+# Licensed under the MIT license
+
+"""
+Pass numeric batches to worker processes through shared memory.
+
+Rather than pickling every value, each batch is copied once into a
+:class:`multiprocessing.shared_memory.SharedMemory` segment, and only a small
+:class:`SharedBatch` handle is sent to the worker, which reads the values in place.
+
+Provisional library.  Must be imported as `aioitertools.shared_memory`.
+"""
+
+import array
+import asyncio
+import collections
+import concurrent.futures
+import contextlib
+import mmap
+import os
+import sys
+from collections.abc import Iterator
+from concurrent.futures import Executor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, cast, NamedTuple, Optional
+
+from .builtins import iter
+from .helpers import cpu_count
+from .itertools import islice
+from .types import AnyIterable, AsyncIterator, R
+
+
+@contextlib.contextmanager
+def _attach(name: str) -> Iterator[memoryview]:
+    if sys.version_info >= (3, 13):  # pragma: no cover
+        shm = SharedMemory(name, track=False)
+    elif os.name != "posix":  # pragma: no cover
+        shm = SharedMemory(name)
+    else:
+        # older versions always register attached segments with the resource tracker,
+        # which then unlinks them when a worker exits, so map the segment directly.
+        # _posixshmem is the private module that SharedMemory itself uses on posix,
+        # and shm_open has the same signature on every version reaching this branch,
+        # 3.9 through 3.12; 3.13 and newer use the public track=False instead
+        import _posixshmem
+
+        fd = _posixshmem.shm_open("/" + name, os.O_RDWR, mode=0o600)
+        try:
+            mm = mmap.mmap(fd, os.fstat(fd).st_size)
+        finally:
+            os.close(fd)
+        buf = memoryview(mm)
+        try:
+            yield buf
+        finally:
+            buf.release()
+            mm.close()
+        return
+
+    try:  # pragma: no cover
+        yield shm.buf
+    finally:
+        shm.close()
+
+
+class SharedBatch(NamedTuple):
+    """
+    Picklable handle to a batch of values stored in a shared memory segment.
+    """
+
+    name: str
+    typecode: str
+    length: int
+
+    @contextlib.contextmanager
+    def open(self) -> Iterator[memoryview]:
+        """
+        Attach to the segment, and yield a memoryview of the values in the batch.
+
+        The memoryview must not be used after the context exits.
+
+        Example::
+
+            def total(handle):
+                with handle.open() as values:
+                    return sum(values)
+
+        """
+        with _attach(self.name) as buf:
+            raw = buf[: self.length * array.array(self.typecode).itemsize]
+            view = raw.cast(cast(Any, self.typecode))
+            try:
+                yield view
+            finally:
+                view.release()
+                raw.release()
+
+
+class SegmentPool:
+    """
+    Owner of shared memory segments, reusing them once all references are released.
+
+    :meth:`put` copies a batch of values into a free segment, or a new one if none is
+    large enough, and returns a handle with one reference.  Use :meth:`retain` for
+    each additional consumer, and :meth:`release` when each consumer is done with the
+    handle; once no references remain, the segment is reused for later batches.
+    All segments are unlinked when the pool is closed.
+
+    Example::
+
+        with SegmentPool() as pool:
+            async for batch in batched(readings, 10_000):
+                handle = pool.put(batch, "d")
+                await loop.run_in_executor(process_pool, total, handle)
+                pool.release(handle)
+
+    """
+
+    def __init__(self) -> None:
+        self._segments: dict[str, SharedMemory] = {}
+        self._refs: dict[str, int] = {}
+        self._free: list[SharedMemory] = []
+
+    def __enter__(self) -> "SegmentPool":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def put(self, batch: Any, typecode: str = "d") -> SharedBatch:
+        """
+        Copy a batch of values, or any buffer, into shared memory.
+
+        Sequences like the tuples from :func:`aioitertools.batched` are converted to
+        an :class:`array.array` of the given ``typecode``.  Objects supporting the
+        buffer protocol, like arrays, are copied as-is using their own item format.
+        """
+        try:
+            view = memoryview(batch)
+        except TypeError:
+            view = memoryview(array.array(typecode, batch))
+        typecode = view.format
+        length = view.nbytes // view.itemsize
+        data = view.cast("B")
+
+        size = max(data.nbytes, 1)
+        candidates = [shm for shm in self._free if shm.size >= size]
+        if candidates:
+            shm = min(candidates, key=lambda shm: shm.size)
+            self._free.remove(shm)
+        else:
+            shm = SharedMemory(create=True, size=size)
+            self._segments[shm.name] = shm
+
+        shm.buf[: data.nbytes] = data
+        self._refs[shm.name] = 1
+        return SharedBatch(shm.name, typecode, length)
+
+    def retain(self, handle: SharedBatch) -> None:
+        """
+        Add a reference to the given handle.
+        """
+        self._refs[handle.name] += 1
+
+    def release(self, handle: SharedBatch) -> None:
+        """
+        Remove a reference to the given handle, freeing its segment for reuse.
+        """
+        self._refs[handle.name] -= 1
+        if self._refs[handle.name] == 0:
+            del self._refs[handle.name]
+            self._free.append(self._segments[handle.name])
+
+    def close(self) -> None:
+        """
+        Close and unlink all segments owned by this pool.
+        """
+        for shm in self._segments.values():
+            shm.close()
+            shm.unlink()
+        self._segments.clear()
+        self._refs.clear()
+        self._free.clear()
+
+
+def _call_shared(fn: Callable[[memoryview], R], handle: SharedBatch) -> R:
+    with handle.open() as view:
+        return fn(view)
+
+
+async def shared_map(
+    fn: Callable[[memoryview], R],
+    iterable: AnyIterable[Any],
+    n: int,
+    *,
+    executor: Executor,
+    typecode: str = "d",
+    limit: Optional[int] = None,
+) -> AsyncIterator[R]:
+    """
+    Call ``fn`` on an executor with a memoryview of each batch of ``n`` values.
+
+    Values are grouped into batches of ``n``, copied into reusable shared memory
+    segments, and passed to ``fn`` as a :class:`memoryview` of ``typecode`` values.
+    Up to ``limit`` batches are in flight at once (default: the number of CPUs), and
+    one result per batch is yielded in order.  ``fn`` must be picklable, and must not
+    return or keep the memoryview itself.  If closed early, running batches are
+    waited for, and the iterable is closed.
+
+    Example::
+
+        def mean(values):
+            return sum(values) / len(values)
+
+        with ProcessPoolExecutor() as pool:
+            async for value in shared_map(mean, readings, 10_000, executor=pool):
+                ...
+
+    """
+    if limit is None:
+        limit = cpu_count()
+    if limit < 1:
+        raise ValueError("limit must be at least one")
+
+    loop = asyncio.get_running_loop()
+    source = iter(iterable)
+    pending: collections.deque[tuple[SharedBatch, concurrent.futures.Future[R]]]
+    pending = collections.deque()
+    exhausted = False
+
+    with SegmentPool() as pool:
+        try:
+            while True:
+                while not exhausted and len(pending) < limit:
+                    batch = [value async for value in islice(source, n)]
+                    if not batch:
+                        exhausted = True
+                        break
+                    handle = pool.put(batch, typecode)
+                    fut = executor.submit(_call_shared, fn, handle)
+                    pending.append((handle, fut))
+
+                if not pending:
+                    break
+
+                handle, fut = pending[0]
+                # only drop the batch once its worker is done with the segment;
+                # if this is cancelled, the batch is still waited for below
+                result = await asyncio.wrap_future(fut)
+                pending.popleft()
+                pool.release(handle)
+                yield result
+
+        finally:
+            # cancel batches that haven't started, and wait for running workers
+            # before unlinking their segments
+            running = [fut for _, fut in pending if not fut.cancel()]
+            if running:
+                await loop.run_in_executor(None, concurrent.futures.wait, running)
+            aclose = getattr(source, "aclose", None)
+            if aclose is not None:
+                await aclose()
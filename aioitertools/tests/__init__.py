@@ -3,6 +3,14 @@
 
 from .asyncio import AsyncioTest
 from .builtins import BuiltinsTest
+from .compare import CompareTest
+from .functools import FunctoolsTest
 from .helpers import HelpersTest
 from .itertools import ItertoolsTest
+from .metrics import MetricsTest
 from .more_itertools import MoreItertoolsTest
+from .profiling import ProfilingTest
+from .sharding import ShardingTest
+from .shared_memory import SharedMemoryTest
+from .simulation import SimulationTest
+from .tracing import TracingTest
@@ -2,7 +2,9 @@
 # Licensed under the MIT license
 
 import asyncio
-from unittest import TestCase
+import sys
+import threading
+from unittest import skipIf, TestCase
 
 import aioitertools as ait
 import aioitertools.asyncio as aio
@@ -227,6 +229,156 @@ class AsyncioTest(TestCase):
         self.assertEqual(result[1], 0.001)
         self.assertIsInstance(result[0], MyException)
 
+    @async_test
+    async def test_gather_timeout(self):
+        cancelled = []
+
+        async def fn(arg):
+            try:
+                await asyncio.sleep(arg)
+            except asyncio.CancelledError:
+                cancelled.append(arg)
+                raise
+            return arg
+
+        with self.assertRaises(asyncio.TimeoutError):
+            await aio.gather(fn(0.001), fn(1), fn(2), timeout=0.05)
+        self.assertEqual([1, 2], sorted(cancelled))
+
+        cancelled.clear()
+        unstarted = fn(3)
+        result = await aio.gather(
+            fn(0.001), fn(1), unstarted, limit=1, timeout=0.05, return_exceptions=True
+        )
+        self.assertEqual(0.001, result[0])
+        self.assertIsInstance(result[1], asyncio.TimeoutError)
+        self.assertIsInstance(result[2], asyncio.TimeoutError)
+        self.assertEqual([1], cancelled)
+        self.assertIsNone(unstarted.cr_frame)
+
+        result = await aio.gather_iter([fn(0.001), 2], timeout=0.05)
+        self.assertEqual([0.001, 2], result)
+
+    @async_test
+    async def test_gather_item_timeout(self):
+        async def fn(arg):
+            await asyncio.sleep(arg)
+            return arg
+
+        # each item gets its own budget once started
+        aws = [fn(0.02), fn(0.02), fn(0.02), fn(1)]
+        result = await aio.gather(
+            *aws, limit=1, item_timeout=0.05, return_exceptions=True
+        )
+        self.assertEqual([0.02, 0.02, 0.02], result[:3])
+        self.assertIsInstance(result[3], asyncio.TimeoutError)
+
+        with self.assertRaises(asyncio.TimeoutError):
+            await aio.gather_iter([fn(1), fn(0.001)], item_timeout=0.01)
+
+    @async_test
+    async def test_gather_eager(self):
+        loop = asyncio.get_running_loop()
+        ticked = []
+
+        async def cached(value):
+            return value
+
+        async def fetch(value):
+            await asyncio.sleep(0)
+            return value
+
+        futures = []
+        for value in range(3):
+            fut = loop.create_future()
+            fut.set_result(value)
+            futures.append(fut)
+
+        loop.call_soon(ticked.append, True)
+        result = await aio.gather(*futures, futures[0], eager=True)
+        self.assertEqual([0, 1, 2, 0], result)
+        values = [v async for v in aio.as_completed(futures, eager=True)]
+        self.assertEqual([0, 1, 2], sorted(values))
+        self.assertEqual([], ticked)  # never waited on the loop
+
+        result = await aio.gather_iter(
+            [cached(1), fetch(2), 3, cached(4)], limit=2, eager=True
+        )
+        self.assertEqual([1, 2, 3, 4], result)
+        values = [v async for v in aio.as_completed([fetch(1), cached(2)], eager=True)]
+        self.assertEqual([1, 2], sorted(values))
+
+    @skipIf(sys.version_info < (3, 12), "eager tasks require 3.12+")
+    @async_test
+    async def test_gather_eager_coroutines(self):
+        loop = asyncio.get_running_loop()
+        ticked = []
+
+        async def cached(value):
+            return value
+
+        loop.call_soon(ticked.append, True)
+        result = await aio.gather(*[cached(i) for i in range(5)], eager=True)
+        self.assertEqual([0, 1, 2, 3, 4], result)
+        self.assertEqual([], ticked)
+
+    @async_test
+    async def test_gather_fail_fast(self):
+        cancelled = []
+
+        async def slow(name):
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.append(name)
+                raise
+
+        async def fail(delay):
+            await asyncio.sleep(delay)
+            raise ValueError(delay)
+
+        unstarted = slow("unstarted")
+        with self.assertRaises(ValueError):
+            await aio.gather(
+                slow("a"), fail(0.01), slow("b"), unstarted, limit=3, fail_fast=True
+            )
+        self.assertEqual(["a", "b"], sorted(cancelled))
+        self.assertIsNone(unstarted.cr_frame)  # closed, never awaited
+
+        cancelled.clear()
+        with self.assertRaises(ValueError):
+            await aio.gather_iter([slow("c"), fail(0), 1], fail_fast=True)
+        self.assertEqual(["c"], cancelled)
+
+        # return_exceptions takes precedence
+        result = await aio.gather(
+            fail(0), asyncio.sleep(0.01, 1), fail_fast=True, return_exceptions=True
+        )
+        self.assertIsInstance(result[0], ValueError)
+        self.assertEqual(1, result[1])
+
+    @skipIf(sys.version_info < (3, 11), "ExceptionGroup requires 3.11+")
+    @async_test
+    async def test_gather_exception_group(self):
+        async def fail(delay):
+            await asyncio.sleep(delay)
+            raise ValueError(delay)
+
+        async def fail_on_cancel():
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                raise KeyError("teardown")
+
+        with self.assertRaises(ExceptionGroup) as ctx:  # noqa: F821
+            await aio.gather(
+                fail(0.01), fail(0.01), fail_on_cancel(), exception_group=True
+            )
+        errors = ctx.exception.exceptions
+        self.assertEqual(3, len(errors))
+        self.assertEqual(2, sum(isinstance(e, ValueError) for e in errors))
+        self.assertEqual(1, sum(isinstance(e, KeyError) for e in errors))
+
     @async_test
     async def test_gather_cancel(self):
         cancelled = False
@@ -257,3 +409,391 @@ class AsyncioTest(TestCase):
             await task
         self.assertTrue(started)
         self.assertTrue(cancelled)
+
+    def test_run_sync(self):
+        async def double(x):
+            await asyncio.sleep(0.001)
+            return x * 2
+
+        self.assertEqual(4, aio.run_sync(double(2)))
+        self.assertEqual([0, 2, 4], aio.run_sync(ait.list(ait.map(double, srange))))
+
+        async def fail():
+            raise ValueError("boom")
+
+        with self.assertRaisesRegex(ValueError, "boom"):
+            aio.run_sync(fail())
+
+    @async_test
+    async def test_run_sync_same_loop(self):
+        async def nested():
+            coro = asyncio.sleep(0)
+            try:
+                aio.run_sync(coro)
+            finally:
+                # the rejected coroutine was closed, rather than left unawaited
+                self.assertIsNone(coro.cr_frame)
+
+        with self.assertRaisesRegex(RuntimeError, "its own thread"):
+            aio.run_sync(nested())
+
+        async def nested_iter():
+            aio.iter_sync(slist)
+
+        with self.assertRaisesRegex(RuntimeError, "its own thread"):
+            aio.run_sync(nested_iter())
+
+    def test_iter_sync(self):
+        async def gen(n):
+            for i in range(n):
+                if i % 50 == 0:
+                    await asyncio.sleep(0.001)
+                yield i
+
+        self.assertEqual(list(range(500)), list(aio.iter_sync(gen(500), prefetch=32)))
+        self.assertEqual(slist, list(aio.iter_sync(slist)))
+        self.assertEqual(
+            ["a", "b", "c"], list(aio.iter_sync(ait.map(str.lower, slist)))
+        )
+
+        with self.assertRaises(ValueError):
+            aio.iter_sync(slist, prefetch=0)
+
+    def test_iter_sync_close(self):
+        closed = threading.Event()
+
+        async def gen():
+            try:
+                i = 0
+                while True:
+                    yield i
+                    i += 1
+            finally:
+                closed.set()
+
+        it = aio.iter_sync(gen(), prefetch=8)
+        self.assertEqual([0, 1, 2], [next(it), next(it), next(it)])
+        it.close()
+        self.assertTrue(closed.wait(1))
+
+    def test_iter_sync_exception(self):
+        async def gen():
+            yield 1
+            await asyncio.sleep(0.001)
+            raise ValueError("boom")
+
+        results = []
+        with self.assertRaisesRegex(ValueError, "boom"):
+            for value in aio.iter_sync(gen()):
+                results.append(value)
+        self.assertEqual([1], results)
+
+    @async_test
+    async def test_keyed_map(self):
+        active = {}
+        max_active = 0
+        overlaps = []
+
+        async def process(item):
+            nonlocal max_active
+            k, v = item
+            if k in active:
+                overlaps.append(item)  # pragma: no cover
+            active[k] = v
+            max_active = max(max_active, len(active))
+            await asyncio.sleep(0.001 * (v % 3))
+            del active[k]
+            return item
+
+        items = [(i % 5, i) for i in range(50)]
+        result = await ait.list(
+            aio.keyed_map(process, items, key=lambda item: item[0], limit=3)
+        )
+        self.assertEqual(sorted(items), sorted(result))
+        self.assertEqual([], overlaps)
+        self.assertEqual(3, max_active)
+        for k in range(5):
+            values = [v for key, v in result if key == k]
+            self.assertEqual(sorted(values), values)
+
+        # unlimited, with async key function and generator source
+        async def key(item):
+            return item[0]
+
+        result = await ait.list(aio.keyed_map(process, ait.iter(items), key=key))
+        self.assertEqual(sorted(items), sorted(result))
+        self.assertEqual(5, max_active)
+
+    @async_test
+    async def test_keyed_map_buffer(self):
+        seen = 0
+
+        async def source():
+            nonlocal seen
+            for i in range(100):
+                seen += 1
+                yield i
+
+        async def slow(item):
+            await asyncio.sleep(0.001)
+            return item
+
+        it = aio.keyed_map(slow, source(), key=lambda x: x % 10, buffer=5)
+        self.assertIn(await ait.next(it), range(5))
+        self.assertLessEqual(seen, 7)
+        await it.aclose()
+
+        with self.assertRaises(ValueError):
+            await ait.list(aio.keyed_map(slow, srange, key=str, limit=0))
+        with self.assertRaises(ValueError):
+            await ait.list(aio.keyed_map(slow, srange, key=str, buffer=0))
+
+    @async_test
+    async def test_keyed_map_exception(self):
+        cancelled = 0
+
+        async def process(item):
+            nonlocal cancelled
+            if item == 3:
+                raise ValueError(item)
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled += 1
+                raise
+
+        with self.assertRaises(ValueError):
+            await ait.list(aio.keyed_map(process, range(6), key=lambda x: x % 4))
+        self.assertEqual(3, cancelled)  # 4 and 5 wait behind 0 and 1
+
+    @async_test
+    async def test_keyed_limiter(self):
+        active = {}
+        peaks = {}
+        total_peak = 0
+
+        async def fetch(host, delay=0.005):
+            nonlocal total_peak
+            active[host] = active.get(host, 0) + 1
+            peaks[host] = max(peaks.get(host, 0), active[host])
+            total_peak = max(total_peak, sum(active.values()))
+            await asyncio.sleep(delay)
+            active[host] -= 1
+            return host
+
+        limiter = aio.KeyedLimiter(
+            lambda host, delay=0: host, per_key=2, limits={"slow": 1}, total=4
+        )
+        limited = limiter.wrap(fetch)
+        self.assertEqual("fetch", limited.__name__)
+
+        hosts = ["a", "b", "slow"] * 5
+        result = await aio.gather(*[limited(host) for host in hosts])
+        self.assertEqual(hosts, result)
+        self.assertEqual({"a": 2, "b": 2, "slow": 1}, peaks)
+        self.assertEqual(4, total_peak)
+        self.assertEqual({}, limiter.active())
+
+        peaks.clear()
+        result = await ait.list(aio.as_completed([limited(host) for host in hosts]))
+        self.assertEqual(sorted(hosts), sorted(result))
+        self.assertEqual({"a": 2, "b": 2, "slow": 1}, peaks)
+
+        result = await aio.gather_iter(limiter.run(h, fetch(h)) for h in "aab")
+        self.assertEqual(["a", "a", "b"], result)
+
+    @async_test
+    async def test_keyed_limiter_no_head_of_line(self):
+        limiter = aio.KeyedLimiter(per_key=1)
+        order = []
+
+        async def work(name, delay):
+            await asyncio.sleep(delay)
+            order.append(name)
+
+        # both "busy" calls are queued before "free", which doesn't wait on them
+        await aio.gather(
+            limiter.run("busy", work("busy1", 0.05)),
+            limiter.run("busy", work("busy2", 0.05)),
+            limiter.run("free", work("free", 0.01)),
+        )
+        self.assertEqual(["free", "busy1", "busy2"], order)
+
+        with self.assertRaises(ValueError):
+            limiter.wrap(work)
+        with self.assertRaises(ValueError):
+            aio.KeyedLimiter(per_key=0)
+        with self.assertRaises(ValueError):
+            aio.KeyedLimiter(total=0)
+
+    @async_test
+    async def test_weighted_limiter(self):
+        running = 0
+        peak = 0
+        order = []
+
+        async def job(name, cost):
+            nonlocal running, peak
+            running += cost
+            peak = max(peak, running)
+            order.append(name)
+            await asyncio.sleep(0.005)
+            running -= cost
+            return name
+
+        limiter = aio.WeightedLimiter(10, weight=lambda name, cost: cost)
+        limited = limiter.wrap(job)
+        self.assertEqual("job", limited.__name__)
+
+        jobs = [("a", 4), ("b", 4), ("big", 9), ("c", 1), ("d", 1), ("huge", 50)]
+        result = await aio.gather(*[limited(*j) for j in jobs])
+        self.assertEqual([name for name, _ in jobs], result)
+        # "c" fits next to "a" and "b", but can't jump ahead of waiting "big"
+        self.assertEqual(["a", "b", "big", "c", "d", "huge"], order)
+        self.assertEqual(50, peak)  # "huge" runs alone
+        self.assertEqual(0, limiter.used)
+
+        order.clear()
+        result = await ait.list(
+            aio.as_completed([limiter.run(2.5, job(str(i), 2.5)) for i in range(8)])
+        )
+        self.assertEqual(8, len(result))
+
+    @async_test
+    async def test_weighted_limiter_cancel(self):
+        limiter = aio.WeightedLimiter(2)
+        await limiter.acquire(2)
+
+        waiter = asyncio.ensure_future(limiter.acquire(2))
+        small = asyncio.ensure_future(limiter.acquire(1))
+        await asyncio.sleep(0)
+        self.assertFalse(waiter.done())
+        self.assertFalse(small.done())
+
+        # cancelling the head waiter admits the next one when space frees
+        waiter.cancel()
+        await asyncio.sleep(0)
+        limiter.release(2)
+        await small
+        self.assertEqual(1, limiter.used)
+        limiter.release(1)
+        self.assertEqual(0, limiter.used)
+
+        with self.assertRaises(ValueError):
+            await limiter.acquire(-1)
+        with self.assertRaises(ValueError):
+            limiter.wrap(asyncio.sleep)
+        with self.assertRaises(ValueError):
+            aio.WeightedLimiter(0)
+
+    @async_test
+    async def test_priority_executor(self):
+        started = []
+
+        async def job(name, delay=0.01):
+            started.append(name)
+            await asyncio.sleep(delay)
+            return name
+
+        async with aio.PriorityExecutor(2) as executor:
+            executor.submit(job("low0", 0.001), priority=10)
+            for i in range(1, 4):
+                executor.submit(job(f"low{i}"), priority=10)
+            executor.submit(job("urgent"), priority=0)
+            self.assertEqual((3, 2), (executor.pending(), executor.running()))
+
+            results = []
+            async for result in executor:
+                results.append(result)
+                if result == "low0":
+                    # submitted while running, jumps ahead of the backlog
+                    executor.submit(job("late"), priority=1)
+                    executor.close()
+
+        self.assertEqual(["low0", "low1", "urgent", "late", "low2", "low3"], started)
+        self.assertEqual(sorted(started), sorted(results))
+
+        with self.assertRaises(RuntimeError):
+            executor.submit(job("closed"))
+        with self.assertRaises(ValueError):
+            aio.PriorityExecutor(0)
+
+    @async_test
+    async def test_priority_executor_function(self):
+        async def job(value):
+            await asyncio.sleep(0)
+            return value
+
+        async def fail():
+            raise ValueError("boom")
+
+        jobs = {job(value): value for value in [3, 1, 2]}
+        executor = aio.PriorityExecutor(1, priority=jobs.get, return_exceptions=True)
+        for aw in jobs:
+            executor.submit(aw)
+        executor.submit(fail(), priority=5)
+        executor.close()
+        results = await ait.list(executor)
+        self.assertEqual([3, 1, 2], results[:3])
+        self.assertIsInstance(results[3], ValueError)
+
+    @async_test
+    async def test_priority_executor_exception(self):
+        cancelled = 0
+
+        async def slow():
+            nonlocal cancelled
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled += 1
+                raise
+
+        async def fail():
+            raise ValueError("boom")
+
+        never = slow()
+        executor = aio.PriorityExecutor(2)
+        executor.submit(slow())
+        executor.submit(fail())
+        executor.submit(never, priority=1)
+        with self.assertRaisesRegex(ValueError, "boom"):
+            async for _ in executor:
+                pass  # pragma: no cover
+        self.assertEqual(1, cancelled)
+        self.assertIsNone(never.cr_frame)  # closed without running
+
+        with self.assertRaisesRegex(RuntimeError, "cancel"):
+            async with aio.PriorityExecutor(1) as executor:
+                executor.submit(slow())
+                await asyncio.sleep(0)
+                raise RuntimeError("cancel")
+        self.assertEqual(2, cancelled)
+
+    @async_test
+    async def test_priority_executor_exit(self):
+        done = []
+
+        async def job(value):
+            await asyncio.sleep(0.01)
+            done.append(value)
+            return value
+
+        async def boom(value):
+            await asyncio.sleep(0)
+            raise ValueError(value)
+
+        # exiting waits for work that was never iterated over
+        async with aio.PriorityExecutor(2) as executor:
+            for value in range(5):
+                executor.submit(job(value))
+        self.assertEqual([0, 1, 2, 3, 4], sorted(done))
+        self.assertEqual((0, 0), (executor.pending(), executor.running()))
+
+        # and raises its errors, rather than leaving them unretrieved
+        with self.assertRaisesRegex(ValueError, "1"):
+            async with aio.PriorityExecutor(2) as executor:
+                executor.submit(boom(1))
+
+        async with aio.PriorityExecutor(2, return_exceptions=True) as executor:
+            executor.submit(boom(2))
@@ -2,10 +2,15 @@
 # Licensed under the MIT license
 
 import asyncio
+import multiprocessing
+import threading
+import time
 from collections.abc import AsyncIterator
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from unittest import TestCase
 
 import aioitertools as ait
+import aioitertools.asyncio as aio
 from .helpers import async_test
 
 slist = ["A", "B", "C"]
@@ -14,6 +19,10 @@ srange1 = range(1, 4)
 srange0 = range(1)
 
 
+def _square(x):
+    return x * x
+
+
 class BuiltinsTest(TestCase):
 
     # aioitertools.all()
@@ -117,6 +126,118 @@ class BuiltinsTest(TestCase):
         agen = async_gen()
         self.assertEqual(ait.iter(agen), agen)
 
+    @async_test
+    async def test_iter_thread(self):
+        threads = set()
+
+        def blocking():
+            for i in range(1000):
+                threads.add(threading.get_ident())
+                if i % 100 == 0:
+                    time.sleep(0.01)
+                yield i
+
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.001)
+
+        task = asyncio.ensure_future(ticker())
+        result = await ait.list(ait.iter(blocking(), thread=True, prefetch=64))
+        task.cancel()
+        self.assertEqual(list(range(1000)), result)
+        self.assertNotIn(threading.get_ident(), threads)
+        self.assertGreater(ticks, 5)
+
+        self.assertEqual(["A", "B", "C"], await ait.list(ait.iter(slist, thread=True)))
+        self.assertEqual([], await ait.list(ait.iter([], thread=True)))
+
+        with self.assertRaises(ValueError):
+            ait.iter(slist, thread=True, prefetch=0)
+
+    @async_test
+    async def test_iter_thread_close(self):
+        closed = threading.Event()
+
+        def gen():
+            try:
+                yield from range(1_000_000)
+            finally:
+                closed.set()
+
+        it = ait.iter(gen(), thread=True, prefetch=8)
+        self.assertEqual(0, await ait.next(it))
+        self.assertEqual(1, await ait.next(it))
+        await it.aclose()
+        loop = asyncio.get_running_loop()
+        self.assertTrue(await loop.run_in_executor(None, closed.wait, 1))
+
+    @async_test
+    async def test_iter_thread_exception(self):
+        def gen():
+            yield 1
+            yield 2
+            raise ValueError("boom")
+
+        results = []
+        with self.assertRaisesRegex(ValueError, "boom"):
+            async for value in ait.iter(gen(), thread=True):
+                results.append(value)
+        self.assertEqual([1, 2], results)
+
+    @async_test
+    async def test_iter_cooperative(self):
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0)
+
+        task = asyncio.ensure_future(ticker())
+        try:
+            await asyncio.sleep(0)
+            await ait.list(ait.iter(range(100)))
+            self.assertEqual(1, ticks)  # never suspended
+
+            ticks = 0
+            result = await ait.list(ait.iter(range(100), yield_every=10))
+            self.assertEqual(list(range(100)), result)
+            self.assertEqual(10, ticks)
+
+            def slow():
+                for i in range(5):
+                    time.sleep(0.002)
+                    yield i
+
+            ticks = 0
+            await ait.list(ait.iter(slow(), yield_interval=0.001))
+            self.assertEqual(5, ticks)
+
+            ticks = 0
+            with aio.cooperative(every=25, interval=None):
+                await ait.list(ait.map(str, range(100)))
+                self.assertEqual(4, ticks)
+                # per call settings take precedence
+                await ait.list(ait.iter(range(100), yield_every=50))
+                self.assertEqual(6, ticks)
+            await ait.list(ait.iter(range(100)))
+            self.assertEqual(6, ticks)
+        finally:
+            task.cancel()
+
+        with self.assertRaises(ValueError):
+            ait.iter(range(10), yield_every=0)
+        with self.assertRaises(ValueError):
+            ait.iter(range(10), yield_interval=-1)
+        with self.assertRaises(ValueError):
+            with aio.cooperative(every=0):
+                pass
+
     # aioitertools.next()
 
     @async_test
@@ -272,6 +393,81 @@ class BuiltinsTest(TestCase):
             self.assertEqual(value, slist[idx] * 2)
             idx += 1
 
+    @async_test
+    async def test_map_executor(self):
+        threads = set()
+
+        def double(x):
+            threads.add(threading.get_ident())
+            return x * 2
+
+        with ThreadPoolExecutor(2) as pool:
+            result = await ait.list(
+                ait.map(double, range(10), executor=pool, chunksize=3, limit=2)
+            )
+            self.assertEqual([x * 2 for x in range(10)], result)
+            self.assertNotIn(threading.get_ident(), threads)
+
+            async def gen():
+                for item in slist:
+                    yield item
+
+            result = await ait.list(ait.map(str.lower, gen(), executor=pool))
+            self.assertEqual(["a", "b", "c"], result)
+
+            it = ait.map(double, range(100), executor=pool, chunksize=10)
+            self.assertEqual(0, await ait.next(it))
+            await it.aclose()
+
+            with self.assertRaises(ValueError):
+                await ait.next(ait.map(double, slist, executor=pool, chunksize=0))
+            with self.assertRaises(ValueError):
+                await ait.next(ait.map(double, slist, executor=pool, limit=0))
+
+    @async_test
+    async def test_map_executor_exception(self):
+        def fail(x):
+            if x == 5:
+                raise ValueError(x)
+            return x
+
+        results = []
+        with ThreadPoolExecutor(2) as pool:
+            with self.assertRaises(ValueError):
+                async for value in ait.map(fail, range(10), executor=pool, chunksize=2):
+                    results.append(value)
+        self.assertEqual([0, 1, 2, 3], results)
+
+    @async_test
+    async def test_map_executor_unordered(self):
+        async def gen():
+            for i in range(20):
+                yield i
+
+        with ThreadPoolExecutor(4) as pool:
+            result = await ait.list(
+                ait.map(_square, gen(), executor=pool, chunksize=3, ordered=False)
+            )
+        self.assertEqual([x * x for x in range(20)], sorted(result))
+
+    @async_test
+    async def test_map_process_pool(self):
+        for method in ("fork", "spawn"):
+            if method not in multiprocessing.get_all_start_methods():
+                continue  # pragma: no cover
+            with self.subTest(method=method):
+                context = multiprocessing.get_context(method)
+                with ProcessPoolExecutor(2, mp_context=context) as pool:
+                    result = await ait.list(
+                        ait.map(_square, range(50), executor=pool, chunksize=8)
+                    )
+                    self.assertEqual([x * x for x in range(50)], result)
+
+                    result = await ait.list(
+                        ait.map(_square, range(50), executor=pool, ordered=False)
+                    )
+                    self.assertEqual([x * x for x in range(50)], sorted(result))
+
     # aioitertools.max()
 
     @async_test
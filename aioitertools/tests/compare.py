@@ -0,0 +1,188 @@
+# Copyright Amethyst Reese
+# Licensed under the MIT license
+
+import contextlib
+import io
+import json
+import os
+import random
+import tempfile
+from unittest import TestCase
+
+from aioitertools.benchmarks.compare import (
+    compare,
+    Comparison,
+    FORMAT,
+    incompatible,
+    load,
+    main,
+    median_interval,
+    min_samples,
+    report,
+)
+
+META = {
+    "aioitertools": "0.0",
+    "implementation": "cpython",
+    "python_minor": "3.11",
+    "free_threaded": False,
+    "loop": "asyncio",
+    "machine": "x86_64",
+}
+
+
+def results(*timings, meta=None, **kwargs):
+    return {
+        "format": FORMAT,
+        "meta": {**META, **(meta or {}), **kwargs},
+        "results": [
+            {"name": name, "input": "list", "size": 100, "samples": samples}
+            for name, samples in timings
+        ],
+    }
+
+
+def run_report(*args, **kwargs):
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        status = report(*args, **kwargs)
+    return status, output.getvalue()
+
+
+class CompareTest(TestCase):
+    def test_min_samples(self):
+        self.assertEqual(2, min_samples(0.5))
+        self.assertEqual(6, min_samples(0.95))
+        self.assertEqual(8, min_samples(0.99))
+        for confidence in (0, 1, 1.5, -0.1):
+            with self.assertRaisesRegex(ValueError, "between 0 and 1"):
+                min_samples(confidence)
+
+    def test_median_interval(self):
+        # known order statistic ranks for the median at 95% confidence
+        self.assertEqual((0, 5), median_interval(range(6)))
+        self.assertEqual((1, 8), median_interval(range(10)))
+        self.assertEqual((5, 14), median_interval(range(20)))
+        self.assertEqual((39, 60), median_interval(range(100)))
+        self.assertEqual((0, 7), median_interval(range(8), confidence=0.99))
+
+        samples = list(range(100))
+        random.Random(0).shuffle(samples)
+        self.assertEqual((39, 60), median_interval(samples))
+
+    def test_median_interval_too_few(self):
+        with self.assertRaisesRegex(ValueError, "5 samples are too few"):
+            median_interval(range(5))
+        with self.assertRaisesRegex(ValueError, "at least 8 are needed"):
+            median_interval(range(7), confidence=0.99)
+
+    def test_status_threshold(self):
+        def status(current):
+            return Comparison(
+                "map", "list", 100, 1.0, (1.0, 1.0), current, (current, current), 0.1
+            ).status
+
+        self.assertEqual("", status(1.0))
+        self.assertEqual("", status(1.1))
+        self.assertEqual("regressed", status(1.11))
+        self.assertEqual("", status(0.9))
+        self.assertEqual("improved", status(0.89))
+
+        # the intervals must separate, not only the medians
+        wide = Comparison("map", "list", 100, 1.0, (0.5, 1.5), 1.5, (1.0, 2.0), 0.1)
+        self.assertAlmostEqual(0.5, wide.delta)
+        self.assertEqual("", wide.status)
+
+    def test_compare(self):
+        baseline = results(("map", [1.0] * 6), ("zip", [2.0] * 6))
+        current = results(("map", [1.5] * 6), ("chain", [1.0] * 6))
+        comparisons, added, removed = compare(baseline, current)
+        self.assertEqual(["map"], [c.name for c in comparisons])
+        self.assertEqual("regressed", comparisons[0].status)
+        self.assertEqual([("chain", "list", 100)], added)
+        self.assertEqual([("zip", "list", 100)], removed)
+
+    def test_incompatible(self):
+        self.assertEqual([], incompatible(META, META))
+        self.assertEqual([], incompatible(META, {**META, "aioitertools": "1.0"}))
+        self.assertEqual(
+            ["python_minor: 3.11 != 3.12", "loop: asyncio != uvloop"],
+            incompatible(META, {**META, "python_minor": "3.12", "loop": "uvloop"}),
+        )
+
+    def test_report(self):
+        baseline = results(("map", [1.0] * 6), ("zip", [1.0] * 6))
+
+        status, output = run_report(baseline, results(("map", [1.05] * 6)))
+        self.assertEqual(0, status)
+        self.assertNotIn("map", output)
+        self.assertIn("zip", output)
+        self.assertIn("removed", output)
+
+        status, output = run_report(
+            baseline, results(("map", [1.05] * 6)), verbose=True
+        )
+        self.assertEqual(0, status)
+        self.assertIn("map", output)
+
+        status, output = run_report(baseline, results(("map", [0.5] * 6)))
+        self.assertEqual(0, status)
+        self.assertIn("improved", output)
+
+        status, output = run_report(baseline, results(("map", [1.5] * 6)))
+        self.assertEqual(1, status)
+        self.assertIn("1 regressed", output)
+
+        status, output = run_report(
+            baseline, results(("map", [1.5] * 6)), threshold=0.6
+        )
+        self.assertEqual(0, status)
+
+    def test_report_incompatible(self):
+        baseline = results(("map", [1.0] * 6))
+        for meta in ({"python_minor": "3.12"}, {"loop": "uvloop"}):
+            with self.subTest(meta):
+                current = results(("map", [1.0] * 6), meta=meta)
+                status, output = run_report(baseline, current)
+                self.assertEqual(2, status)
+                self.assertIn("not comparable", output)
+
+                status, output = run_report(baseline, current, force=True)
+                self.assertEqual(0, status)
+                self.assertIn("1 compared", output)
+
+    def test_report_too_few_samples(self):
+        baseline = results(("map", [1.0] * 6))
+        status, output = run_report(baseline, results(("map", [2.0] * 5)))
+        self.assertEqual(2, status)
+        self.assertIn("--repeat 6", output)
+
+        status, output = run_report(baseline, baseline, confidence=0.99)
+        self.assertEqual(2, status)
+        self.assertIn("--repeat 8", output)
+
+    def test_main(self):
+        with tempfile.TemporaryDirectory() as td:
+            baseline = os.path.join(td, "baseline.json")
+            current = os.path.join(td, "current.json")
+            with open(baseline, "w") as f:
+                json.dump(results(("map", [1.0] * 6)), f)
+            with open(current, "w") as f:
+                json.dump(results(("map", [2.0] * 6)), f)
+
+            for argv, expected in (
+                ([baseline, baseline], 0),
+                ([baseline, current], 1),
+                ([baseline, current, "--threshold", "2"], 0),
+                ([baseline, current, "--confidence", "0.99"], 2),
+            ):
+                with self.subTest(argv):
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        with self.assertRaises(SystemExit) as cm:
+                            main(argv)
+                    self.assertEqual(expected, cm.exception.code)
+
+            with open(current, "w") as f:
+                json.dump({"format": FORMAT + 1}, f)
+            with self.assertRaisesRegex(ValueError, "unsupported"):
+                load(current)
@@ -0,0 +1,416 @@
+# Copyright Amethyst Reese
+# Licensed under the MIT license
+
+import asyncio
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest import TestCase
+
+import aioitertools as ait
+import aioitertools.asyncio as aio
+import aioitertools.functools as aft
+from aioitertools.helpers import cpu_count
+from .helpers import async_test
+
+
+class FunctoolsTest(TestCase):
+
+    # aioitertools.functools.Batcher
+
+    @async_test
+    async def test_batcher_gather(self):
+        calls = []
+
+        async def fetch_many(keys):
+            calls.append(keys)
+            return [key * 2 for key in keys]
+
+        fetch_one = aft.Batcher(fetch_many)
+        result = await aio.gather(*[fetch_one(i) for i in range(10)])
+        self.assertEqual([i * 2 for i in range(10)], result)
+        self.assertEqual([list(range(10))], calls)
+
+    @async_test
+    async def test_batcher_mapping(self):
+        calls = []
+
+        async def fetch_many(keys):
+            calls.append(len(keys))
+            return [key * 2 for key in keys]
+
+        fetch_one = aft.Batcher(fetch_many)
+        items = (fetch_one(i) for i in range(100))
+        result = await aio.gather_iter(items, limit=25)
+        self.assertEqual([i * 2 for i in range(100)], result)
+        self.assertEqual([25, 25, 25, 25], calls)
+
+        calls.clear()
+        fetch_one = aft.Batcher(fetch_many, delay=0.01)
+        results = aio.keyed_map(fetch_one, range(100), key=str, limit=25)
+        self.assertEqual(set(range(0, 200, 2)), set(await ait.list(results)))
+        self.assertEqual(100, sum(calls))
+        self.assertLess(len(calls), 10)
+
+        # sequential map awaits each call before making the next
+        calls.clear()
+        result = await ait.list(ait.map(fetch_one, range(10)))
+        self.assertEqual([i * 2 for i in range(10)], result)
+        self.assertEqual([1] * 10, calls)
+
+    @async_test
+    async def test_batcher_max_size(self):
+        calls = []
+
+        def fetch_many(keys):
+            calls.append(keys)
+            return {key: str(key) for key in keys}
+
+        fetch_one = aft.Batcher(fetch_many, max_size=4)
+        result = await aio.gather(*[fetch_one(i) for i in range(10)])
+        self.assertEqual([str(i) for i in range(10)], result)
+        self.assertEqual([[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]], calls)
+
+    @async_test
+    async def test_batcher_dupes_and_delay(self):
+        calls = []
+
+        async def fetch_many(keys):
+            calls.append(keys)
+            return keys
+
+        async def later(key):
+            await asyncio.sleep(0.001)
+            return await fetch_one(key)
+
+        fetch_one = aft.Batcher(fetch_many, delay=0.05)
+        result = await aio.gather(fetch_one(1), fetch_one(1), later(2), fetch_one(3))
+        self.assertEqual([1, 1, 2, 3], result)
+        self.assertEqual([[1, 3, 2]], calls)
+
+    @async_test
+    async def test_batcher_errors(self):
+        async def failing(keys):
+            raise RuntimeError("nope")
+
+        fetch_one = aft.Batcher(failing)
+        result = await aio.gather(fetch_one(1), fetch_one(2), return_exceptions=True)
+        self.assertIsInstance(result[0], RuntimeError)
+        self.assertIsInstance(result[1], RuntimeError)
+
+        fetch_one = aft.Batcher(lambda keys: {1: "one"})
+        with self.assertRaises(KeyError):
+            await aio.gather(fetch_one(1), fetch_one(2))
+
+        fetch_one = aft.Batcher(lambda keys: [])
+        with self.assertRaisesRegex(ValueError, "0 results for 1 keys"):
+            await fetch_one(1)
+
+        with self.assertRaises(ValueError):
+            aft.Batcher(failing, max_size=0)
+        with self.assertRaises(ValueError):
+            aft.Batcher(failing, delay=-1)
+
+    @async_test
+    async def test_batcher_cancelled(self):
+        async def cancelling(keys):
+            raise asyncio.CancelledError
+
+        fetch_one = aft.Batcher(cancelling)
+        with self.assertRaises(asyncio.CancelledError):
+            await asyncio.wait_for(fetch_one(1), timeout=1)
+
+        started = asyncio.Event()
+
+        async def hang(keys):
+            started.set()
+            await asyncio.sleep(10)
+
+        fetch_one = aft.Batcher(hang)
+        call = asyncio.ensure_future(fetch_one(1))
+        await started.wait()
+        for task in fetch_one._tasks:
+            task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await asyncio.wait_for(call, timeout=1)
+
+    # aioitertools.functools.singleflight()
+
+    @async_test
+    async def test_singleflight(self):
+        calls = []
+
+        @aft.singleflight
+        async def fetch(key, suffix=""):
+            calls.append((key, suffix))
+            await asyncio.sleep(0.01)
+            return f"{key}{suffix}"
+
+        result = await aio.gather(
+            fetch(1), fetch(1), fetch(2), fetch(1, suffix="!"), fetch(1, suffix="!")
+        )
+        self.assertEqual(["1", "1", "2", "1!", "1!"], result)
+        self.assertEqual([(1, ""), (2, ""), (1, "!")], calls)
+        self.assertEqual("fetch", fetch.__name__)
+
+        # nothing is cached once the call completes
+        self.assertEqual("1", await fetch(1))
+        self.assertEqual(4, len(calls))
+
+    @async_test
+    async def test_singleflight_key(self):
+        calls = []
+
+        async def fetch(a, b):
+            calls.append((a, b))
+            await asyncio.sleep(0.01)
+            return a + b
+
+        fetch_one = aft.singleflight(fetch, key=lambda a, b: a)
+        result = await ait.list(
+            aio.as_completed([fetch_one(1, 2), fetch_one(1, 3), fetch_one(2, 3)])
+        )
+        self.assertEqual([3, 3, 5], sorted(result))
+        self.assertEqual([(1, 2), (2, 3)], calls)
+
+        result = await ait.list(ait.starmap(fetch_one, [(1, 2), (2, 3)]))
+        self.assertEqual([3, 5], result)
+
+    @async_test
+    async def test_singleflight_errors(self):
+        calls = 0
+
+        @aft.singleflight
+        async def fail(key):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            raise RuntimeError(key)
+
+        result = await aio.gather(fail(1), fail(1), return_exceptions=True)
+        self.assertEqual(1, calls)
+        self.assertIs(result[0], result[1])
+
+        # cancelling one caller doesn't cancel the shared call
+        first = asyncio.ensure_future(fail(2))
+        second = asyncio.ensure_future(fail(2))
+        await asyncio.sleep(0)
+        first.cancel()
+        with self.assertRaisesRegex(RuntimeError, "2"):
+            await second
+        self.assertTrue(first.cancelled())
+
+    # aioitertools.functools.threaded()
+
+    @async_test
+    async def test_threaded(self):
+        threads = set()
+
+        def is_small(x, limit=3):
+            threads.add(threading.get_ident())
+            return x < limit
+
+        pred = aft.threaded(is_small)
+        self.assertEqual("is_small", pred.__name__)
+        result = await ait.list(ait.takewhile(pred, range(10)))
+        self.assertEqual([0, 1, 2], result)
+
+        with ThreadPoolExecutor(1) as pool:
+            pred = aft.threaded(is_small, executor=pool)
+            result = await ait.list(ait.filterfalse(pred, range(5)))
+            self.assertEqual([3, 4], result)
+            self.assertFalse(await pred(5, limit=4))
+
+        self.assertNotIn(threading.get_ident(), threads)
+
+    @async_test
+    async def test_thread_pool(self):
+        pool = aft.thread_pool()
+        self.assertIs(pool, aft.thread_pool())
+        self.assertEqual(cpu_count(), pool._max_workers)
+
+        names = set()
+
+        def square(x):
+            names.add(threading.current_thread().name)
+            return x * x
+
+        result = await ait.list(ait.map(square, range(20), executor=pool, chunksize=4))
+        self.assertEqual([x * x for x in range(20)], result)
+        self.assertTrue(all(name.startswith("aioitertools-") for name in names))
+
+    # aioitertools.functools.lru_cache()
+
+    @async_test
+    async def test_lru_cache(self):
+        calls = []
+
+        @aft.lru_cache(maxsize=2)
+        async def double(x):
+            calls.append(x)
+            await asyncio.sleep(0.001)
+            return x * 2
+
+        result = await ait.list(ait.map(double, [1, 1, 2, 1, 3, 2]))
+        self.assertEqual([2, 2, 4, 2, 6, 4], result)
+        self.assertEqual([1, 2, 3, 2], calls)
+        self.assertEqual(aft.CacheInfo(2, 4, 2, 2, 0), double.cache_info())
+        self.assertEqual("double", double.__name__)
+
+        double.cache_clear()
+        self.assertEqual(aft.CacheInfo(0, 0, 2, 0, 0), double.cache_info())
+
+    @async_test
+    async def test_lru_cache_sync_inflight(self):
+        calls = []
+
+        @aft.lru_cache
+        def upper(x):
+            calls.append(x)
+            return x.upper()
+
+        data = ["a", "A", "b", "B", "a"]
+        result = [k async for k, _ in ait.groupby(data, key=upper)]
+        self.assertEqual(["A", "B", "A"], result)
+        self.assertEqual(["a", "A", "b", "B"], calls)
+
+        slow_calls = []
+
+        @aft.lru_cache
+        async def slow(x):
+            slow_calls.append(x)
+            await asyncio.sleep(0.01)
+            return x
+
+        self.assertEqual([1, 1, 1], await aio.gather(slow(1), slow(1), slow(1)))
+        self.assertEqual([1], slow_calls)
+
+    @async_test
+    async def test_lru_cache_negative_traceback(self):
+        @aft.lru_cache(negative_ttl=60)
+        def fail(x):
+            raise ValueError(x)
+
+        async def depth():
+            try:
+                await fail(1)
+            except ValueError as e:
+                tb, frames = e.__traceback__, 0
+                while tb is not None:
+                    tb, frames = tb.tb_next, frames + 1
+                return frames
+            self.fail("expected ValueError")
+
+        first = await depth()
+        depths = [await depth() for _ in range(100)]
+        self.assertEqual(1, fail.cache_info().misses)
+        self.assertLessEqual(max(depths), first)
+        self.assertEqual(depths[0], depths[-1])
+
+    @async_test
+    async def test_lru_cache_ttl(self):
+        calls = []
+
+        @aft.lru_cache(ttl=0.01, negative_ttl=0.01)
+        def check(x):
+            calls.append(x)
+            if x < 0:
+                raise ValueError(x)
+            return x
+
+        self.assertEqual(1, await check(1))
+        self.assertEqual(1, await check(1))
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                await check(-1)
+        self.assertEqual([1, -1], calls)
+
+        await asyncio.sleep(0.02)
+        self.assertEqual(1, await check(1))
+        with self.assertRaises(ValueError):
+            await check(-1)
+        self.assertEqual([1, -1, 1, -1], calls)
+
+        uncached = aft.lru_cache(check.__wrapped__)
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                await uncached(-2)
+        self.assertEqual([1, -1, 1, -1, -2, -2], calls)
+
+    @async_test
+    async def test_lru_cache_maxbytes(self):
+        @aft.lru_cache(maxsize=None, maxbytes=10, sizeof=len, key=lambda s, n: s)
+        def repeat(s, n):
+            return s * n
+
+        await repeat("a", 4)
+        await repeat("b", 4)
+        self.assertEqual(aft.CacheInfo(0, 2, None, 2, 8), repeat.cache_info())
+        await repeat("c", 4)
+        self.assertEqual(aft.CacheInfo(0, 3, None, 2, 8), repeat.cache_info())
+        self.assertEqual("cccc", await repeat("c", 1))
+        await repeat("d", 20)  # too large to cache
+        self.assertEqual(aft.CacheInfo(1, 4, None, 2, 8), repeat.cache_info())
+
+        with self.assertRaises(ValueError):
+            aft.lru_cache(maxsize=-1)
+        with self.assertRaises(ValueError):
+            aft.lru_cache(maxbytes=-1)
+
+    # aioitertools.functools.DiskCache
+
+    @async_test
+    async def test_disk_cache(self):
+        calls = []
+
+        async def square(x):
+            calls.append(x)
+            return x * x
+
+        with tempfile.TemporaryDirectory() as td:
+            path = Path(td) / "cache.db"
+
+            with aft.DiskCache(path, batch_size=3) as cache:
+                cached = cache(key=str)(square)
+                result = await ait.list(ait.map(cached, [1, 2, 1, 3, 4]))
+                self.assertEqual([1, 4, 1, 9, 16], result)
+                self.assertEqual([1, 2, 3, 4], calls)
+                self.assertEqual((1, 4), (cache.hits, cache.misses))
+
+            # rerun after "failure": only new inputs are computed
+            with aft.DiskCache(path) as cache:
+                cached = cache(key=str)(square)
+                result = await ait.list(ait.map(cached, range(1, 7)))
+                self.assertEqual([1, 4, 9, 16, 25, 36], result)
+                self.assertEqual([1, 2, 3, 4, 5, 6], calls)
+
+                # separate namespaces don't share results
+                other = cache(key=str, namespace="other")(square)
+                self.assertEqual(1, await other(1))
+                self.assertEqual([1, 2, 3, 4, 5, 6, 1], calls)
+
+    @async_test
+    async def test_disk_cache_eviction(self):
+        with tempfile.TemporaryDirectory() as td:
+            path = Path(td) / "cache.db"
+            with aft.DiskCache(path, maxbytes=250, batch_size=1) as cache:
+
+                @cache(key=lambda x: x.to_bytes(4, "big"), namespace="blob")
+                def blob(x):
+                    return bytes(100)
+
+                for i in range(5):
+                    await blob(i)
+                await blob(3)  # hit, refreshes access time
+                await blob(5)
+                rows = cache._conn.execute("SELECT COUNT(*) FROM cache").fetchone()
+                self.assertEqual((2,), rows)
+                self.assertEqual(1, cache.hits)
+                self.assertTrue(cache.get("blob", b"\0\0\0\3")[0])
+                self.assertFalse(cache.get("blob", b"\0\0\0\4")[0])
+
+            with self.assertRaises(ValueError):
+                aft.DiskCache(path, batch_size=0)
+            with self.assertRaises(ValueError):
+                aft.DiskCache(path, maxbytes=-1)
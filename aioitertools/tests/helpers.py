@@ -2,11 +2,12 @@
 # Licensed under the MIT license
 
 import asyncio
+import contextvars
 import functools
 import sys
 from unittest import skipIf, TestCase
 
-from aioitertools.helpers import maybe_await
+from aioitertools.helpers import ContextScope, cpu_count, free_threaded, maybe_await
 
 
 def async_test(fn):
@@ -55,3 +56,34 @@ class HelpersTest(TestCase):
             return a * b
 
         self.assertEqual(await maybe_await(functools.partial(multiply, 6)(7)), 42)
+
+    # aioitertools.helpers.free_threaded()
+
+    def test_free_threaded(self):
+        is_gil_enabled = getattr(sys, "_is_gil_enabled", lambda: True)
+        self.assertEqual(not is_gil_enabled(), free_threaded())
+
+    # aioitertools.helpers.cpu_count()
+
+    def test_cpu_count(self):
+        self.assertGreaterEqual(cpu_count(), 1)
+
+    # aioitertools.helpers.ContextScope
+
+    def test_context_scope(self):
+        current = contextvars.ContextVar("current", default=None)
+
+        class Scope(ContextScope):
+            _var = current
+
+        outer, inner = Scope(), Scope()
+        with outer as value:
+            self.assertIs(value, outer)
+            self.assertIs(current.get(), outer)
+            with inner:
+                self.assertIs(current.get(), inner)
+                with outer:
+                    self.assertIs(current.get(), outer)
+                self.assertIs(current.get(), inner)
+            self.assertIs(current.get(), outer)
+        self.assertIsNone(current.get())
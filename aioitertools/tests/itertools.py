@@ -3,6 +3,7 @@
 
 import asyncio
 import operator
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from unittest import TestCase
 
 import aioitertools as ait
@@ -591,6 +592,26 @@ class ItertoolsTest(TestCase):
         with self.assertRaises(StopAsyncIteration):
             await ait.next(it)
 
+    @async_test
+    async def test_starmap_executor(self):
+        async def gen():
+            yield slist[:2]
+            yield ait.iter(slist[1:])
+            yield slist
+
+        with ThreadPoolExecutor(2) as pool:
+            it = ait.starmap(operator.add, [(1, 2), (3, 4), (5, 6)], executor=pool)
+            self.assertEqual([3, 7, 11], await ait.list(it))
+
+            it = ait.starmap(
+                lambda *args: "".join(args), gen(), executor=pool, chunksize=2
+            )
+            self.assertEqual(["AB", "BC", "ABC"], await ait.list(it))
+
+        with ProcessPoolExecutor(2) as pool:
+            it = ait.starmap(pow, [(2, 3), (3, 2)], executor=pool, ordered=False)
+            self.assertEqual([8, 9], sorted(await ait.list(it)))
+
     @async_test
     async def test_takewhile_empty(self):
         def pred(x):
@@ -0,0 +1,119 @@
+# Copyright Amethyst Reese
+# Licensed under the MIT license
+
+import asyncio
+from unittest import TestCase
+
+import aioitertools as ait
+import aioitertools.asyncio as aio
+from aioitertools.metrics import current_hook, MetricsCollector, MetricsHook
+from .helpers import async_test
+
+
+class MetricsTest(TestCase):
+    @async_test
+    async def test_map_batched(self):
+        async def source():
+            for i in range(6):
+                await asyncio.sleep(0.002)
+                yield i
+
+        with MetricsCollector() as collector:
+            self.assertIs(collector, current_hook())
+            async for _ in ait.batched(ait.map(str, source()), 4):
+                await asyncio.sleep(0.01)
+        self.assertIsNone(current_hook())
+
+        metrics = collector.snapshot().metrics
+        self.assertEqual(6, metrics["map"]["items_in"])
+        self.assertEqual(6, metrics["map"]["items_out"])
+        self.assertGreaterEqual(metrics["map"]["upstream_wait"], 0.012)
+        self.assertGreaterEqual(metrics["map"]["upstream_wait_max"], 0.002)
+        self.assertEqual(6, metrics["batched"]["items_in"])
+        self.assertEqual(2, metrics["batched"]["items_out"])
+        self.assertGreaterEqual(metrics["batched"]["downstream_wait"], 0.02)
+        self.assertGreaterEqual(metrics["batched"]["upstream_wait"], 0.012)
+
+    @async_test
+    async def test_tee_as_generated(self):
+        async def gen(n):
+            for i in range(n):
+                yield i
+                await asyncio.sleep(0)
+
+        with MetricsCollector() as collector:
+            it1, it2 = ait.tee(range(5))
+            self.assertEqual([0, 1, 2, 3, 4], await ait.list(it1))
+            self.assertEqual([0, 1, 2, 3, 4], await ait.list(it2))
+            values = await ait.list(aio.as_generated([gen(3), gen(4)]))
+        self.assertEqual(7, len(values))
+
+        metrics = collector.snapshot().metrics
+        self.assertEqual(5, metrics["tee"]["items_in"])
+        self.assertEqual(10, metrics["tee"]["items_out"])
+        self.assertEqual(5, metrics["tee"]["queue_depth_max"])
+        self.assertEqual(7, metrics["as_generated"]["items_out"])
+        self.assertGreaterEqual(metrics["as_generated"]["queue_depth_max"], 1)
+        self.assertEqual(0, metrics["as_generated"]["in_flight"])
+
+    @async_test
+    async def test_gather(self):
+        async def fn(x):
+            await asyncio.sleep(0.001)
+            if x == 3:
+                raise ValueError(x)
+            return x
+
+        aws = [fn(x) for x in range(5)]
+        with MetricsCollector() as collector:
+            await aio.gather(*aws, aws[0], limit=2, return_exceptions=True)
+
+        metrics = collector.snapshot(reset=True).metrics["gather"]
+        self.assertEqual(5, metrics["items_in"])
+        self.assertEqual(5, metrics["items_out"])
+        self.assertEqual(1, metrics["errors"])
+        self.assertEqual(2, metrics["in_flight_max"])
+        self.assertEqual(0, metrics["in_flight"])
+
+        # counters reset, gauges keep their latest value
+        self.assertEqual(
+            {"in_flight": 0, "in_flight_max": 0},
+            collector.snapshot().metrics["gather"],
+        )
+
+    @async_test
+    async def test_custom_hook(self):
+        calls = []
+
+        class Hook(MetricsHook):
+            def count(self, stage, metric, value=1):
+                calls.append((stage, metric, value))
+
+        with Hook():
+            await ait.list(ait.map(str, range(2)))
+        self.assertEqual(
+            [
+                ("map", "items_in", 1),
+                ("map", "items_out", 1),
+                ("map", "items_in", 1),
+                ("map", "items_out", 1),
+            ],
+            calls,
+        )
+
+    @async_test
+    async def test_periodic(self):
+        collector = MetricsCollector()
+        snapshots = collector.periodic(0.01)
+        collector.count("stage", "items_out", 3)
+        first = await ait.next(snapshots)
+        second = await ait.next(snapshots)
+        await snapshots.aclose()
+
+        self.assertEqual({"stage": {"items_out": 3}}, first.metrics)
+        self.assertEqual({"stage": {}}, second.metrics)
+        self.assertEqual(first.end, second.start)
+        self.assertGreaterEqual(second.end - second.start, 0.005)
+
+        with self.assertRaises(ValueError):
+            await ait.next(collector.periodic(0))
@@ -0,0 +1,148 @@
+# Copyright Amethyst Reese
+# Licensed under the MIT license
+
+import asyncio
+import functools
+import time
+from unittest import TestCase
+
+import aioitertools as ait
+from aioitertools.profiling import instrument, Profiler
+from .helpers import async_test
+
+
+def _block(x):
+    time.sleep(0.02)
+    return x
+
+
+async def _fetch(x):
+    await asyncio.sleep(0.01)
+    return x
+
+
+async def _block_then_fetch(x):
+    time.sleep(0.02)
+    await asyncio.sleep(0)
+    return x
+
+
+async def _block_then_wait(x):
+    time.sleep(0.02)
+    await asyncio.sleep(0.001)
+    return x
+
+
+async def _fetch_then_block(x):
+    await asyncio.sleep(0)
+    time.sleep(0.02)
+    return x
+
+
+class ProfilingTest(TestCase):
+    def test_disabled(self):
+        self.assertIs(_block, instrument("map", _block))
+        with Profiler():
+            self.assertIsNot(_block, instrument("map", _block))
+        self.assertIs(_block, instrument("map", _block))
+
+    @async_test
+    async def test_sync_callbacks(self):
+        slow = []
+        with Profiler(threshold=0.01, on_slow=slow.append) as profiler:
+            result = await ait.list(ait.map(_block, ait.filterfalse(bool, [0, 1, 0])))
+        self.assertEqual([0, 0], result)
+
+        block, pred = profiler.stats()
+        self.assertEqual(("map", f"{__name__}._block", 2), block[:3])
+        self.assertGreaterEqual(block.sync, 0.04)
+        self.assertEqual(0.0, block.awaited)
+        self.assertEqual(2, block.slow)
+        self.assertEqual(("filterfalse", "bool", 3, 0), (*pred[:3], pred.slow))
+
+        self.assertEqual(list(profiler.slow), slow)
+        self.assertEqual("map", slow[0].stage)
+        self.assertGreaterEqual(slow[0].duration, 0.02)
+        self.assertIn("test_sync_callbacks", [frame.name for frame in slow[0].stack])
+
+    @async_test
+    async def test_coroutines(self):
+        with Profiler(threshold=0.01) as profiler:
+            self.assertEqual([1, 2], await ait.list(ait.map(_fetch, [1, 2])))
+            groups = await ait.list(ait.groupby([1, 2, 3], key=_block_then_fetch))
+        self.assertEqual(3, len(groups))
+
+        stats = {s.stage: s for s in profiler.stats()}
+        self.assertLess(stats["map"].sync, 0.01)
+        self.assertGreaterEqual(stats["map"].awaited, 0.02)
+        self.assertEqual(0, stats["map"].slow)
+        self.assertGreaterEqual(stats["groupby"].max_sync, 0.02)
+        self.assertEqual(3, stats["groupby"].slow)
+
+        # flagged at the await following the blocking call
+        frames = {frame.name: frame for frame in profiler.slow[0].stack}
+        self.assertIn("await asyncio.sleep(0)", frames["_block_then_fetch"].line)
+
+        report = profiler.report()
+        self.assertIn(f"{__name__}._block_then_fetch", report)
+        self.assertIn("slow callback: groupby", report)
+        self.assertNotIn("await asyncio.sleep(0)", profiler.report(stacks=False))
+
+        profiler.reset()
+        self.assertEqual(0, len(profiler.slow))
+        self.assertTrue(all(s.calls == 0 for s in profiler.stats()))
+
+    @async_test
+    async def test_slow_steps(self):
+        with Profiler(threshold=0.01) as profiler:
+            await ait.list(ait.map(_block_then_wait, [1]))
+            await ait.list(ait.map(_fetch_then_block, [1]))
+            await ait.list(ait.map(functools.partial(_fetch_then_block), [1]))
+        waiting, finished, partial = profiler.slow
+
+        # suspended on a future, below the coroutine's own frame
+        names = [frame.name for frame in waiting.stack]
+        self.assertEqual("_block_then_wait", names[0])
+        self.assertIn("sleep", names)
+        self.assertIn("await asyncio.sleep(0.001)", waiting.stack[0].line)
+
+        # finished during the slow step, so flagged at its definition
+        (frame,) = finished.stack
+        self.assertEqual("_fetch_then_block", frame.name)
+        code = _fetch_then_block.__code__
+        self.assertEqual((code.co_filename, code.co_firstlineno), frame[:2])
+
+        # no code object to point at
+        self.assertEqual([], list(partial.stack))
+
+    @async_test
+    async def test_close(self):
+        with Profiler() as profiler:
+            coro = instrument("map", _fetch)(1)
+        steps = coro.__await__()
+        next(steps)
+        steps.close()
+        (stats,) = profiler.stats()
+        self.assertEqual(1, stats.calls)
+
+    @async_test
+    async def test_errors(self):
+        async def fail(x):
+            await asyncio.sleep(0)
+            raise ValueError(x)
+
+        async def hang(x):
+            await asyncio.sleep(10)
+
+        with Profiler() as profiler:
+            with self.assertRaises(ValueError):
+                await ait.list(ait.map(fail, [1]))
+
+            task = asyncio.ensure_future(ait.list(ait.map(hang, [1])))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        calls = {s.name.rsplit(".", 1)[-1]: s.calls for s in profiler.stats()}
+        self.assertEqual({"fail": 1, "hang": 1}, calls)
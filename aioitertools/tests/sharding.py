@@ -0,0 +1,146 @@
+# Copyright Amethyst Reese
+# Licensed under the MIT license
+
+import asyncio
+import multiprocessing
+import os
+import queue
+import threading
+from unittest import TestCase
+
+import aioitertools as ait
+import aioitertools.sharding as ash
+from .helpers import async_test
+
+
+async def _tag(item):
+    await asyncio.sleep(0)
+    return item, os.getpid()
+
+
+def _pipeline(items):
+    return ait.map(_tag, items)
+
+
+async def _fail(item):
+    if item == 13:
+        raise ValueError(item)
+    return item
+
+
+def _failing_pipeline(items):
+    return ait.map(_fail, items)
+
+
+async def _exit(item):
+    if item == 13:
+        os._exit(3)
+    return item
+
+
+def _exiting_pipeline(items):
+    return ait.map(_exit, items)
+
+
+class _Abort(BaseException):
+    pass
+
+
+def _aborting_pipeline(items):
+    async def abort(item):
+        raise _Abort(threading.Lock())  # not picklable
+
+    return ait.map(abort, items)
+
+
+class ShardingTest(TestCase):
+    @async_test
+    async def test_sharded(self):
+        items = [(i % 7, i) for i in range(500)]
+        result = await ait.list(
+            ash.sharded(_pipeline, items, key=lambda item: item[0], workers=3)
+        )
+        self.assertEqual(sorted(items), sorted(item for item, _ in result))
+
+        pids = {}
+        last = {}
+        for (key, value), pid in result:
+            # every key is processed by a single worker, in order
+            self.assertEqual(pid, pids.setdefault(key, pid))
+            self.assertGreater(value, last.get(key, -1))
+            last[key] = value
+        self.assertEqual(3, len(set(pids.values())))
+        self.assertNotIn(os.getpid(), pids.values())
+
+    @async_test
+    async def test_sharded_spawn(self):
+        if "spawn" not in multiprocessing.get_all_start_methods():
+            self.skipTest("spawn not available")  # pragma: no cover
+
+        async def key(item):
+            return item % 2
+
+        result = await ait.list(
+            ash.sharded(
+                _pipeline,
+                ait.iter(range(20)),
+                key=key,
+                workers=2,
+                chunksize=3,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        )
+        self.assertEqual(list(range(20)), sorted(item for item, _ in result))
+
+    @async_test
+    async def test_sharded_errors(self):
+        with self.assertRaises(ValueError):
+            await ait.list(
+                ash.sharded(_failing_pipeline, range(50), key=str, workers=2)
+            )
+
+        def bad_key(item):
+            raise KeyError(item)
+
+        with self.assertRaises(KeyError):
+            await ait.list(ash.sharded(_pipeline, range(5), key=bad_key, workers=1))
+
+        with self.assertRaises(ValueError):
+            await ait.list(ash.sharded(_pipeline, range(5), key=str, workers=0))
+        with self.assertRaises(ValueError):
+            await ait.list(ash.sharded(_pipeline, range(5), key=str, chunksize=0))
+
+    @async_test
+    async def test_sharded_worker_exit(self):
+        with self.assertRaisesRegex(RuntimeError, "exited with code 3"):
+            await asyncio.wait_for(
+                ait.list(ash.sharded(_exiting_pipeline, range(50), key=str, workers=2)),
+                timeout=10,
+            )
+
+    def test_shard_main(self):
+        # run a worker's event loop in-process, like _shard_worker, with thread queues
+        inputs = queue.Queue()
+        results = queue.Queue()
+        inputs.put([1, 2, 3])
+        inputs.put(None)
+        asyncio.run(ash._shard_main(_pipeline, 5, inputs, results, 2))
+        messages = [results.get() for _ in range(results.qsize())]
+        self.assertEqual(["items", "items", "done"], [kind for kind, _ in messages])
+        self.assertEqual([1, 2, 3], [v for _, p in messages[:2] for v, _ in p])
+        self.assertEqual(5, messages[-1][1])
+
+        inputs.put([1])
+        inputs.put(None)
+        with self.assertRaises(_Abort):
+            asyncio.run(ash._shard_main(_aborting_pipeline, 0, inputs, results, 2))
+        kind, error = results.get()
+        self.assertEqual("error", kind)
+        self.assertIsInstance(error, RuntimeError)
+        self.assertIn("_Abort", str(error))
+
+    @async_test
+    async def test_sharded_close(self):
+        it = ash.sharded(_pipeline, ait.count(), key=lambda x: x % 4, workers=2)
+        self.assertIsInstance(await ait.next(it), tuple)
+        await it.aclose()
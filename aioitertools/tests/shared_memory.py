@@ -0,0 +1,129 @@
+# Copyright Amethyst Reese
+# Licensed under the MIT license
+
+import array
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from unittest import TestCase
+
+import aioitertools as ait
+import aioitertools.shared_memory as asm
+from .helpers import async_test
+
+
+def _total(values):
+    return sum(values)
+
+
+def _slow_total(values):
+    time.sleep(0.1)
+    return sum(values)
+
+
+class SharedMemoryTest(TestCase):
+    def test_segment_pool(self):
+        with asm.SegmentPool() as pool:
+            handle = pool.put((1.5, 2.5, 3.0))
+            self.assertEqual(("d", 3), (handle.typecode, handle.length))
+            with handle.open() as view:
+                self.assertEqual([1.5, 2.5, 3.0], view.tolist())
+
+            # segments in use are not reused
+            pool.retain(handle)
+            pool.release(handle)
+            other = pool.put(array.array("i", [1, 2]))
+            self.assertNotEqual(handle.name, other.name)
+            with other.open() as view:
+                self.assertEqual([1, 2], view.tolist())
+
+            # released segments are reused for batches that fit
+            pool.release(handle)
+            smaller = pool.put([7, 8], typecode="q")
+            self.assertEqual(handle.name, smaller.name)
+            with smaller.open() as view:
+                self.assertEqual([7, 8], view.tolist())
+
+            names = [handle.name, other.name]
+
+        for name in names:
+            with self.assertRaises(FileNotFoundError):
+                asm.SharedBatch(name, "d", 0).open().__enter__()
+
+    @async_test
+    async def test_shared_map_threads(self):
+        with ThreadPoolExecutor(2) as pool:
+            result = await ait.list(
+                asm.shared_map(_total, range(10), 3, executor=pool, limit=2)
+            )
+        self.assertEqual([3.0, 12.0, 21.0, 9.0], result)
+
+        with self.assertRaises(ValueError):
+            await ait.list(asm.shared_map(_total, range(3), 3, executor=pool, limit=0))
+
+    @async_test
+    async def test_shared_map_close(self):
+        calls = []
+
+        closed = []
+
+        def total(values):
+            calls.append(_slow_total(values))
+
+        async def values():
+            try:
+                for value in range(10):
+                    yield value
+            finally:
+                closed.append(True)
+
+        with ThreadPoolExecutor(1) as pool:
+            gen = asm.shared_map(total, values(), 2, executor=pool, limit=3)
+            await ait.next(gen)
+            await asyncio.sleep(0.02)
+            # the second batch is running, and the third is cancelled before starting
+            await gen.aclose()
+            self.assertEqual([1.0, 5.0], calls)
+            self.assertEqual([True], closed)
+
+    @async_test
+    async def test_shared_map_cancel(self):
+        calls = []
+
+        def total(values):
+            calls.append(_slow_total(values))
+
+        with ThreadPoolExecutor(1) as pool:
+            gen = asm.shared_map(total, range(10), 2, executor=pool, limit=2)
+            task = asyncio.ensure_future(ait.list(gen))
+            await asyncio.sleep(0.02)
+            # cancelled while waiting for the first batch, which is still running
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            self.assertEqual([1.0], calls)
+
+        with ThreadPoolExecutor(1) as pool:
+
+            def fail(values):
+                raise ValueError(values.tolist())
+
+            with self.assertRaisesRegex(ValueError, r"\[0.0, 1.0\]"):
+                await ait.list(asm.shared_map(fail, range(10), 2, executor=pool))
+
+    @async_test
+    async def test_shared_map_processes(self):
+        for method in ("fork", "spawn"):
+            if method not in multiprocessing.get_all_start_methods():
+                continue  # pragma: no cover
+            with self.subTest(method=method):
+                context = multiprocessing.get_context(method)
+                with ProcessPoolExecutor(2, mp_context=context) as pool:
+                    result = await ait.list(
+                        asm.shared_map(
+                            _total, range(100), 10, executor=pool, typecode="l"
+                        )
+                    )
+                expected = [sum(range(i, i + 10)) for i in range(0, 100, 10)]
+                self.assertEqual(expected, result)
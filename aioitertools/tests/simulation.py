@@ -0,0 +1,106 @@
+# Copyright Amethyst Reese
+# Licensed under the MIT license
+
+import asyncio
+import random
+import time
+from unittest import TestCase
+
+import aioitertools as ait
+import aioitertools.asyncio as aio
+from aioitertools.benchmarks.simulation import (
+    exponential,
+    fixed,
+    pareto,
+    percentile,
+    run,
+    SCENARIOS,
+    Service,
+    simulate,
+    SimulatedError,
+    Source,
+    Workload,
+)
+
+
+class SimulationTest(TestCase):
+    def test_virtual_clock(self):
+        async def main():
+            loop = asyncio.get_running_loop()
+            await asyncio.sleep(3600)
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(asyncio.sleep(60), timeout=30)
+            await loop.run_in_executor(None, time.sleep, 0.01)
+            return loop.time()
+
+        before = time.monotonic()
+        self.assertEqual(3630, simulate(main()))
+        self.assertLess(time.monotonic() - before, 1)
+
+    def test_distributions(self):
+        rng = random.Random(0)
+        self.assertEqual(0.5, fixed(0.5)(rng))
+        delays = [exponential(0.1)(rng) for _ in range(10_000)]
+        self.assertAlmostEqual(0.1, sum(delays) / len(delays), delta=0.01)
+        delays = [pareto(0.1)(rng) for _ in range(10_000)]
+        self.assertGreaterEqual(min(delays), 0.1)
+        self.assertGreater(percentile(delays, 99), 10 * percentile(delays, 50))
+
+        self.assertEqual(2, percentile([3, 1, 2], 50))
+        self.assertEqual(3, percentile([3, 1, 2], 99))
+        self.assertEqual(1, percentile([3, 1, 2], 0))
+
+    def test_gather_limit(self):
+        service = Service(fixed(1), jitter=0.5, error_rate=0.25, seed=1)
+
+        async def main():
+            calls = [service.settle(i) for i in range(100)]
+            results = await aio.gather(*calls, limit=10)
+            return results, asyncio.get_running_loop().time()
+
+        results, elapsed = simulate(main())
+        errors = [r for r in results if isinstance(r, SimulatedError)]
+        self.assertEqual(service.errors, len(errors))
+        self.assertLess(10, len(errors))
+        self.assertGreater(40, len(errors))
+        indexes = [results.index(e) for e in errors]
+        self.assertEqual(indexes, [e.args[0] for e in errors])
+
+        highest, mean = service.in_flight_between(0, elapsed)
+        self.assertEqual(10, highest)
+        self.assertGreater(mean, 9)
+        self.assertEqual(0, service.in_flight)
+        self.assertGreater(elapsed, 5)
+        self.assertLess(elapsed, 15)
+
+        with self.assertRaises(ValueError):
+            Service(fixed(1), error_rate=2)
+
+    def test_source(self):
+        async def main():
+            source = Source(5, fixed(2), start=10)
+            return await ait.list(source), source.arrivals
+
+        items, arrivals = simulate(main())
+        self.assertEqual([10, 11, 12, 13, 14], items)
+        self.assertEqual({10: 2, 11: 4, 12: 6, 13: 8, 14: 10}, arrivals)
+
+    def test_scenarios(self):
+        workload = Workload(200, 10, exponential(0.01), 4, 0.1, 0)
+        for name, scenario in SCENARIOS.items():
+            with self.subTest(name):
+                stats = run(scenario, workload, exponential(0.05), error_rate=0.1)
+                again = run(scenario, workload, exponential(0.05), error_rate=0.1)
+                self.assertEqual(stats, again)
+                self.assertEqual(200, stats.items)
+                self.assertLess(0, stats.errors)
+                self.assertLessEqual(stats.p50, stats.p99)
+                self.assertLessEqual(stats.mean_in_flight, stats.max_in_flight)
+                self.assertEqual(10, len(stats.profile))
+
+        workload = workload._replace(jitter=0)
+        stats = run(SCENARIOS["gather"], workload, fixed(1))
+        self.assertEqual((10, 20, 20), (stats.max_in_flight, stats.p50, stats.p99))
+        self.assertEqual(10, stats.throughput)
+        stats = run(SCENARIOS["map"], workload, fixed(1))
+        self.assertEqual(1, stats.max_in_flight)
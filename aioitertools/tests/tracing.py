@@ -0,0 +1,206 @@
+# Copyright Amethyst Reese
+# Licensed under the MIT license
+
+import asyncio
+import json
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+import aioitertools as ait
+import aioitertools.asyncio as aio
+from aioitertools.tracing import (
+    current_span,
+    current_tracer,
+    JsonLinesSink,
+    span,
+    traced,
+    Tracer,
+)
+from .helpers import async_test
+
+
+class TracingTest(TestCase):
+    def assertTree(self, spans, expected):
+        by_id = {s.span_id: s for s in spans}
+
+        def path(s):
+            names = []
+            while s is not None:
+                names.insert(0, s.name)
+                s = by_id.get(s.parent_id)
+            return "/".join(names)
+
+        self.assertEqual(1, len({s.trace_id for s in spans}))
+        self.assertEqual(sorted(expected), sorted(path(s) for s in spans))
+
+    @async_test
+    async def test_disabled(self):
+        self.assertIsNone(current_tracer())
+        with span("nothing") as current:
+            self.assertIsNone(current)
+            self.assertIsNone(current_span())
+        self.assertEqual([2], await ait.list(ait.map(lambda x: x * 2, [1])))
+
+    @async_test
+    async def test_map(self):
+        spans = []
+
+        async def double(x):
+            with span("double", x=x):
+                await asyncio.sleep(0)
+            return x * 2
+
+        with Tracer(spans.append) as tracer:
+            self.assertIs(tracer, current_tracer())
+            with span("root") as root:
+                self.assertIs(root, current_span())
+                result = await ait.list(ait.map(str, ait.map(double, range(2))))
+            self.assertIsNone(current_span())
+        self.assertEqual(["0", "2"], result)
+
+        self.assertTree(
+            spans,
+            [
+                "root",
+                "root/map",
+                "root/map/map.call",
+                "root/map/map.call",
+                "root/map/map",
+                "root/map/map/map.call",
+                "root/map/map/map.call",
+                "root/map/map/map.call/double",
+                "root/map/map/map.call/double",
+            ],
+        )
+        items = [s.attributes["items"] for s in spans if s.name == "map"]
+        self.assertEqual([2, 2], items)
+        xs = {s.attributes["x"] for s in spans if s.name == "double"}
+        self.assertEqual({0, 1}, xs)
+        self.assertTrue(all(s.end >= s.start for s in spans))
+
+    @async_test
+    async def test_tasks(self):
+        spans = []
+
+        @traced("fetch")
+        async def fetch(x):
+            await asyncio.sleep(0)
+            if x == 2:
+                raise ValueError(x)
+            return x
+
+        async def gen():
+            for x in range(2):
+                with span("produce"):
+                    await asyncio.sleep(0)
+                yield x
+
+        with Tracer(spans.append):
+            with span("root"):
+                result = await aio.gather(
+                    fetch(0), fetch(1), fetch(2), limit=2, return_exceptions=True
+                )
+                values = await ait.list(aio.as_generated([gen(), gen()]))
+                a, b = ait.tee(ait.map(str, [1]))
+                self.assertEqual(["1"], await ait.list(a))
+                self.assertEqual(["1"], await ait.list(b))
+        self.assertEqual([0, 1], result[:2])
+        self.assertEqual([0, 0, 1, 1], sorted(values))
+
+        self.assertTree(
+            spans,
+            ["root", "root/gather"]
+            + ["root/gather/gather.task", "root/gather/gather.task/fetch"] * 3
+            + ["root/as_generated"]
+            + ["root/as_generated/as_generated.task"] * 2
+            + ["root/as_generated/as_generated.task/produce"] * 4
+            + ["root/tee", "root/tee", "root/tee/map", "root/tee/map/map.call"],
+        )
+        errors = [s.error for s in spans if s.name in ("fetch", "gather.task")]
+        self.assertEqual(["ValueError: 2"] * 2, [e for e in errors if e])
+        branches = [s.attributes["branch"] for s in spans if s.name == "tee"]
+        self.assertEqual([0, 1], sorted(branches))
+
+    @async_test
+    async def test_errors(self):
+        spans = []
+
+        @traced("fail")
+        async def fail(x):
+            await asyncio.sleep(0)
+            raise ValueError(x)
+
+        async def hang():
+            await asyncio.sleep(10)
+
+        with self.assertRaises(ValueError):
+            await fail(0)
+
+        with Tracer(spans.append) as tracer:
+            with self.assertRaises(ValueError):
+                await fail(1)
+            with self.assertRaises(ValueError):
+                await ait.list(ait.map(fail, [2]))
+
+            root = tracer.start("root")
+            self.assertIn(repr("root"), repr(root))
+            task = root.create_task("hang", asyncio.ensure_future, hang())
+            await asyncio.sleep(0)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            root.finish()
+            root.finish(RuntimeError("ignored"))
+
+        errors = {s.name: s.error for s in spans}
+        self.assertEqual(
+            {
+                "fail": "ValueError: 2",
+                "map.call": "ValueError: 2",
+                "map": "ValueError: 2",
+                "hang": "cancelled",
+                "root": None,
+            },
+            errors,
+        )
+        self.assertEqual(6, len(spans))
+        self.assertEqual("ValueError: 1", spans[0].error)
+
+    @async_test
+    async def test_sampling(self):
+        spans = []
+        with Tracer(spans.append, sample_rate=0):
+            with span("root") as root:
+                await ait.list(ait.map(str, range(3)))
+        self.assertFalse(root.sampled)
+        self.assertEqual([], spans)
+
+        with self.assertRaises(ValueError):
+            Tracer(spans.append, sample_rate=2)
+
+    @async_test
+    async def test_json_lines_sink(self):
+        with tempfile.TemporaryDirectory() as td:
+            path = Path(td) / "trace.jsonl"
+            with JsonLinesSink(path, buffer=2) as sink, Tracer(sink):
+                with span("one", path=path):
+                    pass
+                self.assertEqual("", path.read_text())
+                with span("two"):
+                    pass
+                self.assertEqual(2, len(path.read_text().splitlines()))
+                with self.assertRaises(RuntimeError):
+                    with span("three"):
+                        raise RuntimeError("oops")
+                sink.flush()
+                self.assertEqual(3, len(path.read_text().splitlines()))
+
+            records = [json.loads(line) for line in path.read_text().splitlines()]
+            self.assertEqual(["one", "two", "three"], [r["name"] for r in records])
+            self.assertEqual(repr(path), records[0]["attributes"]["path"])
+            self.assertEqual("RuntimeError: oops", records[2]["error"])
+            self.assertGreaterEqual(records[2]["duration"], 0)
+            with self.assertRaises(ValueError):
+                sink.flush()
+            sink.close()
@@ -0,0 +1,390 @@
+# Copyright Amethyst Reese
+# Licensed under the MIT license
+
+"""
+Lightweight tracing spans for pipeline stages, linked through context variables.
+
+Provisional library.  Must be imported as `aioitertools.tracing`.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import random
+import threading
+import time
+from collections.abc import AsyncIterator, Awaitable, Iterator
+from typing import Any, Callable, Optional, TextIO, TypeVar, Union
+
+from .helpers import ContextScope, maybe_await
+from .types import R, T
+
+F = TypeVar("F", bound=Callable[..., Awaitable[Any]])
+Sink = Callable[["Span"], Any]
+
+_tracer: contextvars.ContextVar[Optional["Tracer"]]
+_tracer = contextvars.ContextVar("aioitertools_tracer", default=None)
+_span: contextvars.ContextVar[Optional["Span"]]
+_span = contextvars.ContextVar("aioitertools_span", default=None)
+
+
+def current_tracer() -> Optional["Tracer"]:
+    """
+    Return the tracer active in the current context, if any.
+    """
+    return _tracer.get()
+
+
+def current_span() -> Optional["Span"]:
+    """
+    Return the innermost span active in the current context, if any.
+    """
+    return _span.get()
+
+
+def _error(error: BaseException) -> str:
+    return f"{type(error).__name__}: {error}"
+
+
+class Span:
+    """
+    A timed operation within a trace, with a link to its parent span.
+
+    Times are seconds since the epoch.  Only spans from sampled traces are sent to
+    the tracer's sink, once finished.
+    """
+
+    __slots__ = (
+        "attributes",
+        "end",
+        "error",
+        "name",
+        "parent_id",
+        "sampled",
+        "span_id",
+        "start",
+        "trace_id",
+        "tracer",
+    )
+
+    def __init__(
+        self,
+        tracer: "Tracer",
+        name: str,
+        parent: Optional["Span"],
+        attributes: dict[str, Any],
+    ) -> None:
+        self.tracer = tracer
+        self.name = name
+        self.span_id = f"{random.getrandbits(64):016x}"
+        if parent is None:
+            self.trace_id = f"{random.getrandbits(128):032x}"
+            self.parent_id: Optional[str] = None
+            self.sampled = random.random() < tracer.sample_rate
+        else:
+            self.trace_id = parent.trace_id
+            self.parent_id = parent.span_id
+            self.sampled = parent.sampled
+        self.start = time.time()
+        self.end: Optional[float] = None
+        self.error: Optional[str] = None
+        self.attributes = attributes
+
+    def __repr__(self) -> str:
+        return f"<Span {self.name!r} {self.trace_id}/{self.span_id}>"
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        """
+        Record the end of the span, and send it to the sink if sampled.
+        """
+        if self.end is not None:
+            return
+        self.end = time.time()
+        if error is not None:
+            self.error = _error(error)
+        if self.sampled:
+            self.tracer.sink(self)
+
+    def to_dict(self) -> dict[str, Any]:
+        """
+        Return the span as a JSON-compatible dictionary.
+        """
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "end": self.end,
+            "duration": None if self.end is None else self.end - self.start,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+    @contextlib.contextmanager
+    def activate(self) -> Iterator["Span"]:
+        """
+        Make this the current span, and parent of new spans, within the context.
+        """
+        token = _span.set(self)
+        try:
+            yield self
+        finally:
+            _span.reset(token)
+
+    def child(self, name: str, **attributes: Any) -> "Span":
+        """
+        Start a new span with this span as its parent.
+        """
+        return Span(self.tracer, name, self, attributes)
+
+    def create_task(
+        self, name: str, factory: Callable[..., "asyncio.Future[T]"], *args: Any
+    ) -> "asyncio.Future[T]":
+        """
+        Create a task by calling ``factory``, traced by a child span named ``name``.
+
+        The child span is current while the task runs, and finishes with the task.
+        """
+        span = self.child(name)
+        with span.activate():
+            task = factory(*args)
+
+        def done(task: "asyncio.Future[T]") -> None:
+            if task.cancelled():
+                span.error = "cancelled"
+                span.finish()
+            else:
+                span.finish(task.exception())
+
+        task.add_done_callback(done)
+        return task
+
+    def wrap(self, name: str, fn: Callable[..., Any]) -> Callable[..., Awaitable[Any]]:
+        """
+        Wrap a function or coroutine function so each call is a child span.
+        """
+
+        @functools.wraps(fn)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            span = self.child(name)
+            try:
+                with span.activate():
+                    result = await maybe_await(fn(*args, **kwargs))
+            except BaseException as e:
+                span.finish(e)
+                raise
+            span.finish()
+            return result
+
+        return wrapper
+
+    async def input(self, itr: AsyncIterator[T]) -> AsyncIterator[T]:
+        """
+        Yield from ``itr``, making this span current while waiting on each item.
+
+        Upstream stages that start while waiting become children of this span.
+        """
+        while True:
+            token = _span.set(self)
+            try:
+                item = await itr.__anext__()
+            except StopAsyncIteration:
+                return
+            finally:
+                _span.reset(token)
+            yield item
+
+    async def output(self, itr: AsyncIterator[R]) -> AsyncIterator[R]:
+        """
+        Yield from ``itr``, then finish this span with the number of items yielded.
+        """
+        count = 0
+        try:
+            async for item in itr:
+                count += 1
+                yield item
+        except BaseException as e:
+            self.attributes["items"] = count
+            self.finish(None if isinstance(e, GeneratorExit) else e)
+            raise
+        finally:
+            aclose = getattr(itr, "aclose", None)
+            if aclose is not None:
+                await aclose()
+        self.attributes["items"] = count
+        self.finish()
+
+
+class Tracer(ContextScope):
+    """
+    Record spans for pipeline stages, and send finished spans to ``sink``.
+
+    While a tracer is used as a context manager, stages started from the current
+    context record spans:
+
+    - :func:`aioitertools.map` records a ``map`` span for the stage, and a
+      ``map.call`` child span for each call to its function.  Stages it consumes
+      from become children of its span.
+    - :func:`aioitertools.asyncio.gather` records a ``gather`` span, and a
+      ``gather.task`` child span for each task it creates.
+    - :func:`aioitertools.asyncio.as_generated` records an ``as_generated`` span,
+      and an ``as_generated.task`` child span for each iterable it consumes.
+    - :func:`aioitertools.tee` records a ``tee`` span for each branch, as a child
+      of the span that was current when ``tee`` was called.
+
+    Each span is linked to its parent through context variables, so spans from
+    tasks created by these stages, or by :meth:`span` in user code, stay in the
+    same trace.  Traces are sampled when their root span starts, with probability
+    ``sample_rate``, and spans from unsampled traces are not sent to the sink.
+
+    Example::
+
+        with JsonLinesSink("trace.jsonl") as sink, Tracer(sink, sample_rate=0.1):
+            async for request in requests:
+                with span("request", path=request.path):
+                    await gather(*[fetch(url) for url in request.urls])
+
+    """
+
+    _var = _tracer
+
+    def __init__(self, sink: Sink, *, sample_rate: float = 1.0) -> None:
+        if not 0 <= sample_rate <= 1:
+            raise ValueError("sample_rate must be between 0 and 1")
+        super().__init__()
+        self.sink = sink
+        self.sample_rate = sample_rate
+
+    def start(self, name: str, **attributes: Any) -> Span:
+        """
+        Start a span as a child of the current span, without making it current.
+        """
+        return Span(self, name, _span.get(), attributes)
+
+    @contextlib.contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        """
+        Record a span, current for the duration of the context.
+        """
+        span = self.start(name, **attributes)
+        try:
+            with span.activate():
+                yield span
+        except BaseException as e:
+            span.finish(e)
+            raise
+        span.finish()
+
+
+@contextlib.contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """
+    Record a span with the active tracer, or do nothing if tracing is disabled.
+
+    Must not be held open across a ``yield`` in an async generator, because the
+    current span would leak into the consumer's context.
+
+    Example::
+
+        with span("load", table="users"):
+            rows = await load_users()
+
+    """
+    tracer = _tracer.get()
+    if tracer is None:
+        yield None
+        return
+    with tracer.span(name, **attributes) as current:
+        yield current
+
+
+def traced(name: str) -> Callable[[F], F]:
+    """
+    Decorate a coroutine function to record a span for each call when tracing.
+
+    Example::
+
+        @traced("fetch")
+        async def fetch(url):
+            ...
+
+    """
+
+    def decorator(fn: F) -> F:
+        @functools.wraps(fn)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            tracer = _tracer.get()
+            if tracer is None:
+                return await fn(*args, **kwargs)
+            with tracer.span(name):
+                return await fn(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
+
+
+class JsonLinesSink:
+    """
+    Sink that appends each span to a file as a line of JSON.
+
+    Lines are buffered, and written when ``buffer`` spans are pending, or when the
+    sink is flushed or closed.  Safe to share between threads.
+
+    Example::
+
+        with JsonLinesSink("trace.jsonl") as sink, Tracer(sink):
+            ...
+
+    """
+
+    def __init__(
+        self, path: Union[str, "os.PathLike[str]"], *, buffer: int = 100
+    ) -> None:
+        self.path = path
+        self.buffer = buffer
+        self._lines: list[str] = []
+        self._lock = threading.Lock()
+        self._file: Optional[TextIO] = open(path, "a", encoding="utf-8")
+
+    def __enter__(self) -> "JsonLinesSink":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def __call__(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=repr)
+        with self._lock:
+            self._lines.append(line)
+            if len(self._lines) >= self.buffer:
+                self._write()
+
+    def _write(self) -> None:
+        if self._file is None:
+            raise ValueError("sink is closed")
+        if self._lines:
+            self._file.write("\n".join(self._lines) + "\n")
+            self._file.flush()
+            self._lines.clear()
+
+    def flush(self) -> None:
+        """
+        Write any buffered spans to the file.
+        """
+        with self._lock:
+            self._write()
+
+    def close(self) -> None:
+        """
+        Write any buffered spans, and close the file.
+        """
+        with self._lock:
+            if self._file is not None:
+                self._write()
+                self._file.close()
+                self._file = None
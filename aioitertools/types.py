@@ -2,7 +2,15 @@
 # Licensed under the MIT license
 
 import sys
-from collections.abc import AsyncIterable, AsyncIterator, Awaitable, Iterable, Iterator
+from collections.abc import (
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Iterable,
+    Iterator,
+    Mapping,
+    Sequence,
+)
 
 from typing import Callable, TypeVar, Union
 
@@ -14,6 +22,7 @@ else:  # pragma: no cover
 
 P = ParamSpec("P")
 R = TypeVar("R")
+K = TypeVar("K")
 T = TypeVar("T")
 T1 = TypeVar("T1")
 T2 = TypeVar("T2")
@@ -31,3 +40,7 @@ Accumulator = Union[Callable[[T, T], T], Callable[[T, T], Awaitable[T]]]
 KeyFunction = Union[Callable[[T], R], Callable[[T], Awaitable[R]]]
 Predicate = Union[Callable[[T], object], Callable[[T], Awaitable[object]]]
 MaybeAwaitable = Union[T, Awaitable[T]]
+BatchFunction = Union[
+    Callable[[list[K]], Union[Sequence[R], Mapping[K, R]]],
+    Callable[[list[K]], Awaitable[Union[Sequence[R], Mapping[K, R]]]],
+]